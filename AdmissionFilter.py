@@ -0,0 +1,57 @@
+import FrequencySketch
+
+
+class AdmissionFilter:
+
+    def __init__(self, min_count=2, sample_factor=10):
+        """
+        Admission filter for a Cache created with admission=True or with an unbound AdmissionFilter.
+        A put that would evict an entry is counted in a count-min sketch sized from the cache's capacity,
+        and only admitted once its key was counted min_count times, so keys put once, e.g. by a scan,
+        do not push out entries that are used again. Counters are halved every capacity * sample_factor
+        counts, so keys that stop being put are forgotten.
+        :param min_count: Number of evicting puts of a key, since the counters were last halved, needed
+            to admit it. 1 admits every put
+        :param sample_factor: Counters are halved after capacity * sample_factor counted puts
+        """
+        self.min_count = min_count
+        self.rejections = 0
+        self._sample_factor = sample_factor
+        self._sketch = None
+
+    def bind(self, capacity):
+        """
+        Allocates the sketch for a cache
+        :param capacity: Total number of slots of the cache
+        :return: self
+        """
+        if self._sketch is not None:
+            raise ValueError("AdmissionFilter instance is already bound to a cache")
+
+        self._sketch = FrequencySketch.FrequencySketch(capacity, sample_factor=self._sample_factor)
+        return self
+
+    def admit(self, key_hash):
+        """
+        Counts a put that would evict an entry
+        :return: True if key_hash was put often enough to be admitted
+        """
+        sketch = self._sketch
+        sketch.increment(key_hash)
+        if sketch.estimate(key_hash) >= self.min_count:
+            return True
+        self.rejections += 1
+        return False
+
+    def clear(self):
+        """
+        Forgets every count
+        """
+        self._sketch.clear()
+        self.rejections = 0
+
+    def get_memory_usage(self):
+        """
+        :return: Approximate number of bytes taken by the sketch
+        """
+        return self._sketch.get_memory_usage()
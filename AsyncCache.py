@@ -0,0 +1,145 @@
+import asyncio
+import inspect
+
+import Cache
+
+
+class AsyncCache:
+
+    def __init__(self, loader, slots, size, alg="lru", max_loads=None, refresh_after=None, **kwargs):
+        """
+        Read-through Cache for asyncio. get_or_load returns cached values directly and calls loader on a
+        miss; concurrent misses on the same key share one load.
+        Entries are stored as (key, value, refresh_at) under key tags, so a key has one entry, a reload
+        replaces it in place, and a loaded None is cached like any other value. Cache tells keys apart by
+        hash alone, so the stored key is compared on every hit, e.g. hash(-1) == hash(-2).
+        :param loader: Called as loader(key) on a miss; a coroutine function, or a function returning the
+            value or an awaitable
+        :param slots: Number of slots; specifies the -way associativity of the cache
+        :param size: Total number of slots in the cache
+        :param alg: Replacement algorithm, as for Cache
+        :param max_loads: Maximum number of loader calls running at once. Default is None: unbounded
+        :param refresh_after: Age in clock units after which a hit still returns the cached value but
+            reloads it in the background (stale-while-revalidate). Combine with default_ttl to bound how
+            stale a value may get. Default is None: values are only reloaded once evicted or expired
+        :param kwargs: Other Cache options, e.g. default_ttl or clock
+        """
+        self._loader = loader
+        self._cache = Cache.Cache(slots, size, alg, key_tags=True, **kwargs)
+        self._clock = self._cache._clock
+        self._refresh_after = refresh_after
+        self._semaphore = asyncio.Semaphore(max_loads) if max_loads else None
+        # key hash -> (key, task loading that key); a load of a colliding key meanwhile is not coalesced
+        self._loads = dict()
+
+    async def get_or_load(self, key):
+        """
+        Gets value in cache given key, loading it on a miss. A hit returns without creating a task.
+        :return: Cached or loaded value. Exceptions raised by loader propagate to every caller waiting on
+            that load
+        """
+        key_hash = self._cache._hash_key(key)
+        entry = self._cache._get(key_hash)
+
+        if entry is not None and entry[0] == key:
+            _, value, refresh_at = entry
+            if refresh_at is not None and refresh_at <= self._clock() and self._loading(key, key_hash) is None:
+                # keep serving the stale value; a failed refresh leaves it in place
+                self._start_load(key, key_hash).add_done_callback(_consume_exception)
+            return value
+
+        task = self._loading(key, key_hash)
+        if task is None:
+            task = self._start_load(key, key_hash)
+        # a cancelled caller must not cancel a load other callers are waiting on
+        return await asyncio.shield(task)
+
+    def get(self, key):
+        """
+        Gets value in cache given key without loading it
+        :return: Value corresponding to key, or None if no matching key
+        """
+        entry = self._cache.get(key)
+        return entry[1] if entry is not None and entry[0] == key else None
+
+    def put(self, key, value, ttl=None):
+        """
+        Stores value under key, as if it had been loaded
+        """
+        key_hash = self._cache._hash_key(key)
+        self._cache._put(key_hash, key_hash, self._wrap(key, value), self._cache._default_ttl if ttl is None else ttl)
+
+    def remove(self, key):
+        """
+        Removes entry from cache given key. A load of key already in flight still stores its result.
+        :return: Value corresponding to key if successful, or None if no matching key
+        """
+        key_hash = self._cache._hash_key(key)
+        set_num, i = self._cache._locate(key_hash)
+        if i is None or self._cache._cache[set_num][i][1][0] != key:
+            return None
+        return self._cache._remove(key_hash)[1]
+
+    def clear(self):
+        """
+        Clears entire cache, removing all entries
+        """
+        self._cache.clear()
+
+    def get_hits(self):
+        """
+        :return: Number of cache hits
+        """
+        return self._cache.get_hits()
+
+    def get_misses(self):
+        """
+        :return: Number of cache misses
+        """
+        return self._cache.get_misses()
+
+    def _loading(self, key, key_hash):
+        """
+        :return: Task loading key, or None
+        """
+        loading = self._loads.get(key_hash)
+        return loading[1] if loading is not None and loading[0] == key else None
+
+    def _start_load(self, key, key_hash):
+        task = asyncio.ensure_future(self._load(key, key_hash))
+        self._loads.setdefault(key_hash, (key, task))
+        return task
+
+    async def _load(self, key, key_hash):
+        try:
+            if self._semaphore is None:
+                value = await self._call_loader(key)
+            else:
+                async with self._semaphore:
+                    value = await self._call_loader(key)
+            self._cache._put(key_hash, key_hash, self._wrap(key, value), self._cache._default_ttl)
+            return value
+        finally:
+            # a load not coalesced because of a colliding key leaves the registered one in place
+            if self._loads.get(key_hash, (None, None))[1] is asyncio.current_task():
+                del self._loads[key_hash]
+
+    async def _call_loader(self, key):
+        value = self._loader(key)
+        if inspect.isawaitable(value):
+            value = await value
+        return value
+
+    def _wrap(self, key, value):
+        """
+        :return: Cache entry for value, recording its key and when it is due for a refresh
+        """
+        if self._refresh_after is None:
+            return key, value, None
+        return key, value, self._clock() + self._refresh_after
+
+
+def _consume_exception(task):
+    # background refreshes have no caller to raise to; retrieve the exception so asyncio does not log it
+    if not task.cancelled():
+        task.exception()
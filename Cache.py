@@ -1,114 +1,559 @@
+import os
+import struct
+import sys
+import time
+from collections import OrderedDict
+from types import MappingProxyType
+
+import AdmissionFilter
+import CacheStats
 import ReplacementAlgorithm
 
+# copy, mmap, pickle and tempfile are only needed by resize and snapshots, so they are imported there: pickle
+# alone takes most of the time of importing Cache
+
+
+# containers the hash function can look into when they hold unhashable members
+_NESTABLE = (list, tuple, dict, set, frozenset)
+_MUTABLE = (list, dict, set)
+
+_INDEXES = ("modulo", "mixed", "two_choice")
+_MASK64 = 0xFFFFFFFFFFFFFFFF
+
+# read-only stand-ins shared by every set that never held an entry, see Cache._touch_set
+_UNTOUCHED_SET = ()
+_UNTOUCHED_INDEX = MappingProxyType({})
+
+# snapshot file layout, see Cache.save
+_SNAPSHOT_MAGIC = b"SACSNAP1"
+# magic, length of the pickled metadata that follows
+_SNAPSHOT_HEADER = struct.Struct("<8sQ")
+# per set, after the metadata: offset and length of the set's block, 0 for an empty set
+_SNAPSHOT_SET = struct.Struct("<QQ")
+# block: number of entries, length of the pickled algorithm state that ends the block
+_SNAPSHOT_BLOCK = struct.Struct("<II")
+# per entry, followed by the serialized value: tag, key hash, remaining ttl (negative for none), value length
+_SNAPSHOT_ENTRY = struct.Struct("<qqdI")
+
+
+def custom_hash(key):
+    """
+    Hash function that handles keys that are lists, sets, dicts.
+    Flat containers hash like their immutable counterparts: a list as a tuple, a set as a frozenset and a
+    dict as the frozenset of its items. Containers with unhashable members are handed to _hash_nested.
+    """
+    key_type = type(key)
+    try:
+        if key_type is list:
+            return hash(tuple(key))
+        elif key_type is dict:
+            return hash(frozenset(key.items()))
+        elif key_type is set:
+            return hash(frozenset(key))
+        return hash(key)
+    except TypeError:
+        if key_type not in _NESTABLE:
+            raise
+        return _hash_nested(key)
+
+
+def _hash_nested(root):
+    """
+    Iterative hash for nested containers such as lists of dicts.
+    Hashable members are hashed directly; unhashable ones are replaced by their own hash, computed on an
+    explicit stack so deep nesting cannot hit the recursion limit. Sub-hashes are memoized by id for the
+    duration of the call, so a member shared by several containers is hashed once.
+    """
+    memo = dict()
+    expanding = set()
+    stack = [root]
+
+    while stack:
+        obj = stack[-1]
+        obj_id = id(obj)
+        if obj_id in memo:
+            stack.pop()
+            continue
+
+        is_dict = type(obj) is dict
+        hashes = []
+        pending = []
+        for member in (obj.values() if is_dict else obj):
+            member_id = id(member)
+            if member_id in memo:
+                hashes.append(memo[member_id])
+                continue
+            member_type = type(member)
+            if member_type not in _MUTABLE:
+                try:
+                    hashes.append(hash(member))
+                    continue
+                except TypeError:
+                    if member_type not in _NESTABLE:
+                        raise
+            if member_id in expanding:
+                raise ValueError("Cannot hash a container that contains itself")
+            pending.append(member)
+
+        if pending:
+            expanding.add(obj_id)
+            stack.extend(pending)
+            continue
+
+        stack.pop()
+        expanding.discard(obj_id)
+        if is_dict:
+            memo[obj_id] = hash(frozenset(zip(obj.keys(), hashes)))
+        elif type(obj) in (set, frozenset):
+            memo[obj_id] = hash(frozenset(hashes))
+        else:
+            memo[obj_id] = hash(tuple(hashes))
+
+    return memo[id(root)]
+
+
+def _mix(key_hash):
+    """
+    Bijective remix of a 64-bit hash (Fibonacci multiply, then xorshift), so keys that differ only in
+    a few bits or by a stride land in unrelated sets
+    """
+    mixed = (key_hash * 0x9E3779B97F4A7C15) & _MASK64
+    mixed ^= mixed >> 32
+    return mixed - (1 << 64) if mixed >= 1 << 63 else mixed
+
+
+class _VictimBuffer(OrderedDict):
+
+    def __init__(self, slots):
+        """
+        Fully-associative LRU buffer of entries evicted by put: key hash -> (tag, value, deadline),
+        least recently evicted first
+        :param slots: Number of entries kept
+        """
+        super().__init__()
+        self.slots = slots
+
+    def add(self, entry, deadlines):
+        """
+        Buffers an entry about to be evicted, dropping the oldest buffered entry if full
+        :param entry: [tag, value, key_hash] entry of a set
+        :param deadlines: tag -> deadline dict of the entry's set, or None
+        """
+        tag, value, key_hash = entry
+        self[key_hash] = (tag, value, deadlines.get(tag) if deadlines else None)
+        self.move_to_end(key_hash)
+        if len(self) > self.slots:
+            self.popitem(last=False)
+
+    def discard(self, key_hash):
+        self.pop(key_hash, None)
+
 
 class Cache:
 
-    def __init__(self, slots, size, alg="lru"):
+    _custom_hash = staticmethod(custom_hash)
+
+    def __init__(self, slots, size, alg="lru", key_tags=False, key_func=None, default_ttl=None, sweep_sets=0,
+                 clock=time.monotonic, max_bytes=None, max_set_bytes=None, sizer=None,
+                 stats=False, victim_slots=0, index="modulo", spill=None, admission=False):
         """
         :param slots: Number of slots; specifies the -way associativity of the cache
         :param size: Total number of slots in the cache
-        :param alg: String that determines algorithm type. Used by ReplacementAlgorithm. Default is LRU
+        :param alg: Replacement algorithm; a name registered in ReplacementAlgorithm ("lru", "mru", "fifo",
+            "clock", "lfu", "arc", "2q", "tinylfu", "gds"), a ReplacementAlgorithm subclass or an unused instance.
+            Default is LRU
+        :param key_tags: If True, tags are derived from the key alone. A key then has at most one entry,
+            put on an existing key replaces its value in place, and update neither hashes values nor
+            counts as a get. Default is False: tags hash key and value, as put documents
+        :param key_func: Optional function applied to every key before hashing, returning a cheaper
+            stand-in for it, e.g. operator.attrgetter("id") for objects identified by one attribute
+        :param default_ttl: Time to live of entries put without a ttl, in clock units (seconds by default).
+            Default is None: such entries never expire
+        :param sweep_sets: Number of sets every put sweeps for expired entries, see expire. Default is 0:
+            expired entries are only reclaimed lazily, when looked up or when their set is full
+        :param clock: Function returning the current time, default time.monotonic
+        :param max_bytes: Limit on the total size of all values. Before an insert, entries chosen by the
+            algorithm are evicted until the new value fits; a value larger than the limit is not cached.
+            Default is None: only slots limit capacity
+        :param max_set_bytes: Limit on the total size of the values in one set, enforced like max_bytes
+        :param sizer: Function returning the size of a value, default sys.getsizeof when a byte limit is
+            set. Sizes are also reported to the algorithm, which "gds" uses
+        :param stats: True to record statistics, see get_stats, or an unused CacheStats.CacheStats to record
+            them with other settings. Default is False: nothing is recorded beyond hits and misses
+        :param victim_slots: Size of a fully-associative LRU buffer catching entries evicted by put. A get
+            that misses its set but finds the key there moves it back and counts as a hit. Default is 0:
+            no buffer. Not supported together with byte limits
+        :param index: How keys map to sets, to spread keys that pile into a few sets:
+            "modulo": key hash % sets (default)
+            "mixed": a remix of the key hash % sets, which breaks up strided keys such as multiples of sets
+            "two_choice": column-associative; a key may live in its modulo set or in its mixed set, is
+                inserted into the one holding fewer entries and is looked up in both
+        :param spill: Unused SpillStore.SpillStore receiving entries evicted by put on disk instead of a
+            victim buffer; a get that misses the sets but finds the key there reads it back and counts as
+            a hit. Not supported together with byte limits
+        :param admission: True to filter new entries with an AdmissionFilter.AdmissionFilter, or an unused
+            AdmissionFilter to filter them with other settings: a put that would evict from a full set is
+            dropped unless the key was put often enough recently. Default is False: every put is admitted
         """
+        if index not in _INDEXES:
+            raise ValueError("Unknown index: %s; use one of %s" % (index, ", ".join(_INDEXES)))
+        if (victim_slots or spill is not None) and (max_bytes is not None or max_set_bytes is not None):
+            raise ValueError("victim_slots and spill cannot be combined with byte limits")
+        if victim_slots and spill is not None:
+            raise ValueError("Use either victim_slots or spill")
+
         self._slots = slots
-        self._size = size
         self._sets = int(size/slots)
         self._hits = 0
         self._misses = 0
+        self._key_func = key_func
+        if key_func is None:
+            hash_key = custom_hash
+        else:
+            hash_key = lambda key: custom_hash(key_func(key))
+        self._index = index
+        self._hash_key = (lambda key: _mix(hash_key(key))) if index == "mixed" else hash_key
+
+        self._repl_alg = ReplacementAlgorithm.create(alg, self._sets, self._slots)
+        self._key_tags = key_tags
+        self._default_ttl = default_ttl
+        self._sweep_sets = sweep_sets
+        self._clock = clock
+        if sizer is None and (max_bytes is not None or max_set_bytes is not None):
+            sizer = sys.getsizeof
+        self._byte_limits = (max_bytes, max_set_bytes)
+        # sizes of values are measured only with a sizer
+        self._sizer = sizer
+        self._allocate_sets()
+
+        # sets of a lazily loaded snapshot not read yet, see load
+        self._unloaded = None
+        # (mapped file, set table offset, serializer, epoch) of the snapshot passed to load
+        self._snapshot = None
+        # the cache as it was before a resize, until all of its sets are moved, see resize
+        self._resizing = None
+
+        if stats is True:
+            stats = CacheStats.CacheStats()
+        self._stats = stats.bind(self._sets, self._sets * self._slots) if stats else None
+        # receives entries evicted by put through add: a _VictimBuffer, a SpillStore, or the demotion
+        # queue of a CacheHierarchy level
+        self._victims = _VictimBuffer(victim_slots) if victim_slots else None
+        if spill is not None:
+            self._victims = spill.bind(clock)
+
+        if admission is True:
+            admission = AdmissionFilter.AdmissionFilter()
+        self._admission = admission.bind(self._sets * self._slots) if admission else None
 
-        self._repl_alg = ReplacementAlgorithm.ReplacementAlgorithm(alg, self._sets)
-        self._cache = [list() for _ in range(self._sets)]
+        if self._stats is not None and self._stats.sample_every:
+            # instance attributes shadow the methods, so caches without stats never check for timing
+            self.get = self._stats.timed("get", self.get)
+            self.put = self._stats.timed("put", self.put)
 
-    def put(self, key, value):
+    def put(self, key, value, ttl=None):
         """
-        Stores data as a 2-item list [tag, value].
-        Tag is calculated by hashing combination of key and value.
+        Stores data as a 3-item list [tag, value, key_hash].
+        Tag is calculated by hashing combination of key and value, or from the key alone with key_tags.
         Use update to update an entry with an existing key.
         :param key: Key to use for cache access
         :param value: Value to store in cache
+        :param ttl: Time to live of the entry; once it passes, the entry is no longer returned and its slot
+            is reused before any live entry is evicted. Default is the cache's default_ttl
         """
-        set_num = self._get_set_num(key)
-        tag = self._custom_hash((self._custom_hash(key), self._custom_hash(value)))
-
-        if len(self._cache[set_num]) < self._slots:
-            # set has space, append to set
-            self._cache[set_num].append([tag, value])
-            self._repl_alg.update_alg_struct(set_num, tag)
-        else:
-            # set is full, evict based on algorithm
-            evict_i = self._repl_alg.get_index_to_evict(self._cache[set_num], set_num, self._slots)
-            old_tag = self._cache[set_num][evict_i][0]
-            self._cache[set_num][evict_i] = [tag, value]
-            self._repl_alg.update_alg_struct_on_evict(set_num, old_tag, tag)
+        key_hash = self._hash_key(key)
+        self._put(key_hash, self._get_tag(key_hash, value), value, self._default_ttl if ttl is None else ttl)
+        if self._sweep_sets:
+            self.expire(self._sweep_sets)
 
     def update(self, key, new_value):
         """
         Updates an existing entry in the cache.
-        Tag is calculated by hashing a combination of key and old_value
+        Tag is calculated by hashing a combination of key and new_value
         :param key: Specifies which entry to be replaced
         :param new_value: Value to store in entry, replacing old_value
         :return: Set number the value was stored in, or -1 if key was not found
         """
-        set_num = self._get_set_num(key)
-        old_value = self.get(key)
-
-        if old_value is None:
-            return -1
-
-        old_tag = self._custom_hash((self._custom_hash(key), self._custom_hash(old_value)))
-        new_tag = self._custom_hash((self._custom_hash(key), self._custom_hash(new_value)))
+        return self._update(self._hash_key(key), new_value)
 
-        for entry in self._cache[set_num]:
-            if entry[0] == old_tag:
-                entry[0] = new_tag
-                entry[1] = new_value
-                self._repl_alg.update_alg_struct_on_evict(set_num, old_tag, new_tag)
-                return set_num
-
-    def get(self, key):
+    def get(self, key, default=None):
         """
         Gets value in cache given key
-        :return: Value corresponding to key, or None if no matching key
+        :param default: Returned if no entry matches key; pass a sentinel object to tell a cached None
+            apart from a miss
+        :return: Value corresponding to key, or default if no matching key
         """
-        set_num = self._get_set_num(key)
-
-        for entry in self._cache[set_num]:
-            tag = self._custom_hash((self._custom_hash(key), self._custom_hash(entry[1])))
-
-            if entry[0] == tag:
-                self._hits += 1
-                self._repl_alg.update_alg_struct(set_num, tag)
-                return entry[1]
-
-        self._misses += 1
-        return None
+        return self._get(self._hash_key(key), default)
 
     def remove(self, key):
         """
         Removes entry from cache given key
         :return: Value corresponding to key if successful, or None if no matching key
         """
-        set_num = self._get_set_num(key)
+        return self._remove(self._hash_key(key))
 
-        for i in range(len(self._cache[set_num])):
-            tag = self._custom_hash((self._custom_hash(key), self._custom_hash(self._cache[set_num][i][1])))
+    def get_many(self, keys):
+        """
+        Gets values for several keys; equivalent to calling get for each key in order.
+        Keys are hashed in one pass. Unless lookups can reach beyond the key's set or have side effects
+        (ttls, a snapshot not read yet, statistics, a victim buffer or spill store, two_choice indexing,
+        a resize in progress), every hit is then handed to the algorithm in one call, in the order of keys.
+        :param keys: Iterable of keys
+        :return: List of values in the same order as keys, None for keys that were not found
+        """
+        return self._get_many(self._hash_keys(keys))
 
-            if self._cache[set_num][i][0] == tag:
-                self._repl_alg.update_alg_struct_on_remove(set_num, tag)
-                return self._cache[set_num].pop(i)[1]
+    def put_many(self, items, ttl=None):
+        """
+        Stores several key/value pairs; equivalent to calling put for each pair in order.
+        Only hashing is batched: every pair is then stored as put stores it, since the victim of each put
+        depends on the puts before it.
+        :param items: Iterable of (key, value) pairs, e.g. dict.items()
+        :param ttl: Time to live of every entry, as for put
+        """
+        items = list(items)
+        values = [value for _, value in items]
+        key_hashes = self._hash_keys([key for key, _ in items])
+        self._put_many(key_hashes, self._get_tags(key_hashes, values), values,
+                       self._default_ttl if ttl is None else ttl)
+        if self._sweep_sets:
+            self.expire(self._sweep_sets)
 
-        return None
+    def remove_many(self, keys):
+        """
+        Removes several keys; equivalent to calling remove for each key in order. Only hashing is batched.
+        :param keys: Iterable of keys
+        :return: List of removed values in the same order as keys, None for keys that were not found
+        """
+        return self._remove_many(self._hash_keys(keys))
 
     def clear(self):
         """
         Clears entire cache, removing all entries
         """
-        for cache_set in self._cache:
-            cache_set.clear()
+        self._allocate_sets()
+        self._close_snapshot()
+        if self._resizing is not None:
+            self._resizing._close_snapshot()
+            self._resizing = None
+        if self._stats is not None:
+            self._stats.record_clear()
+        if self._victims is not None:
+            self._victims.clear()
+        if self._admission is not None:
+            self._admission.clear()
 
         self._repl_alg.clear_alg_struct()
         self._hits = 0
         self._misses = 0
 
+    def expire(self, max_sets=None):
+        """
+        Reclaims the slots of expired entries. Each call sweeps the sets following the ones swept by the
+        previous call, so calling it with a small max_sets bounds the work to max_sets * slots entries.
+        :param max_sets: Number of sets to sweep, default is all of them
+        :return: Number of entries reclaimed
+        """
+        if (max_sets is None or max_sets >= self._sets) and self._resizing is not None:
+            self._migrate_all()
+        if not self._deadlines:
+            return 0
+        if max_sets is None or max_sets >= self._sets:
+            return sum(self._sweep_set(set_num) for set_num in list(self._deadlines))
+
+        reclaimed = 0
+        for _ in range(max_sets):
+            set_num = self._sweep_cursor
+            self._sweep_cursor = (set_num + 1) % self._sets
+            if set_num in self._deadlines:
+                reclaimed += self._sweep_set(set_num)
+        return reclaimed
+
+    def resize(self, new_size, new_slots=None, step=1):
+        """
+        Changes the capacity of the cache without rehashing every entry at once. The cache switches to
+        the new geometry right away and moves the sets of the old one over incrementally: every later
+        operation first moves the old sets its key may be in, then the next step old sets in order, so
+        lookups see entries of both layouts and each operation does at most (2 + step) * slots moves.
+        Entries are put again in the order the algorithm exports, so e.g. LRU recency is kept, and keep
+        their remaining ttl. When the new sets have fewer slots than needed, entries are evicted as by
+        put; moved entries are neither counted as puts nor checked by an admission filter, and byte
+        limits only cover the entries moved so far. Statistics are adapted with CacheStats.resize.
+        Resizing again while the previous resize is still in progress, saving and expire over all sets
+        first move every old set.
+        :param new_size: New total number of slots
+        :param new_slots: New number of slots per set, default the current number
+        :param step: Number of old sets moved per operation besides the ones its key may be in, at least 1
+        """
+        if step < 1:
+            raise ValueError("step must be at least 1, or the resize would never finish")
+        if self._resizing is not None:
+            self._migrate_all()
+        new_slots = self._slots if new_slots is None else new_slots
+
+        import copy
+
+        old = copy.copy(self)
+        # the old layout only gives up entries; buffered victims, statistics and admission stay here
+        old._victims = old._stats = old._admission = None
+        old._sweep_cursor = 0
+        old._sweep_sets = step
+
+        self._slots = new_slots
+        self._sets = int(new_size/new_slots)
+        self._repl_alg = self._repl_alg.resized(self._sets, self._slots)
+        self._allocate_sets()
+        self._unloaded = None
+        self._snapshot = None
+        if self._stats is not None:
+            self._stats.resize(self._sets, self._sets * self._slots)
+        self._resizing = old
+
+    def save(self, path, serializer=None):
+        """
+        Writes the cache to a binary snapshot file, replacing path atomically.
+        The file holds the configuration, counters and algorithm settings, a table of set offsets, then
+        one block per non-empty set with its entries, serialized values and algorithm state. Expired
+        entries are dropped, remaining ttls are stored as durations, and neither the victim buffer nor
+        a spill store is saved.
+        :param path: File to write
+        :param serializer: Object with dumps and loads functions used for values, default pickle
+        """
+        import copy
+        import pickle
+        import tempfile
+
+        if serializer is None:
+            serializer = pickle
+        self._migrate_all()
+        self._load_all()
+        for set_num in list(self._deadlines):
+            self._expire_set(set_num)
+        alg = copy.copy(self._repl_alg)
+        alg._state = None
+        metadata = pickle.dumps({
+            "slots": self._slots,
+            "size": self._sets * self._slots,
+            "alg": alg,
+            "key_tags": self._key_tags,
+            "default_ttl": self._default_ttl,
+            "sweep_sets": self._sweep_sets,
+            "max_bytes": self._byte_limits[0],
+            "max_set_bytes": self._byte_limits[1],
+            "victim_slots": self._victims.slots if self._victims is not None else 0,
+            "index": self._index,
+            "hits": self.get_hits(),
+            "misses": self.get_misses(),
+            "evict_cursor": self._evict_cursor,
+            "saved_at": time.time(),
+        }, pickle.HIGHEST_PROTOCOL)
+        table = bytearray(self._sets * _SNAPSHOT_SET.size)
+        now = self._clock()
+
+        # a unique file in the same directory, so concurrent saves never mix and os.replace stays atomic
+        descriptor, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "wb") as snapshot:
+                snapshot.write(_SNAPSHOT_HEADER.pack(_SNAPSHOT_MAGIC, len(metadata)))
+                snapshot.write(metadata)
+                table_offset = snapshot.tell()
+                snapshot.write(table)
+
+                for set_num, cache_set in enumerate(self._cache):
+                    if not cache_set:
+                        continue
+                    deadlines = self._deadlines.get(set_num, {})
+                    parts = [None]
+                    for tag, value, key_hash in cache_set:
+                        data = serializer.dumps(value)
+                        ttl = deadlines[tag] - now if tag in deadlines else -1.0
+                        parts.append(_SNAPSHOT_ENTRY.pack(tag, key_hash, ttl, len(data)))
+                        parts.append(data)
+                    state = pickle.dumps(self._repl_alg.export_set_state(set_num), pickle.HIGHEST_PROTOCOL)
+                    parts[0] = _SNAPSHOT_BLOCK.pack(len(cache_set), len(state))
+                    parts.append(state)
+                    block = b"".join(parts)
+                    _SNAPSHOT_SET.pack_into(table, set_num * _SNAPSHOT_SET.size, snapshot.tell(), len(block))
+                    snapshot.write(block)
+
+                snapshot.seek(table_offset)
+                snapshot.write(table)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path, serializer=None, lazy=True, **kwargs):
+        """
+        Restores a cache written by save. With lazy, the file is memory-mapped and each set is read and
+        its values deserialized on first access, so warm start costs time proportional to the sets
+        touched; the file must not be replaced in place while the cache still reads from it.
+        Functions are not saved: pass key_func, clock and sizer again if the saved cache used them. The
+        algorithm is saved with its settings, so a function among them, such as the cost of gds, must be
+        picklable: save raises pickle.PicklingError for a lambda or a nested function.
+        :param path: Snapshot file
+        :param serializer: Serializer the snapshot was saved with, default pickle
+        :param lazy: If False, read every set now and close the file
+        :param kwargs: Constructor options overriding the saved ones
+        :return: New cache
+        """
+        import mmap
+        import pickle
+
+        if serializer is None:
+            serializer = pickle
+        with open(path, "rb") as snapshot:
+            mapped = mmap.mmap(snapshot.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, metadata_length = _SNAPSHOT_HEADER.unpack_from(mapped, 0)
+        if magic != _SNAPSHOT_MAGIC:
+            mapped.close()
+            raise ValueError("%s is not a cache snapshot" % path)
+        metadata = pickle.loads(mapped[_SNAPSHOT_HEADER.size:_SNAPSHOT_HEADER.size + metadata_length])
+
+        options = {name: metadata[name] for name in
+                   ("key_tags", "default_ttl", "sweep_sets", "max_bytes", "max_set_bytes", "victim_slots", "index")}
+        options.update(kwargs)
+        alg = metadata["alg"]
+        settings = {name: value for name, value in vars(alg).items() if name != "_state"}
+        sa_cache = cls(metadata["slots"], metadata["size"], alg, **options)
+        # bind may reset members such as TinyLFU's frequency sketch; put the saved ones back
+        vars(sa_cache._repl_alg).update(settings)
+        sa_cache._hits = metadata["hits"]
+        sa_cache._misses = metadata["misses"]
+        sa_cache._evict_cursor = metadata.get("evict_cursor", 0) % sa_cache._sets
+
+        # saved ttls count down from the time of the save
+        epoch = sa_cache._clock() - (time.time() - metadata["saved_at"])
+        sa_cache._snapshot = (mapped, _SNAPSHOT_HEADER.size + metadata_length, serializer, epoch)
+        sa_cache._unloaded = bytearray(b"\x01") * sa_cache._sets
+        if not lazy:
+            sa_cache._load_all()
+        return sa_cache
+
+    def get_stats(self):
+        """
+        :return: The CacheStats.CacheStats recording this cache's statistics, or None without stats.
+            Statistics are kept across clear
+        """
+        return self._stats
+
+    def get_admission(self):
+        """
+        :return: The AdmissionFilter.AdmissionFilter deciding which puts may evict, or None without one
+        """
+        return self._admission
+
+    def get_bytes(self):
+        """
+        :return: Total size of the cached values as measured by the sizer, or 0 if sizes are not measured
+        """
+        if self._sizes is None:
+            return 0
+        if self._resizing is not None:
+            return sum(self._set_bytes) + sum(self._resizing._set_bytes)
+        return sum(self._set_bytes)
+
     def get_hits(self):
         """
         :return: Number of cache hits
@@ -121,21 +566,640 @@ class Cache:
         """
         return self._misses
 
-    def _custom_hash(self, key):
+    def _get_set_num(self, key):
+        """
+        :return: Set index number given key
+        """
+        return self._hash_key(key) % self._sets
+
+    def _get_tag(self, key_hash, value):
         """
-        Recursive hash function that handles keys that are lists, sets, dicts
+        :return: Tag of an entry storing value under a key with the given hash
         """
-        if type(key) is list:
-            return self._custom_hash(tuple(key))
-        elif type(key) is set:
-            return self._custom_hash(frozenset(key))
-        elif type(key) is dict:
-            return self._custom_hash(frozenset(key.items()))
+        if self._key_tags:
+            return key_hash
+        return self._custom_hash((key_hash, self._custom_hash(value)))
+
+    def _get_tags(self, key_hashes, values):
+        """
+        :return: List of _get_tag for every key hash and value
+        """
+        if self._key_tags:
+            return key_hashes
+        return list(map(hash, zip(key_hashes, self._hash_many(values))))
+
+    def _put(self, key_hash, tag, value, ttl=None, admit=True):
+        """
+        put for an already hashed key and tag
+        :param admit: False to store the entry even if the admission filter would drop it, for entries
+            that were cached already
+        :return: Set number the entry was put in
+        """
+        set_num = key_hash % self._sets
+        if self._resizing is not None:
+            self._migrate(key_hash)
+        if self._unloaded is not None and self._unloaded[set_num]:
+            self._load_set(set_num)
+        i = self._tags[set_num].get(tag)
+        if i is None and self._index == "two_choice":
+            set_num, i = self._choose_set(key_hash, tag, set_num)
+        if self._victims is not None:
+            # a buffered entry is outdated by this put
+            self._victims.discard(key_hash)
+        cache_set = self._cache[set_num]
+
+        if self._sizes is not None:
+            size = self._sizer(value)
+            if i is None and not self._make_room(set_num, tag, size):
+                return set_num
+            i = self._tags[set_num].get(tag)
+
+        if i is not None:
+            # with key tags this is an upsert of the key's value; otherwise the identical key/value
+            # pair is already cached, so refresh it instead of storing a duplicate
+            cache_set[i][1] = value
+            self._repl_alg.update_alg_struct(set_num, tag)
+        elif len(cache_set) < self._slots or (self._deadlines and self._expire_set(set_num)):
+            # set has space, or expired entries were reclaimed to make some; append to set
+            if cache_set is _UNTOUCHED_SET:
+                cache_set = self._touch_set(set_num)
+            cache_set.append([tag, value, key_hash])
+            self._index_entry(set_num, len(cache_set) - 1)
+            self._repl_alg.update_alg_struct_on_insert(set_num, tag)
         else:
-            return hash(key)
+            # set is full, evict based on algorithm unless the new entry is not worth it
+            if admit and self._admission is not None and not self._admission.admit(key_hash):
+                return set_num
+            old_tag = self._repl_alg.get_tag_to_evict(set_num, tag)
+            evict_i = self._tags[set_num][old_tag]
+            if self._victims is not None:
+                self._victims.add(cache_set[evict_i], self._deadlines.get(set_num) if self._deadlines else None)
+            self._unindex_entry(set_num, evict_i)
+            cache_set[evict_i] = [tag, value, key_hash]
+            self._index_entry(set_num, evict_i)
+            self._repl_alg.update_alg_struct_on_evict(set_num, old_tag, tag)
+            if self._stats is not None:
+                self._stats.record_eviction(set_num)
 
-    def _get_set_num(self, key):
+        if self._stats is not None:
+            self._stats.record_put(set_num, key_hash, i is None)
+
+        if ttl is not None:
+            self._set_deadline(set_num, tag, ttl)
+        elif self._deadlines:
+            self._clear_deadline(set_num, tag)
+        if self._sizes is not None:
+            # a value that grew in place may push the set over its limits
+            self._resize_entry(set_num, tag, size)
+            self._make_room(set_num, tag, 0)
+        return set_num
+
+    def _update(self, key_hash, new_value):
         """
-        :return: Set index number given key
+        update for an already hashed key
+        """
+        if self._key_tags:
+            set_num, i = self._locate(key_hash)
+            if i is None:
+                return -1
+            self._cache[set_num][i][1] = new_value
+            if self._stats is not None:
+                self._stats.record_update(set_num)
+            if self._sizes is not None:
+                self._resize_entry(set_num, key_hash, self._sizer(new_value))
+                self._make_room(set_num, key_hash, 0)
+            return set_num
+
+        if self._get(key_hash) is None:
+            return -1
+
+        set_num = key_hash % self._sets
+        i = self._keys[set_num].get(key_hash)
+        if i is None:
+            # _get found the key in its other set or restored it from the victim buffer
+            set_num, i = self._find_elsewhere(key_hash, set_num)
+        entry = self._cache[set_num][i]
+        old_tag = entry[0]
+        new_tag = self._get_tag(key_hash, new_value)
+
+        if new_tag != old_tag and new_tag in self._tags[set_num]:
+            # another entry already holds this key/value pair, drop the stale one
+            self._repl_alg.update_alg_struct_on_remove(set_num, old_tag)
+            self._remove_entry(set_num, i)
+            return set_num
+
+        del self._tags[set_num][old_tag]
+        self._tags[set_num][new_tag] = i
+        if self._deadlines:
+            # the entry keeps its deadline under the new tag
+            deadlines = self._deadlines.get(set_num)
+            if deadlines and old_tag in deadlines:
+                deadlines[new_tag] = deadlines.pop(old_tag)
+        entry[0] = new_tag
+        entry[1] = new_value
+        self._repl_alg.update_alg_struct_on_update(set_num, old_tag, new_tag)
+        if self._stats is not None:
+            self._stats.record_update(set_num)
+        if self._sizes is not None:
+            sizes = self._sizes[set_num]
+            sizes[new_tag] = sizes.pop(old_tag)
+            self._resize_entry(set_num, new_tag, self._sizer(new_value))
+            self._make_room(set_num, new_tag, 0)
+        return set_num
+
+    def _get(self, key_hash, default=None):
+        """
+        get for an already hashed key
+        """
+        set_num, i = self._locate(key_hash)
+        if i is None:
+            self._misses += 1
+            if self._stats is not None:
+                self._stats.record_miss(set_num, key_hash)
+            return default
+
+        entry = self._cache[set_num][i]
+        self._hits += 1
+        if self._stats is not None:
+            self._stats.record_hit(set_num, key_hash)
+        self._repl_alg.update_alg_struct(set_num, entry[0])
+        return entry[1]
+
+    def _remove(self, key_hash):
+        """
+        remove for an already hashed key
+        """
+        set_num, i = self._locate(key_hash)
+        if i is None:
+            return None
+
+        entry = self._cache[set_num][i]
+        self._repl_alg.update_alg_struct_on_remove(set_num, entry[0])
+        self._remove_entry(set_num, i)
+        if self._stats is not None:
+            self._stats.record_remove(set_num, key_hash)
+        return entry[1]
+
+    def _locate(self, key_hash):
+        """
+        Finds the entry under key_hash without counting a get or updating the algorithm
+        :return: (set number, index in set) of the entry, with index None if key_hash is not cached
+        """
+        set_num = key_hash % self._sets
+        if self._resizing is not None:
+            self._migrate(key_hash)
+        if self._unloaded is not None and self._unloaded[set_num]:
+            self._load_set(set_num)
+        i = self._keys[set_num].get(key_hash)
+        if i is not None and self._deadlines:
+            i = self._skip_expired(set_num, key_hash, i)
+        if i is None and (self._victims is not None or self._index == "two_choice"):
+            set_num, i = self._find_elsewhere(key_hash, set_num)
+        return set_num, i
+
+    def _remaining_ttl(self, set_num, i):
+        """
+        :return: Time left before the entry at index i of set_num expires, or None if it never does
+        """
+        if not self._deadlines:
+            return None
+        deadline = self._deadlines.get(set_num, {}).get(self._cache[set_num][i][0])
+        return None if deadline is None else deadline - self._clock()
+
+    def _hash_keys(self, keys):
+        """
+        :return: List of _hash_key for every key
+        """
+        if self._key_func is not None:
+            keys = list(map(self._key_func, keys))
+        if self._index == "mixed":
+            return list(map(_mix, self._hash_many(keys)))
+        return self._hash_many(keys)
+
+    def _hash_many(self, objects):
+        """
+        :return: List of _custom_hash for every object, hashed in C when none is a list, set or dict
+        """
+        try:
+            # _custom_hash is hash for every hashable object
+            return list(map(hash, objects))
+        except TypeError:
+            return list(map(self._custom_hash, objects))
+
+    def _get_many(self, key_hashes):
+        """
+        get_many for already hashed keys.
+        Lookups do not depend on algorithm state, so hits are handed to the algorithm in one batch afterwards.
+        """
+        if (self._deadlines or self._unloaded is not None or self._stats is not None or self._victims is not None
+                or self._index == "two_choice" or self._resizing is not None):
+            # lookups may reclaim expired entries, read snapshot sets or move entries between sets, which
+            # the algorithm must see before later hits, and statistics are recorded per lookup
+            return list(map(self._get, key_hashes))
+
+        sets = self._sets
+        all_keys = self._keys
+        all_sets = self._cache
+        results = []
+        hit_sets = []
+        hit_tags = []
+
+        for key_hash in key_hashes:
+            set_num = key_hash % sets
+            i = all_keys[set_num].get(key_hash)
+            if i is None:
+                results.append(None)
+            else:
+                entry = all_sets[set_num][i]
+                hit_sets.append(set_num)
+                hit_tags.append(entry[0])
+                results.append(entry[1])
+
+        self._repl_alg.update_alg_struct_batch(hit_sets, hit_tags)
+        self._hits += len(hit_tags)
+        self._misses += len(key_hashes) - len(hit_tags)
+        return results
+
+    def _put_many(self, key_hashes, tags, values, ttl=None):
+        """
+        put_many for already hashed keys and tags
+        """
+        put = self._put
+        for key_hash, tag, value in zip(key_hashes, tags, values):
+            put(key_hash, tag, value, ttl)
+
+    def _remove_many(self, key_hashes):
+        """
+        remove_many for already hashed keys
+        """
+        return list(map(self._remove, key_hashes))
+
+    def _index_entry(self, set_num, i):
+        """
+        Adds the entry at slot i to the set's key and tag indexes.
+        The key index always points at the lowest slot holding that key, matching a front-to-back scan.
+        """
+        tag, _, key_hash = self._cache[set_num][i]
+        keys = self._keys[set_num]
+        self._tags[set_num][tag] = i
+
+        first = keys.get(key_hash)
+        if first is None or first == i:
+            # first == i when the indexes are shared under key tags
+            keys[key_hash] = i
+        else:
+            self._duplicates[set_num] += 1
+            if i < first:
+                keys[key_hash] = i
+
+    def _unindex_entry(self, set_num, i):
+        """
+        Removes the entry at slot i from the set's key and tag indexes.
+        """
+        cache_set = self._cache[set_num]
+        tag, _, key_hash = cache_set[i]
+        keys = self._keys[set_num]
+        first = keys[key_hash]
+        del self._tags[set_num][tag]
+        if self._deadlines:
+            self._clear_deadline(set_num, tag)
+        if self._sizes is not None:
+            size = self._sizes[set_num].pop(tag)
+            self._set_bytes[set_num] -= size
+            self._bytes -= size
+
+        if first != i:
+            # entry was shadowed by an earlier one with the same key
+            self._duplicates[set_num] -= 1
+            return
+
+        keys.pop(key_hash, None)
+        if self._duplicates[set_num]:
+            for j in range(len(cache_set)):
+                if j != i and cache_set[j][2] == key_hash:
+                    keys[key_hash] = j
+                    self._duplicates[set_num] -= 1
+                    break
+
+    def _remove_entry(self, set_num, i):
+        """
+        Removes the entry at slot i, moving the last entry of the set into its place.
+        """
+        cache_set = self._cache[set_num]
+        self._unindex_entry(set_num, i)
+        last = cache_set.pop()
+
+        if i < len(cache_set):
+            cache_set[i] = last
+            self._tags[set_num][last[0]] = i
+            keys = self._keys[set_num]
+            if keys[last[2]] > i:
+                keys[last[2]] = i
+
+    def _set_deadline(self, set_num, tag, ttl):
+        deadlines = self._deadlines.get(set_num)
+        if deadlines is None:
+            deadlines = self._deadlines[set_num] = dict()
+        deadlines[tag] = self._clock() + ttl
+
+    def _clear_deadline(self, set_num, tag):
+        deadlines = self._deadlines.get(set_num)
+        if deadlines and tag in deadlines:
+            del deadlines[tag]
+            if not deadlines:
+                del self._deadlines[set_num]
+
+    def _skip_expired(self, set_num, key_hash, i):
+        """
+        :return: i if the entry at slot i is live, else the slot of the key after reclaiming the set's
+            expired entries, or None
+        """
+        deadlines = self._deadlines.get(set_num)
+        tag = self._cache[set_num][i][0]
+        if deadlines and tag in deadlines and deadlines[tag] <= self._clock():
+            self._expire_set(set_num)
+            return self._keys[set_num].get(key_hash)
+        return i
+
+    def _sweep_set(self, set_num):
+        """
+        One set of an expire sweep; subclasses add their locking here
         """
-        return self._custom_hash(key) % self._sets
+        return self._expire_set(set_num)
+
+    def _expire_set(self, set_num):
+        """
+        Removes every expired entry of a set.
+        :return: Number of entries removed
+        """
+        deadlines = self._deadlines.get(set_num)
+        if not deadlines:
+            return 0
+        now = self._clock()
+        expired = [tag for tag, deadline in deadlines.items() if deadline <= now]
+        for tag in expired:
+            self._repl_alg.update_alg_struct_on_remove(set_num, tag)
+            self._remove_entry(set_num, self._tags[set_num][tag])
+        if self._stats is not None and expired:
+            self._stats.record_expirations(set_num, len(expired))
+        return len(expired)
+
+    def _allocate_sets(self):
+        """
+        Creates empty per-set structures for the current number of sets. A set gets its own entry list
+        and index dicts when its first entry is put, so creating even a large cache allocates no object
+        per set
+        """
+        sets = self._sets
+        self._cache = [_UNTOUCHED_SET] * sets
+
+        # per-set indexes so lookups never rehash stored values
+        # keys: key hash -> slot of the first entry with that key
+        # tags: tag -> slot
+        self._keys = [_UNTOUCHED_INDEX] * sets
+        # with key tags, tag == key hash, so both indexes share one dict per set
+        self._tags = self._keys if self._key_tags else [_UNTOUCHED_INDEX] * sets
+        # per set, number of entries shadowed by an earlier entry with the same key
+        self._duplicates = [0] * sets
+
+        # set -> {tag: deadline}, only for sets holding entries with a ttl
+        self._deadlines = dict()
+        self._sweep_cursor = 0
+
+        # per set, tag -> size of the entry's value, only when sizes are measured
+        self._sizes = None if self._sizer is None else [_UNTOUCHED_INDEX] * sets
+        self._set_bytes = None if self._sizes is None else [0] * sets
+        self._bytes = 0
+        self._evict_cursor = 0
+
+    def _touch_set(self, set_num):
+        """
+        Gives a set that never held an entry its own structures, before its first entry is stored
+        :return: The set's entry list
+        """
+        cache_set = self._cache[set_num] = list()
+        self._keys[set_num] = dict()
+        if not self._key_tags:
+            self._tags[set_num] = dict()
+        if self._sizes is not None:
+            self._sizes[set_num] = dict()
+        self._repl_alg.allocate_set(set_num)
+        return cache_set
+
+    def _load_set(self, set_num):
+        """
+        Reads one set of the snapshot passed to load
+        """
+        import pickle
+
+        self._unloaded[set_num] = 0
+        mapped, table, serializer, epoch = self._snapshot
+        offset, length = _SNAPSHOT_SET.unpack_from(mapped, table + set_num * _SNAPSHOT_SET.size)
+        if not length:
+            return
+
+        loads = serializer.loads
+        cache_set = self._cache[set_num]
+        if cache_set is _UNTOUCHED_SET:
+            cache_set = self._touch_set(set_num)
+        count, state_length = _SNAPSHOT_BLOCK.unpack_from(mapped, offset)
+        position = offset + _SNAPSHOT_BLOCK.size
+        for _ in range(count):
+            tag, key_hash, ttl, value_length = _SNAPSHOT_ENTRY.unpack_from(mapped, position)
+            position += _SNAPSHOT_ENTRY.size
+            cache_set.append([tag, loads(mapped[position:position + value_length]), key_hash])
+            position += value_length
+            self._index_entry(set_num, len(cache_set) - 1)
+            if ttl >= 0:
+                self._set_deadline(set_num, tag, epoch + ttl - self._clock())
+        self._repl_alg.import_set_state(set_num, pickle.loads(mapped[position:position + state_length]))
+        if self._sizes is not None:
+            # the imported state already holds the sizes, and reporting them again would reset gds priorities
+            sizes = self._sizes[set_num]
+            for tag, value, _ in cache_set:
+                sizes[tag] = self._sizer(value)
+            set_bytes = sum(sizes.values())
+            self._set_bytes[set_num] = set_bytes
+            self._bytes += set_bytes
+            self._make_room(set_num, None, 0)
+
+    def _load_all(self):
+        """
+        Reads every set of the snapshot passed to load not read yet, and closes it
+        """
+        if self._unloaded is not None:
+            for set_num in range(self._sets):
+                if self._unloaded[set_num]:
+                    self._load_set(set_num)
+            self._close_snapshot()
+
+    def _close_snapshot(self):
+        if self._snapshot is not None:
+            self._snapshot[0].close()
+        self._snapshot = None
+        self._unloaded = None
+
+    def _resize_entry(self, set_num, tag, size):
+        """
+        Records the size of an entry's value and reports it to the algorithm
+        """
+        sizes = self._sizes[set_num]
+        delta = size - sizes.get(tag, 0)
+        sizes[tag] = size
+        self._set_bytes[set_num] += delta
+        self._bytes += delta
+        self._repl_alg.update_alg_struct_on_resize(set_num, tag, size)
+
+    def _make_room(self, set_num, new_tag, size):
+        """
+        Evicts entries until a value of the given size fits within max_set_bytes and max_bytes, starting
+        with expired entries and the set's own victims. Other sets give up victims only when the set is
+        empty and the cache is still over max_bytes.
+        :return: False if the value is larger than a limit by itself
+        """
+        max_bytes, max_set_bytes = self._byte_limits
+        if (max_set_bytes is not None and size > max_set_bytes) or (max_bytes is not None and size > max_bytes):
+            return False
+
+        if max_set_bytes is not None:
+            while self._set_bytes[set_num] + size > max_set_bytes:
+                self._evict(set_num, new_tag)
+        if max_bytes is not None:
+            while self._bytes + size > max_bytes:
+                self._evict(set_num if self._set_bytes[set_num] else self._next_victim_set(), new_tag)
+        return True
+
+    def _evict(self, set_num, new_tag):
+        """
+        Removes the set's expired entries if it has any, else the algorithm's victim
+        """
+        if self._deadlines and self._expire_set(set_num):
+            return
+        tag = self._repl_alg.get_tag_to_evict(set_num, new_tag)
+        self._repl_alg.update_alg_struct_on_remove(set_num, tag)
+        self._remove_entry(set_num, self._tags[set_num][tag])
+        if self._stats is not None:
+            self._stats.record_eviction(set_num)
+
+    def _next_victim_set(self):
+        """
+        :return: Next set after the last one returned that holds any bytes, round robin
+        """
+        set_num = self._evict_cursor
+        while not self._set_bytes[set_num]:
+            set_num = (set_num + 1) % self._sets
+        self._evict_cursor = (set_num + 1) % self._sets
+        return set_num
+
+    def _migrate(self, key_hash):
+        """
+        Moves the old sets key_hash may be in, unless it is None, and the next sets of the sweep over the
+        old layout into the cache, finishing the resize once the sweep is through
+        """
+        old = self._resizing
+        stats = self._stats
+        admission = self._admission
+        # moved entries are put without migrating again, recording statistics or passing admission
+        self._resizing = self._stats = self._admission = None
+        try:
+            if key_hash is not None:
+                self._move_set(old, key_hash % old._sets)
+                if old._index == "two_choice":
+                    self._move_set(old, _mix(key_hash) % old._sets)
+            for _ in range(old._sweep_sets):
+                if old._sweep_cursor == old._sets:
+                    break
+                self._move_set(old, old._sweep_cursor)
+                old._sweep_cursor += 1
+        finally:
+            self._stats = stats
+            self._admission = admission
+            if old._sweep_cursor < old._sets:
+                self._resizing = old
+            else:
+                old._close_snapshot()
+
+    def _migrate_all(self):
+        """
+        Moves every set of the old layout not moved yet, finishing a resize in progress
+        """
+        if self._resizing is not None:
+            self._resizing._sweep_sets = self._resizing._sets
+            self._migrate(None)
+
+    def _move_set(self, old, set_num):
+        """
+        Puts the live entries of one set of the old layout into the cache and empties the old set
+        """
+        if old._unloaded is not None and old._unloaded[set_num]:
+            old._load_set(set_num)
+        cache_set = old._cache[set_num]
+        if not cache_set:
+            return
+
+        tags = old._tags[set_num]
+        order = old._repl_alg.export_set_order(set_num)
+        if order is None:
+            order = [entry[0] for entry in cache_set]
+        deadlines = old._deadlines.pop(set_num, None)
+        now = self._clock() if deadlines else None
+        for tag in order:
+            _, value, key_hash = cache_set[tags[tag]]
+            deadline = deadlines.get(tag) if deadlines else None
+            if deadline is None:
+                self._put(key_hash, tag, value)
+            elif deadline > now:
+                self._put(key_hash, tag, value, deadline - now)
+
+        cache_set.clear()
+        old._keys[set_num].clear()
+        old._tags[set_num].clear()
+        old._duplicates[set_num] = 0
+        if old._sizes is not None:
+            old._sizes[set_num].clear()
+            old._set_bytes[set_num] = 0
+
+    def _alt_set(self, key_hash):
+        """
+        :return: Second set a key may live in under two_choice indexing, loaded if from a snapshot
+        """
+        set_num = _mix(key_hash) % self._sets
+        if self._unloaded is not None and self._unloaded[set_num]:
+            self._load_set(set_num)
+        return set_num
+
+    def _choose_set(self, key_hash, tag, set_num):
+        """
+        :return: (set, slot) of the entry with tag in the key's other set, or (set, None) for the set a
+            new entry goes into: the one with fewer entries, preferring set_num
+        """
+        alt = self._alt_set(key_hash)
+        i = self._tags[alt].get(tag)
+        if i is not None or len(self._cache[alt]) < len(self._cache[set_num]):
+            return alt, i
+        return set_num, None
+
+    def _find_elsewhere(self, key_hash, set_num):
+        """
+        Looks for a key missing from set_num in its other set, then in the victim buffer
+        :return: (set, slot) of the key's entry, or (set_num, None)
+        """
+        if self._index == "two_choice":
+            alt = self._alt_set(key_hash)
+            i = self._keys[alt].get(key_hash)
+            if i is not None and self._deadlines:
+                i = self._skip_expired(alt, key_hash, i)
+            if i is not None:
+                return alt, i
+
+        victim = self._victims.pop(key_hash, None) if self._victims is not None else None
+        if victim is not None:
+            tag, value, deadline = victim
+            ttl = None
+            if deadline is not None:
+                ttl = deadline - self._clock()
+                if ttl <= 0:
+                    return set_num, None
+            restored = self._put(key_hash, tag, value, ttl, admit=False)
+            return restored, self._keys[restored].get(key_hash)
+        return set_num, None
@@ -0,0 +1,220 @@
+from collections import deque
+
+
+# returned by Cache._get on a miss, so cached None values are found like any other
+_MISSING = object()
+
+
+class _Demotions:
+
+    slots = 0
+
+    def __init__(self, queue, level):
+        """
+        Stands in for the victim buffer of a hierarchy level: entries the level evicts on put are queued
+        for the hierarchy, which handles them once the level's operation has finished
+        """
+        self._queue = queue
+        self._level = level
+
+    def add(self, entry, deadlines):
+        tag, value, key_hash = entry
+        self._queue.append((self._level, key_hash, value, deadlines.get(tag) if deadlines else None))
+
+    def pop(self, key_hash, default=None):
+        return default
+
+    def discard(self, key_hash):
+        pass
+
+    def clear(self):
+        pass
+
+
+class CacheHierarchy:
+
+    POLICIES = ("inclusive", "exclusive", "nine")
+
+    def __init__(self, levels, policy="inclusive"):
+        """
+        Multi-level cache of Cache instances, fastest first, e.g. a small L1 in front of a large L2.
+        A get looks through the levels in order and promotes a hit into every level above the one it
+        hit in. The policy decides what else the levels hold:
+            "inclusive": every entry of a level is also in the levels below it. Puts and updates write
+                through to every level, and an entry evicted from a lower level is invalidated above it
+            "exclusive": an entry lives in exactly one level. Puts go to the first level, a hit moves the
+                entry up to it, and entries evicted from a level are demoted into the next one
+            "nine": non-inclusive non-exclusive. Puts fill every level, a hit copies the entry up, and
+                entries evicted from a level are demoted into the next one if it lacks them; lower levels
+                evict independently
+        Remaining ttls move along with entries. Not thread-safe.
+        :param levels: Unused Cache instances created with key_tags=True and the same key_func and index.
+            Levels may not have byte limits, a victim buffer or an admission filter, since only evictions by
+            put are demoted and every put must be stored
+        :param policy: "inclusive", "exclusive" or "nine". Default is inclusive
+        """
+        if policy not in self.POLICIES:
+            raise ValueError("Unknown policy: %s; use one of %s" % (policy, ", ".join(self.POLICIES)))
+        if not levels:
+            raise ValueError("A hierarchy needs at least one level")
+        for level in levels:
+            if not level._key_tags:
+                raise ValueError("Hierarchy levels must be created with key_tags=True")
+            if level._key_func is not levels[0]._key_func or level._index != levels[0]._index:
+                raise ValueError("Hierarchy levels must share key_func and index, so keys hash alike")
+            if level._victims is not None or level._sizes is not None or level._admission is not None:
+                raise ValueError("Hierarchy levels cannot have a victim buffer, byte limits or an admission filter")
+
+        self._levels = list(levels)
+        self._policy = policy
+        self._hits = 0
+        self._misses = 0
+        # (level, key hash, value, deadline) of entries evicted by put, not handled yet
+        self._evicted = deque()
+        for number, level in enumerate(self._levels):
+            level._victims = _Demotions(self._evicted, number)
+
+    def put(self, key, value, ttl=None):
+        """
+        Stores value under key; see the policies for the levels it goes to
+        :param ttl: Time to live, as for Cache.put. Default is each level's default_ttl
+        """
+        key_hash = self._levels[0]._hash_key(key)
+        if self._policy == "exclusive":
+            for level in self._levels[1:]:
+                level._remove(key_hash)
+            self._store(0, key_hash, value, ttl)
+        else:
+            # lowest level first, so invalidations caused by its evictions never hit the new entry
+            for number in reversed(range(len(self._levels))):
+                self._store(number, key_hash, value, ttl)
+        self._handle_evictions()
+
+    def update(self, key, new_value):
+        """
+        Updates an existing entry, in every level that holds it
+        :return: Number of the first level holding key, or -1 if key was not found
+        """
+        key_hash = self._levels[0]._hash_key(key)
+        found = -1
+        for number, level in enumerate(self._levels):
+            if level._update(key_hash, new_value) != -1 and found < 0:
+                found = number
+                if self._policy == "exclusive":
+                    break
+        return found
+
+    def get(self, key, default=None):
+        """
+        Gets value given key from the first level holding it, promoting it into the levels above
+        :param default: Returned if no level holds key
+        :return: Value corresponding to key, or default if no level holds key
+        """
+        key_hash = self._levels[0]._hash_key(key)
+        value = self._levels[0]._get(key_hash, _MISSING)
+        if value is not _MISSING:
+            self._hits += 1
+            return value
+
+        for number, level in enumerate(self._levels[1:], 1):
+            value = level._get(key_hash, _MISSING)
+            if value is _MISSING:
+                continue
+
+            self._hits += 1
+            set_num, i = level._locate(key_hash)
+            ttl = level._remaining_ttl(set_num, i)
+            if self._policy == "exclusive":
+                level._remove(key_hash)
+                self._levels[0]._put(key_hash, key_hash, value, ttl)
+            else:
+                for upper in reversed(self._levels[:number]):
+                    upper._put(key_hash, key_hash, value, ttl)
+            self._handle_evictions()
+            return value
+
+        self._misses += 1
+        return default
+
+    def remove(self, key):
+        """
+        Removes key from every level
+        :return: Value of key in the first level holding it, or None if no level holds key
+        """
+        key_hash = self._levels[0]._hash_key(key)
+        removed = None
+        for level in self._levels:
+            value = level._remove(key_hash)
+            if removed is None:
+                removed = value
+        return removed
+
+    def clear(self):
+        """
+        Clears every level and the hierarchy's counters
+        """
+        for level in self._levels:
+            level.clear()
+        self._evicted.clear()
+        self._hits = 0
+        self._misses = 0
+
+    def get_levels(self):
+        """
+        :return: List of the levels, fastest first
+        """
+        return list(self._levels)
+
+    def get_hit_ratios(self):
+        """
+        :return: List with the hit ratio of every level over the gets that reached it, or None for a
+            level no get reached yet
+        """
+        ratios = []
+        for level in self._levels:
+            lookups = level.get_hits() + level.get_misses()
+            ratios.append(level.get_hits() / lookups if lookups else None)
+        return ratios
+
+    def get_hits(self):
+        """
+        :return: Number of gets served by any level
+        """
+        return self._hits
+
+    def get_misses(self):
+        """
+        :return: Number of gets no level could serve
+        """
+        return self._misses
+
+    def _store(self, number, key_hash, value, ttl):
+        level = self._levels[number]
+        level._put(key_hash, key_hash, value, level._default_ttl if ttl is None else ttl)
+
+    def _handle_evictions(self):
+        """
+        Applies the policy to entries evicted by the puts of the last operation, and to the entries
+        those cause to be evicted in turn
+        """
+        evicted = self._evicted
+        last = len(self._levels) - 1
+        while evicted:
+            number, key_hash, value, deadline = evicted.popleft()
+            if self._policy == "inclusive":
+                # upper levels are written through, so only evictions from lower levels matter
+                for upper in self._levels[:number]:
+                    upper._remove(key_hash)
+                continue
+            if number == last:
+                continue
+
+            lower = self._levels[number + 1]
+            if self._policy == "nine" and lower._locate(key_hash)[1] is not None:
+                continue
+            ttl = None
+            if deadline is not None:
+                ttl = deadline - self._levels[number]._clock()
+                if ttl <= 0:
+                    continue
+            lower._put(key_hash, key_hash, value, ttl)
@@ -0,0 +1,219 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheStats:
+
+    COUNTERS = ("hits", "misses", "insertions", "evictions", "updates", "removes", "expirations")
+    MISS_KINDS = ("cold", "conflict", "capacity")
+    OPS = ("get", "put")
+    _PROMETHEUS_BUCKETS = range(7, 35)
+
+    def __init__(self, classify=True, sample_every=64):
+        """
+        Statistics recorded by a Cache created with stats=True or with an unbound CacheStats, and kept
+        across Cache.clear. Per-set counters are lists indexed by set number, e.g. hits[set_num].
+        Misses are classified against a shadow fully-associative LRU cache of the same capacity: cold
+        if the key was never seen before, conflict if the shadow cache would have hit, else capacity.
+        :param classify: If False, misses are not classified and no shadow cache is kept. The set of seen
+            keys grows with the number of distinct keys
+        :param sample_every: Time one in this many get and put calls; 0 disables latency histograms
+        """
+        self.sets = 0
+        self.miss_kinds = dict.fromkeys(self.MISS_KINDS, 0)
+        self._classify = classify
+        self._capacity = 0
+        self._shadow = OrderedDict()
+        self._seen = set()
+        self._shadow_lock = threading.Lock()
+
+        # latency histograms: bucket b counts calls that took less than 2 ** b ns
+        self.sample_every = sample_every
+        self.latency = {op: [0] * 64 for op in self.OPS}
+        self.latency_sum = dict.fromkeys(self.OPS, 0)
+        self._bound = False
+
+    def bind(self, sets, capacity):
+        """
+        Allocates per-set counters for a cache with the given geometry
+        :param sets: Number of sets
+        :param capacity: Total number of slots of the cache, and so of the shadow cache
+        :return: self
+        """
+        if self._bound:
+            raise ValueError("CacheStats instance is already bound to a cache")
+
+        self._bound = True
+        self.sets = sets
+        self._capacity = capacity
+        for name in self.COUNTERS:
+            setattr(self, name, [0] * sets)
+        return self
+
+    def resize(self, sets, capacity):
+        """
+        Adapts per-set counters to a resized cache. Counts of sets beyond the new number of sets are
+        added to the set with the same number modulo it, so totals are kept
+        :param sets: New number of sets
+        :param capacity: New total number of slots, and so of the shadow cache
+        """
+        for name in self.COUNTERS:
+            counts = [0] * sets
+            for set_num, count in enumerate(getattr(self, name)):
+                counts[set_num % sets] += count
+            setattr(self, name, counts)
+        self.sets = sets
+        self._capacity = capacity
+        with self._shadow_lock:
+            while len(self._shadow) > capacity:
+                self._shadow.popitem(last=False)
+
+    def record_hit(self, set_num, key_hash):
+        self.hits[set_num] += 1
+        if self._classify:
+            self._touch(key_hash)
+
+    def record_miss(self, set_num, key_hash):
+        self.misses[set_num] += 1
+        if self._classify:
+            with self._shadow_lock:
+                if key_hash not in self._seen:
+                    self._seen.add(key_hash)
+                    self.miss_kinds["cold"] += 1
+                elif key_hash in self._shadow:
+                    self.miss_kinds["conflict"] += 1
+                else:
+                    self.miss_kinds["capacity"] += 1
+
+    def record_put(self, set_num, key_hash, inserted):
+        if inserted:
+            self.insertions[set_num] += 1
+        else:
+            self.updates[set_num] += 1
+        if self._classify:
+            self._touch(key_hash)
+
+    def record_update(self, set_num):
+        self.updates[set_num] += 1
+
+    def record_eviction(self, set_num):
+        self.evictions[set_num] += 1
+
+    def record_expirations(self, set_num, count):
+        self.expirations[set_num] += count
+
+    def record_remove(self, set_num, key_hash):
+        self.removes[set_num] += 1
+        if self._classify:
+            with self._shadow_lock:
+                self._shadow.pop(key_hash, None)
+
+    def record_clear(self):
+        """
+        The cache was emptied, and so is the shadow cache; counters are kept
+        """
+        with self._shadow_lock:
+            self._shadow.clear()
+
+    def timed(self, op, function):
+        """
+        :return: function wrapped to record the latency of one in sample_every calls under op
+        """
+        histogram = self.latency[op]
+        every = self.sample_every
+        calls = [0]
+        perf_counter_ns = time.perf_counter_ns
+
+        def timed_function(*args, **kwargs):
+            calls[0] += 1
+            if calls[0] % every:
+                return function(*args, **kwargs)
+            start = perf_counter_ns()
+            result = function(*args, **kwargs)
+            elapsed = perf_counter_ns() - start
+            histogram[min(elapsed.bit_length(), 63)] += 1
+            self.latency_sum[op] += elapsed
+            return result
+
+        return timed_function
+
+    def reset(self):
+        """
+        Zeroes every counter and histogram and forgets seen keys
+        """
+        for name in self.COUNTERS:
+            getattr(self, name)[:] = [0] * self.sets
+        self.miss_kinds.update(dict.fromkeys(self.MISS_KINDS, 0))
+        with self._shadow_lock:
+            self._shadow.clear()
+            self._seen.clear()
+        for op in self.OPS:
+            # timed wrappers hold on to these lists, so zero them in place
+            self.latency[op][:] = [0] * 64
+            self.latency_sum[op] = 0
+
+    def to_dict(self, per_set=True):
+        """
+        :param per_set: Include the per-set counter lists
+        :return: Dict snapshot with totals, miss kinds, latency histograms and optionally per-set counters
+        """
+        snapshot = {name: sum(getattr(self, name)) for name in self.COUNTERS}
+        snapshot["miss_kinds"] = dict(self.miss_kinds)
+        snapshot["latency_ns"] = {
+            op: {
+                "buckets": {2 ** bucket: count for bucket, count in enumerate(self.latency[op]) if count},
+                "count": sum(self.latency[op]),
+                "sum": self.latency_sum[op],
+            }
+            for op in self.OPS
+        }
+        if per_set:
+            snapshot["per_set"] = {name: list(getattr(self, name)) for name in self.COUNTERS}
+        return snapshot
+
+    def to_prometheus(self, prefix="sa_cache", per_set=False):
+        """
+        :param prefix: Metric name prefix
+        :param per_set: Label counters by set instead of exporting totals only
+        :return: Metrics in the Prometheus text exposition format
+        """
+        lines = []
+        for name in self.COUNTERS:
+            metric = "%s_%s_total" % (prefix, name)
+            lines.append("# TYPE %s counter" % metric)
+            counts = getattr(self, name)
+            if per_set:
+                lines.extend('%s{set="%d"} %d' % (metric, set_num, count) for set_num, count in enumerate(counts))
+            else:
+                lines.append("%s %d" % (metric, sum(counts)))
+
+        metric = "%s_miss_kinds_total" % prefix
+        lines.append("# TYPE %s counter" % metric)
+        lines.extend('%s{kind="%s"} %d' % (metric, kind, count) for kind, count in self.miss_kinds.items())
+
+        metric = "%s_latency_seconds" % prefix
+        lines.append("# TYPE %s histogram" % metric)
+        for op in self.OPS:
+            histogram = self.latency[op]
+            # fixed buckets from 128ns to 17s, so every scrape has the same series
+            cumulative = sum(histogram[:self._PROMETHEUS_BUCKETS.start])
+            for bucket in self._PROMETHEUS_BUCKETS:
+                cumulative += histogram[bucket]
+                lines.append('%s_bucket{op="%s",le="%g"} %d' % (metric, op, 2 ** bucket / 1e9, cumulative))
+            total = sum(histogram)
+            lines.append('%s_bucket{op="%s",le="+Inf"} %d' % (metric, op, total))
+            lines.append('%s_sum{op="%s"} %g' % (metric, op, self.latency_sum[op] / 1e9))
+            lines.append('%s_count{op="%s"} %d' % (metric, op, total))
+        return "\n".join(lines) + "\n"
+
+    def _touch(self, key_hash):
+        with self._shadow_lock:
+            self._seen.add(key_hash)
+            shadow = self._shadow
+            if key_hash in shadow:
+                shadow.move_to_end(key_hash)
+            else:
+                shadow[key_hash] = None
+                if len(shadow) > self._capacity:
+                    shadow.popitem(last=False)
@@ -0,0 +1,188 @@
+from array import array
+
+import Cache
+
+
+class CompactCache:
+
+    _ALGS = ("lru", "mru", "fifo")
+    # hashing is shared with Cache so both layouts tag entries identically
+    _custom_hash = staticmethod(Cache.custom_hash)
+
+    def __init__(self, slots, size, alg="lru"):
+        """
+        Set-associative cache stored in flat preallocated arrays instead of one list per entry.
+        Slot i of set s lives at index s * slots + i of every array:
+            tags, key_hashes: Tag and key hash of the entry (array of signed 64-bit ints)
+            valid: 1 if the slot holds an entry
+            stamps: Replacement metadata; tick of last access (lru/mru) or of insertion (fifo)
+            values: Stored values
+        Offers the same API and tag semantics as Cache. Victims are chosen by comparing stamps within a
+        set, so only the stamp-based algorithms "lru", "mru" and "fifo" are supported.
+        :param slots: Number of slots; specifies the -way associativity of the cache
+        :param size: Total number of slots in the cache
+        :param alg: "lru", "mru" or "fifo". Default is LRU
+        """
+        if alg not in self._ALGS:
+            raise ValueError("CompactCache supports only these replacement algorithms: " + ", ".join(self._ALGS))
+
+        self._slots = slots
+        self._sets = int(size/slots)
+        self._size = self._sets * slots
+        self._alg = alg
+        self._hits = 0
+        self._misses = 0
+        self._tick = 0
+
+        self._tags = array("q", bytes(8 * self._size))
+        self._key_hashes = array("q", bytes(8 * self._size))
+        self._valid = bytearray(self._size)
+        self._stamps = array("Q", bytes(8 * self._size))
+        self._values = [None] * self._size
+
+    def put(self, key, value):
+        """
+        Stores value in a free or evicted slot of the key's set.
+        Use update to update an entry with an existing key.
+        :param key: Key to use for cache access
+        :param value: Value to store in cache
+        """
+        key_hash = self._custom_hash(key)
+        tag = self._custom_hash((key_hash, self._custom_hash(value)))
+        start = (key_hash % self._sets) * self._slots
+
+        i = self._find(self._tags, tag, start)
+        if i >= 0:
+            # identical key/value pair is already cached, refresh it instead of storing a duplicate
+            self._touch(i)
+            return
+
+        i = self._valid.find(0, start, start + self._slots)
+        if i < 0:
+            i = self._get_index_to_evict(start)
+
+        self._tick += 1
+        self._tags[i] = tag
+        self._key_hashes[i] = key_hash
+        self._valid[i] = 1
+        self._stamps[i] = self._tick
+        self._values[i] = value
+
+    def update(self, key, new_value):
+        """
+        Updates an existing entry in the cache.
+        :param key: Specifies which entry to be replaced
+        :param new_value: Value to store in entry, replacing old_value
+        :return: Set number the value was stored in, or -1 if key was not found
+        """
+        if self.get(key) is None:
+            return -1
+
+        key_hash = self._custom_hash(key)
+        set_num = key_hash % self._sets
+        i = self._find(self._key_hashes, key_hash, set_num * self._slots)
+        new_tag = self._custom_hash((key_hash, self._custom_hash(new_value)))
+
+        j = self._find(self._tags, new_tag, set_num * self._slots)
+        if 0 <= j != i:
+            # another entry already holds this key/value pair, drop the stale one
+            self._invalidate(i)
+            return set_num
+
+        self._tick += 1
+        self._tags[i] = new_tag
+        self._values[i] = new_value
+        self._stamps[i] = self._tick
+        return set_num
+
+    def get(self, key, default=None):
+        """
+        Gets value in cache given key
+        :param default: Returned if no entry matches key
+        :return: Value corresponding to key, or default if no matching key
+        """
+        key_hash = self._custom_hash(key)
+        i = self._find(self._key_hashes, key_hash, (key_hash % self._sets) * self._slots)
+
+        if i < 0:
+            self._misses += 1
+            return default
+
+        self._hits += 1
+        self._touch(i)
+        return self._values[i]
+
+    def remove(self, key):
+        """
+        Removes entry from cache given key
+        :return: Value corresponding to key if successful, or None if no matching key
+        """
+        key_hash = self._custom_hash(key)
+        i = self._find(self._key_hashes, key_hash, (key_hash % self._sets) * self._slots)
+
+        if i < 0:
+            return None
+
+        value = self._values[i]
+        self._invalidate(i)
+        return value
+
+    def clear(self):
+        """
+        Clears entire cache, removing all entries
+        """
+        self._valid[:] = bytes(self._size)
+        self._values[:] = [None] * self._size
+        self._hits = 0
+        self._misses = 0
+
+    def get_hits(self):
+        """
+        :return: Number of cache hits
+        """
+        return self._hits
+
+    def get_misses(self):
+        """
+        :return: Number of cache misses
+        """
+        return self._misses
+
+    def _get_set_num(self, key):
+        """
+        :return: Set index number given key
+        """
+        return self._custom_hash(key) % self._sets
+
+    def _find(self, column, value, start):
+        """
+        :return: Index of the first valid slot in the set beginning at start whose column holds value, or -1
+        """
+        stop = start + self._slots
+        while start < stop:
+            try:
+                i = column.index(value, start, stop)
+            except ValueError:
+                return -1
+            if self._valid[i]:
+                return i
+            start = i + 1
+        return -1
+
+    def _touch(self, i):
+        if self._alg != "fifo":
+            self._tick += 1
+            self._stamps[i] = self._tick
+
+    def _invalidate(self, i):
+        self._valid[i] = 0
+        self._values[i] = None
+
+    def _get_index_to_evict(self, start):
+        """
+        :return: Index of the slot to evict from the full set beginning at start
+        """
+        stamps = self._stamps[start:start + self._slots]
+        if self._alg == "mru":
+            return start + stamps.index(max(stamps))
+        return start + stamps.index(min(stamps))
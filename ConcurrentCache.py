@@ -0,0 +1,193 @@
+import threading
+
+import Cache
+
+
+class _ThreadCounter:
+
+    def __init__(self, registry, registry_lock):
+        """
+        Counters owned by one thread. Other threads only read them, so increments never contend.
+        """
+        self.hits = 0
+        self.misses = 0
+        with registry_lock:
+            registry.append(self)
+
+
+class ConcurrentCache(Cache.Cache):
+
+    def __init__(self, slots, size, alg="lru", stripes=64, **kwargs):
+        """
+        Thread-safe Cache. Sets are partitioned into stripes and every operation only holds the lock of
+        the stripe its key maps to, so threads working on different sets do not serialize.
+        Hit/miss counters are kept per thread and summed by get_hits/get_misses.
+        :param slots: Number of slots; specifies the -way associativity of the cache
+        :param size: Total number of slots in the cache
+        :param alg: Replacement algorithm, as for Cache. Algorithm state is kept per set, so it is
+            guarded by the same stripe locks
+        :param stripes: Number of locks; set s is guarded by lock s % stripes
+        :param kwargs: Other Cache options. max_bytes, victim_slots and index="two_choice" are not
+            supported, since they move or evict entries across sets guarded by other locks; use
+            max_set_bytes and index="mixed". Neither are stats and admission, whose counters are shared
+            by all sets
+        """
+        if kwargs.get("max_bytes") is not None:
+            raise ValueError("ConcurrentCache does not support max_bytes; use max_set_bytes")
+        if kwargs.get("victim_slots") or kwargs.get("index") == "two_choice":
+            raise ValueError("ConcurrentCache does not support victim_slots or two_choice indexing")
+        if kwargs.get("stats") or kwargs.get("admission"):
+            raise ValueError("ConcurrentCache does not support stats or admission")
+        self._counters = []
+        self._counters_lock = threading.Lock()
+        self._local = threading.local()
+
+        super().__init__(slots, size, alg, **kwargs)
+        self._stripes = max(1, min(stripes, self._sets))
+        self._locks = [threading.Lock() for _ in range(self._stripes)]
+
+    def put(self, key, value, ttl=None):
+        key_hash = self._hash_key(key)
+        tag = self._get_tag(key_hash, value)
+        with self._locks[key_hash % self._sets % self._stripes]:
+            self._put(key_hash, tag, value, self._default_ttl if ttl is None else ttl)
+        if self._sweep_sets:
+            self.expire(self._sweep_sets)
+
+    def update(self, key, new_value):
+        key_hash = self._hash_key(key)
+        with self._locks[key_hash % self._sets % self._stripes]:
+            return self._update(key_hash, new_value)
+
+    def get(self, key, default=None):
+        key_hash = self._hash_key(key)
+        with self._locks[key_hash % self._sets % self._stripes]:
+            return self._get(key_hash, default)
+
+    def remove(self, key):
+        key_hash = self._hash_key(key)
+        with self._locks[key_hash % self._sets % self._stripes]:
+            return self._remove(key_hash)
+
+    def get_many(self, keys):
+        key_hashes = self._hash_keys(keys)
+        results = [None] * len(key_hashes)
+        for stripe, positions in self._group_by_stripe(key_hashes).items():
+            with self._locks[stripe]:
+                values = self._get_many([key_hashes[position] for position in positions])
+            for position, value in zip(positions, values):
+                results[position] = value
+        return results
+
+    def put_many(self, items, ttl=None):
+        items = list(items)
+        values = [value for _, value in items]
+        key_hashes = self._hash_keys([key for key, _ in items])
+        tags = self._get_tags(key_hashes, values)
+        ttl = self._default_ttl if ttl is None else ttl
+        for stripe, positions in self._group_by_stripe(key_hashes).items():
+            with self._locks[stripe]:
+                self._put_many([key_hashes[position] for position in positions],
+                               [tags[position] for position in positions],
+                               [values[position] for position in positions], ttl)
+        if self._sweep_sets:
+            self.expire(self._sweep_sets)
+
+    def remove_many(self, keys):
+        key_hashes = self._hash_keys(keys)
+        results = [None] * len(key_hashes)
+        for stripe, positions in self._group_by_stripe(key_hashes).items():
+            with self._locks[stripe]:
+                values = self._remove_many([key_hashes[position] for position in positions])
+            for position, value in zip(positions, values):
+                results[position] = value
+        return results
+
+    def clear(self):
+        """
+        Clears entire cache, removing all entries. Holds every stripe lock while clearing.
+        """
+        for lock in self._locks:
+            lock.acquire()
+        try:
+            super().clear()
+            for counter in self._counters:
+                counter.hits = 0
+                counter.misses = 0
+        finally:
+            for lock in reversed(self._locks):
+                lock.release()
+
+    def save(self, path, **kwargs):
+        """
+        Writes the cache to a snapshot file, as Cache.save. Holds every stripe lock while saving.
+        """
+        for lock in self._locks:
+            lock.acquire()
+        try:
+            super().save(path, **kwargs)
+        finally:
+            for lock in reversed(self._locks):
+                lock.release()
+
+    def resize(self, new_size, new_slots=None, step=1):
+        """
+        Not supported: moving sets to a new geometry takes entries across sets guarded by other locks
+        """
+        raise ValueError("ConcurrentCache cannot be resized; create a new cache instead")
+
+    def get_hits(self):
+        """
+        :return: Number of cache hits across all threads
+        """
+        return sum(counter.hits for counter in self._counters)
+
+    def get_misses(self):
+        """
+        :return: Number of cache misses across all threads
+        """
+        return sum(counter.misses for counter in self._counters)
+
+    def _group_by_stripe(self, key_hashes):
+        """
+        :return: Dict of stripe -> positions in key_hashes guarded by that stripe's lock, in order
+        """
+        groups = dict()
+        for position, key_hash in enumerate(key_hashes):
+            stripe = key_hash % self._sets % self._stripes
+            if stripe in groups:
+                groups[stripe].append(position)
+            else:
+                groups[stripe] = [position]
+        return groups
+
+    def _sweep_set(self, set_num):
+        with self._locks[set_num % self._stripes]:
+            return self._expire_set(set_num)
+
+    def _counter(self):
+        """
+        :return: Counters of the calling thread, created on first use
+        """
+        try:
+            return self._local.counter
+        except AttributeError:
+            self._local.counter = _ThreadCounter(self._counters, self._counters_lock)
+            return self._local.counter
+
+    # Cache updates self._hits/self._misses with +=; route those to the calling thread's counters
+
+    def _get_thread_hits(self):
+        return self._counter().hits
+
+    def _set_thread_hits(self, value):
+        self._counter().hits = value
+
+    def _get_thread_misses(self):
+        return self._counter().misses
+
+    def _set_thread_misses(self, value):
+        self._counter().misses = value
+
+    _hits = property(_get_thread_hits, _set_thread_hits)
+    _misses = property(_get_thread_misses, _set_thread_misses)
@@ -0,0 +1,64 @@
+class FrequencySketch:
+
+    # odd 64-bit multipliers, one per row of the sketch
+    _SEEDS = (0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0xD6E8FEB86659FD93)
+    _MASK64 = 0xFFFFFFFFFFFFFFFF
+    # byte translation table mapping every counter value to half of it
+    _HALVE = bytes(i >> 1 for i in range(256))
+
+    def __init__(self, capacity, max_count=15, sample_factor=10):
+        """
+        Count-min sketch estimating how often a hash was seen, with periodic aging.
+        :param capacity: Expected number of distinct live items; determines the width of each row
+        :param max_count: Counters saturate at this value
+        :param sample_factor: Counters are halved after capacity * sample_factor increments
+        """
+        width = 16
+        while width < capacity:
+            width <<= 1
+
+        self._mask = width - 1
+        self._max_count = max_count
+        self._rows = [bytearray(width) for _ in self._SEEDS]
+        self._additions = 0
+        self._sample_size = max(capacity, 1) * sample_factor
+
+    def increment(self, item_hash):
+        """
+        Records one occurrence of item_hash, aging all counters once the sample size is reached
+        """
+        for row, i in zip(self._rows, self._indexes(item_hash)):
+            if row[i] < self._max_count:
+                row[i] += 1
+
+        self._additions += 1
+        if self._additions >= self._sample_size:
+            self.age()
+
+    def estimate(self, item_hash):
+        """
+        :return: Estimated number of occurrences of item_hash; never lower than the true count since the last aging
+        """
+        return min(row[i] for row, i in zip(self._rows, self._indexes(item_hash)))
+
+    def age(self):
+        """
+        Halves every counter so old popularity fades out
+        """
+        self._rows = [row.translate(self._HALVE) for row in self._rows]
+        self._additions //= 2
+
+    def clear(self):
+        for row in self._rows:
+            row[:] = bytes(len(row))
+        self._additions = 0
+
+    def get_memory_usage(self):
+        """
+        :return: Number of bytes used by the counters
+        """
+        return sum(len(row) for row in self._rows)
+
+    def _indexes(self, item_hash):
+        item_hash &= self._MASK64
+        return [((item_hash * seed) & self._MASK64) >> 32 & self._mask for seed in self._SEEDS]
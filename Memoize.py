@@ -0,0 +1,83 @@
+import functools
+from collections import namedtuple
+
+import Cache
+
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+# returned by Cache.get on a miss
+_MISSING = object()
+# separates positional from keyword arguments in keys
+_KWD_MARK = object()
+# single arguments of these types are their own key, as in functools.lru_cache
+_FAST_TYPES = {int, str}
+
+
+def _make_key(args, kwds, typed):
+    """
+    :return: Key for a call with args and kwds; unhashable arguments are left to Cache's custom_hash
+    """
+    if not kwds and len(args) == 1 and type(args[0]) in _FAST_TYPES and not typed:
+        return args[0]
+    key = args
+    if kwds:
+        key += (_KWD_MARK,)
+        for item in kwds.items():
+            key += item
+    if typed:
+        key += tuple(type(arg) for arg in args)
+        if kwds:
+            key += tuple(type(value) for value in kwds.values())
+    return key
+
+
+def memoize(slots=8, size=1024, alg="lru", typed=False, cache_class=Cache.Cache, **kwargs):
+    """
+    Decorator factory caching a function's results in a set-associative cache, like functools.lru_cache.
+    Arguments may be unhashable, e.g. lists or dicts, and results that are None are cached too. The
+    decorated function gets cache_info(), cache_clear() and a cache attribute holding the cache.
+    Can also be applied directly, as @memoize.
+    :param slots: Number of slots; specifies the -way associativity of the cache
+    :param size: Total number of slots in the cache
+    :param alg: Replacement algorithm, as for Cache
+    :param typed: If True, arguments of different types are cached separately, e.g. f(3) and f(3.0)
+    :param cache_class: Cache or a subclass; use ConcurrentCache.ConcurrentCache if the function is called
+        from several threads
+    :param kwargs: Other options of cache_class, e.g. default_ttl or key_func applied to the argument key
+    :return: Decorator
+    """
+    if callable(slots):
+        # used as @memoize without arguments
+        return memoize()(slots)
+
+    def decorator(function):
+        sa_cache = cache_class(slots, size, alg, key_tags=True, **kwargs)
+        get = sa_cache.get
+        put = sa_cache.put
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwds):
+            key = _make_key(args, kwds, typed)
+            # Cache tells keys apart by hash alone, so results are stored with their key and checked,
+            # e.g. hash(-1) == hash(-2)
+            entry = get(key, _MISSING)
+            if entry is not _MISSING and entry[0] == key:
+                return entry[1]
+            result = function(*args, **kwds)
+            put(key, (key, result))
+            return result
+
+        def cache_info():
+            """
+            :return: CacheInfo of hits, misses, total slots and number of cached results
+            """
+            return CacheInfo(sa_cache.get_hits(), sa_cache.get_misses(), sa_cache._sets * sa_cache._slots,
+                             sum(map(len, sa_cache._cache)))
+
+        wrapper.cache_info = cache_info
+        wrapper.cache_clear = sa_cache.clear
+        wrapper.cache = sa_cache
+        return wrapper
+
+    return decorator
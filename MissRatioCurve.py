@@ -0,0 +1,190 @@
+"""
+Computes LRU miss-ratio curves from a trace in a single pass.
+
+    python MissRatioCurve.py trace.txt --sets 64 --max-ways 32 [--sample-rate 0.01] [--json]
+
+Trace files use the formats accepted by Simulator.py; every get (or key-per-line access) is a reference.
+"""
+import argparse
+import json
+import sys
+
+import Cache
+import Simulator
+
+
+class _SetStack:
+
+    def __init__(self):
+        """
+        LRU stack of one set, stored as a Fenwick tree over access times.
+        A time holds 1 while it is the most recent access of some key, so the stack distance of a key is
+        the number of marked times after its last access.
+        """
+        self.last_access = dict()
+        self.time = 0
+        self.tree = [0] * 65
+
+    def access(self, key_hash):
+        """
+        :return: Stack distance of key_hash (0 for the most recently used key), or None on first access
+        """
+        if self.time + 1 >= len(self.tree):
+            self._compact()
+
+        self.time += 1
+        previous = self.last_access.get(key_hash)
+        distance = None
+        if previous is not None:
+            distance = self._prefix(self.time - 1) - self._prefix(previous)
+            self._add(previous, -1)
+        self._add(self.time, 1)
+        self.last_access[key_hash] = self.time
+        return distance
+
+    def _prefix(self, i):
+        total = 0
+        tree = self.tree
+        while i > 0:
+            total += tree[i]
+            i &= i - 1
+        return total
+
+    def _add(self, i, delta):
+        tree = self.tree
+        while i < len(tree):
+            tree[i] += delta
+            i += i & -i
+
+    def _compact(self):
+        # renumber live access times 1..n in order, leaving room for as many new accesses again
+        order = sorted(self.last_access, key=self.last_access.get)
+        self.tree = [0] * (max(2 * len(order), 64) + 1)
+        self.time = 0
+        for key_hash in order:
+            self.time += 1
+            self.last_access[key_hash] = self.time
+            self._add(self.time, 1)
+
+
+class MissRatioCurve:
+
+    _MASK64 = 0xFFFFFFFFFFFFFFFF
+    _SAMPLE_MODULUS = 1 << 24
+
+    def __init__(self, sets=1, sample_rate=1.0):
+        """
+        Mattson stack-distance analysis per set. A reference hits in a ways-way LRU cache with this many
+        sets exactly when its stack distance within its set is below ways, so one pass yields the miss
+        ratio of Cache(ways, sets * ways, "lru") for every ways at once.
+        :param sets: Number of sets; keys map to sets like Cache does. 1 gives the fully-associative curve
+        :param sample_rate: Fraction of keys to analyse (SHARDS). Keys are sampled by hash, so a sampled
+            key is seen on every reference; stack distances are scaled by 1 / sample_rate. Sampled curves
+            are only meaningful for sizes well above 1 / sample_rate
+        """
+        self._sets = sets
+        self._sample_rate = sample_rate
+        self._threshold = int(sample_rate * self._SAMPLE_MODULUS)
+        self._stacks = [_SetStack() for _ in range(sets)]
+        self._histogram = dict()
+        self._cold = 0
+        self._references = 0
+        self._seen = 0
+
+    def access(self, key):
+        """
+        Records one reference to key
+        """
+        key_hash = Cache.custom_hash(key)
+        self._seen += 1
+        if self._sample_rate < 1 and self._sample_bucket(key_hash) >= self._threshold:
+            return
+
+        self._references += 1
+        distance = self._stacks[key_hash % self._sets].access(key_hash)
+        if distance is None:
+            self._cold += 1
+        else:
+            if self._sample_rate < 1:
+                distance = int(distance / self._sample_rate)
+            self._histogram[distance] = self._histogram.get(distance, 0) + 1
+
+    def feed(self, keys):
+        """
+        Records a reference to every key of an iterable, e.g. a streamed trace
+        """
+        for key in keys:
+            self.access(key)
+
+    def miss_ratio(self, ways):
+        """
+        :return: Miss ratio of a ways-way LRU cache with this curve's number of sets
+        """
+        if not self._references:
+            return 0.0
+        misses = self._cold + sum(count for distance, count in self._histogram.items() if distance >= ways)
+        return min(misses / self._expected_references(), 1.0)
+
+    def curve(self, max_ways):
+        """
+        :return: List of (ways, size, miss_ratio) for ways 1..max_ways
+        """
+        if not self._references:
+            return [(ways, ways * self._sets, 0.0) for ways in range(1, max_ways + 1)]
+
+        # misses(ways) = cold misses + references with distance >= ways, accumulated from the top
+        at_least = [0] * (max_ways + 2)
+        for distance, count in self._histogram.items():
+            at_least[min(distance, max_ways + 1)] += count
+        for ways in range(max_ways, 0, -1):
+            at_least[ways] += at_least[ways + 1]
+
+        references = self._expected_references()
+        return [(ways, ways * self._sets, min((self._cold + at_least[ways]) / references, 1.0))
+                for ways in range(1, max_ways + 1)]
+
+    def get_references(self):
+        """
+        :return: Number of references analysed (after sampling)
+        """
+        return self._references
+
+    def _expected_references(self):
+        """
+        SHARDS-adj: a few very hot keys being in or out of the sample skews the sampled reference count.
+        Normalizing by the expected count treats the difference as hits at the smallest distance.
+        """
+        if self._sample_rate < 1:
+            return max(self._seen * self._sample_rate, self._cold)
+        return self._references
+
+    def _sample_bucket(self, key_hash):
+        # use high bits of a remixed hash so sampling is independent of the set index
+        return ((key_hash * 0x9E3779B97F4A7C15) & self._MASK64) >> 40
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compute an LRU miss-ratio curve in one pass over a trace")
+    parser.add_argument("trace", help="Trace file: one key per line, or op,key[,value] CSV")
+    parser.add_argument("--format", dest="trace_format", choices=["auto", "keys", "csv"], default="auto")
+    parser.add_argument("--sets", type=int, default=1, help="Number of sets (1 = fully associative)")
+    parser.add_argument("--max-ways", type=int, default=16, help="Largest associativity on the curve")
+    parser.add_argument("--sample-rate", type=float, default=1.0, help="SHARDS sampling rate in (0, 1]")
+    parser.add_argument("--json", action="store_true", help="Print the curve as JSON")
+    args = parser.parse_args(argv)
+
+    mrc = MissRatioCurve(args.sets, args.sample_rate)
+    mrc.feed(key for op, key, _ in Simulator.read_trace(args.trace, args.trace_format) if op in ("access", "get"))
+    curve = mrc.curve(args.max_ways)
+
+    if args.json:
+        json.dump([{"ways": ways, "size": size, "miss_ratio": ratio} for ways, size, ratio in curve], sys.stdout, indent=2)
+        print()
+    else:
+        print("%6s %10s %10s" % ("ways", "size", "miss ratio"))
+        for ways, size, ratio in curve:
+            print("%6d %10d %10.4f" % (ways, size, ratio))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,82 +1,775 @@
-import datetime
+import heapq
+from collections import OrderedDict
+
+import FrequencySketch
+
+
+_algorithms = dict()
+
+
+def register(name):
+    """
+    Class decorator that makes a ReplacementAlgorithm subclass available to Cache under name
+    """
+    def decorator(cls):
+        _algorithms[name] = cls
+        cls.name = name
+        return cls
+    return decorator
+
+
+def create(alg, sets, slots):
+    """
+    :param alg: Registered algorithm name, ReplacementAlgorithm subclass, or unused ReplacementAlgorithm instance
+    :param sets: Number of sets in the cache
+    :param slots: Number of slots per set
+    :return: ReplacementAlgorithm bound to the given cache geometry
+    """
+    if isinstance(alg, str):
+        if alg not in _algorithms:
+            raise ValueError("Unknown replacement algorithm: " + alg)
+        alg = _algorithms[alg]
+    if isinstance(alg, type):
+        alg = alg()
+
+    return alg.bind(sets, slots)
+
+
+def get_algorithm_names():
+    """
+    :return: Names of all registered algorithms
+    """
+    return list(_algorithms)
 
 
 class ReplacementAlgorithm:
+    """
+    Base class for replacement algorithms.
+    Subclasses keep one state object per set, created by _new_set_state, and identify entries by tag.
+    A set has no state, only None, until Cache calls allocate_set before its first insert.
+    Cache calls update_alg_struct_on_insert when a set has space, and get_tag_to_evict followed by
+    update_alg_struct_on_evict when it is full.
+    """
+
+    name = None
 
-    def __init__(self, alg, sets):
+    def __init__(self):
+        self._sets = 0
+        self._slots = 0
+        self._state = None
+
+    def bind(self, sets, slots):
         """
-        :param alg: String that determines algorithm type.
-        timestamps: List of dict containing tags and their timestamps (datetime of last access)
-        fifo_queue: Queue of tags; keeps track of entries were put into cache
+        Prepares per-set state for a cache with the given geometry
+        :return: self
         """
-        self._alg = alg
-        self._timestamps = [dict() for _ in range(sets)]
-        self._fifo_queue = []
-        # add more algorithm-related structures here
+        if self._state is not None:
+            raise ValueError("ReplacementAlgorithm instance is already bound to a cache")
+
+        self._sets = sets
+        self._slots = slots
+        self._state = [None] * sets
+        return self
 
-    def get_index_to_evict(self, cache_set, set_num, slots):
+    def allocate_set(self, set_num):
         """
-        :param cache_set: Current working set inside cache to look through
-        :param set_num: Index of cache set
-        :param slots: Number of slots in cache_set
-        :return: Index of entry to evict based on replacement algorithm
-        """
-        if self._alg == "lru":
-            lru_tag = sorted(self._timestamps[set_num].items(), key=lambda kv: kv[1])[0][0]
-            for i in range(slots):
-                if cache_set[i][0] == lru_tag:
-                    return i
-        elif self._alg == "mru":
-            mru_tag = sorted(self._timestamps[set_num].items(), key=lambda kv: kv[1], reverse=True)[0][0]
-            for i in range(slots):
-                if cache_set[i][0] == mru_tag:
-                    return i
-        elif self._alg == "fifo":
-            for i in range(slots):
-                if cache_set[i][0] == self._fifo_queue[0]:
-                    self._fifo_queue.pop(0)
-                    return i
-        else:
-            # add more algorithm cases before else
-            return 0
+        Creates the state of a set about to get its first entry
+        """
+        self._state[set_num] = self._new_set_state()
+
+    def _new_set_state(self):
+        """
+        :return: Empty algorithm state for one set
+        """
+        raise NotImplementedError
+
+    def get_tag_to_evict(self, set_num, new_tag):
+        """
+        :param set_num: Index of a full cache set
+        :param new_tag: Tag of the entry about to be put into the set
+        :return: Tag of entry to evict based on replacement algorithm
+        """
+        raise NotImplementedError
 
     def update_alg_struct(self, set_num, tag):
         """
-        Update all structures related to the algorithm after a put, e.g. a dict for priorities
+        Update all structures related to the algorithm after a hit
+        :param set_num: Index of cache set
+        :param tag: Tag of the accessed key/value pair
+        """
+        raise NotImplementedError
+
+    def update_alg_struct_batch(self, set_nums, tags):
+        """
+        Same as calling update_alg_struct for every (set_nums[i], tags[i]) in order.
+        Subclasses may override this to avoid a method call per hit.
+        """
+        for set_num, tag in zip(set_nums, tags):
+            self.update_alg_struct(set_num, tag)
+
+    def update_alg_struct_on_insert(self, set_num, tag):
+        """
+        Update all structures related to the algorithm after a put into a set with free slots
         :param set_num: Index of cache set
         :param tag: Tag of key/value pair to add to alg struct
         """
-        if self._alg in ["lru", "mru"]:
-            self._timestamps[set_num][tag] = datetime.datetime.now()
-        elif self._alg == "fifo":
-            self._fifo_queue.append(tag)
+        raise NotImplementedError
+
+    def update_alg_struct_on_remove(self, set_num, tag):
+        """
+        Update all structures related to the algorithm after an entry is removed from the cache
+        :param set_num: Index of cache set
+        :param tag: Tag of key/value pair to remove from alg struct
+        """
+        raise NotImplementedError
 
     def update_alg_struct_on_evict(self, set_num, old_tag, new_tag):
         """
-        Update all structures related to the algorithm after an update, e.g. a dict for priorities
-        Remove all stored values pertaining to the old tag.
+        Update all structures related to the algorithm after old_tag was evicted to make room for new_tag
         :param set_num: Index of cache set
-        :param old_tag: Tag of old key/value pair to remove from alg struct
+        :param old_tag: Tag returned by get_tag_to_evict
         :param new_tag: Tag of new key/value pair to add to alg struct
         """
-        if self._alg in ["lru", "mru"]:
-            # remove old tag/timestamp value
-            self._timestamps[set_num].pop(old_tag)
+        self.update_alg_struct_on_remove(set_num, old_tag)
+        self.update_alg_struct_on_insert(set_num, new_tag)
 
-            # add new tag/timestamp value
-            self._timestamps[set_num][new_tag] = datetime.datetime.now()
-        elif self._alg == "fifo":
-            self._fifo_queue.append(new_tag)
+    def update_alg_struct_on_update(self, set_num, old_tag, new_tag):
+        """
+        Update all structures related to the algorithm after an entry's value, and so its tag, changed
+        :param set_num: Index of cache set
+        :param old_tag: Tag of the entry before the update
+        :param new_tag: Tag of the entry after the update
+        """
+        self.update_alg_struct_on_remove(set_num, old_tag)
+        self.update_alg_struct_on_insert(set_num, new_tag)
+
+    def update_alg_struct_on_resize(self, set_num, tag, size):
+        """
+        Called after an entry is inserted or its value changes, when the cache measures entry sizes
+        :param set_num: Index of cache set
+        :param tag: Tag of the entry
+        :param size: Size of the entry's value, as measured by the cache's sizer
+        """
+        pass
+
+    def clear_alg_struct(self):
+        self._state = [None] * self._sets
+
+    def export_set_state(self, set_num):
+        """
+        :return: Picklable state of one set, for Cache snapshots
+        """
+        return self._state[set_num]
+
+    def import_set_state(self, set_num, state):
+        """
+        Replaces the state of one set with one returned by export_set_state
+        """
+        self._state[set_num] = state
+
+    def export_set_order(self, set_num):
+        """
+        :return: Tags of the set's entries in the order that inserting them again, e.g. into the sets of
+            a resized cache, best rebuilds their standing: the entry to evict first comes first. None if
+            the algorithm keeps no order, in which case the cache's slot order is used
+        """
+        return None
+
+    def resized(self, sets, slots):
+        """
+        :return: New algorithm with the same settings, bound to the geometry of a resized cache
+        """
+        import copy
+
+        alg = copy.copy(self)
+        alg._state = None
+        return alg.bind(sets, slots)
+
+
+@register("lru")
+class LRU(ReplacementAlgorithm):
+    """
+    Evicts the least recently used entry.
+    Each set is an OrderedDict of tags ordered from least to most recently used.
+    """
+
+    def _new_set_state(self):
+        return OrderedDict()
+
+    def get_tag_to_evict(self, set_num, new_tag):
+        return next(iter(self._state[set_num]))
+
+    def update_alg_struct(self, set_num, tag):
+        self._state[set_num].move_to_end(tag)
+
+    def update_alg_struct_batch(self, set_nums, tags):
+        state = self._state
+        for set_num, tag in zip(set_nums, tags):
+            state[set_num].move_to_end(tag)
+
+    def update_alg_struct_on_insert(self, set_num, tag):
+        self._state[set_num][tag] = None
 
     def update_alg_struct_on_remove(self, set_num, tag):
-        if self._alg in ["lru", "mru"]:
-            self._timestamps[set_num].pop(tag)
-        elif self._alg == "fifo":
-            pass
+        del self._state[set_num][tag]
+
+    def export_set_order(self, set_num):
+        return list(self._state[set_num])
+
+
+@register("mru")
+class MRU(LRU):
+    """
+    Evicts the most recently used entry.
+    """
+
+    def get_tag_to_evict(self, set_num, new_tag):
+        return next(reversed(self._state[set_num]))
+
+
+@register("fifo")
+class FIFO(LRU):
+    """
+    Evicts the entry that was put into the set first; hits do not change the order.
+    """
+
+    def update_alg_struct(self, set_num, tag):
+        pass
+
+    def update_alg_struct_batch(self, set_nums, tags):
+        pass
+
+
+class _ClockSet:
+
+    def __init__(self):
+        """
+        ring: Tags in clock order, None for positions freed by remove
+        positions: Tag -> position in ring
+        referenced: Reference bit per ring position
+        """
+        self.ring = []
+        self.positions = dict()
+        self.referenced = bytearray()
+        self.free = []
+        self.hand = 0
+
+
+@register("clock")
+class Clock(ReplacementAlgorithm):
+    """
+    CLOCK / second chance: a hit sets the entry's reference bit, and the hand skips over (and clears)
+    referenced entries when looking for a victim.
+    """
+
+    def _new_set_state(self):
+        return _ClockSet()
+
+    def get_tag_to_evict(self, set_num, new_tag):
+        state = self._state[set_num]
+        ring = state.ring
+        referenced = state.referenced
+
+        while True:
+            tag = ring[state.hand]
+            if tag is not None:
+                if not referenced[state.hand]:
+                    return tag
+                referenced[state.hand] = 0
+            state.hand = (state.hand + 1) % len(ring)
+
+    def update_alg_struct(self, set_num, tag):
+        state = self._state[set_num]
+        state.referenced[state.positions[tag]] = 1
+
+    def update_alg_struct_on_insert(self, set_num, tag):
+        state = self._state[set_num]
+        if state.free:
+            i = state.free.pop()
+            state.ring[i] = tag
+            state.referenced[i] = 0
+        else:
+            i = len(state.ring)
+            state.ring.append(tag)
+            state.referenced.append(0)
+        state.positions[tag] = i
+
+    def update_alg_struct_on_remove(self, set_num, tag):
+        state = self._state[set_num]
+        i = state.positions.pop(tag)
+        state.ring[i] = None
+        state.free.append(i)
+
+    def export_set_order(self, set_num):
+        # clock order starting at the hand; reference bits are not kept
+        state = self._state[set_num]
+        ring = state.ring[state.hand:] + state.ring[:state.hand]
+        return [tag for tag in ring if tag is not None]
+
+    def update_alg_struct_on_evict(self, set_num, old_tag, new_tag):
+        # new entry takes the victim's place on the clock and the hand moves past it
+        state = self._state[set_num]
+        i = state.positions.pop(old_tag)
+        state.ring[i] = new_tag
+        state.referenced[i] = 0
+        state.positions[new_tag] = i
+        state.hand = (i + 1) % len(state.ring)
+
+
+class _LFUSet:
+
+    def __init__(self):
+        """
+        counts: Tag -> access count
+        buckets: Access count -> OrderedDict of tags with that count, least recently used first
+        """
+        self.counts = dict()
+        self.buckets = dict()
+        self.min_count = 0
+        self.hits = 0
+
+
+@register("lfu")
+class LFU(ReplacementAlgorithm):
+    """
+    Evicts the least frequently used entry, breaking ties by recency.
+    Counts are halved every aging_period * slots hits in a set, so entries that were popular once do
+    not stay cached forever.
+    """
+
+    def __init__(self, aging_period=16):
+        super().__init__()
+        self._aging_period = aging_period
+
+    def _new_set_state(self):
+        return _LFUSet()
+
+    def get_tag_to_evict(self, set_num, new_tag):
+        state = self._state[set_num]
+        return next(iter(state.buckets[state.min_count]))
+
+    def update_alg_struct(self, set_num, tag):
+        state = self._state[set_num]
+        count = state.counts[tag]
+        self._unlink(state, tag, count)
+        self._link(state, tag, count + 1)
+        if state.min_count == count and count not in state.buckets:
+            state.min_count = count + 1
+
+        state.hits += 1
+        if state.hits >= self._aging_period * self._slots:
+            self._age(state)
+
+    def update_alg_struct_on_insert(self, set_num, tag):
+        state = self._state[set_num]
+        self._link(state, tag, 1)
+        state.min_count = 1
+
+    def update_alg_struct_on_remove(self, set_num, tag):
+        state = self._state[set_num]
+        count = state.counts.pop(tag)
+        self._unlink(state, tag, count)
+        if state.min_count == count and count not in state.buckets:
+            state.min_count = min(state.buckets, default=0)
+
+    def update_alg_struct_on_update(self, set_num, old_tag, new_tag):
+        # an updated entry keeps its access count
+        state = self._state[set_num]
+        count = state.counts.pop(old_tag)
+        self._unlink(state, old_tag, count)
+        self._link(state, new_tag, count)
+
+    def export_set_order(self, set_num):
+        # least frequently used first; counts restart from 1
+        buckets = self._state[set_num].buckets
+        return [tag for count in sorted(buckets) for tag in buckets[count]]
+
+    def _link(self, state, tag, count):
+        state.counts[tag] = count
+        if count not in state.buckets:
+            state.buckets[count] = OrderedDict()
+        state.buckets[count][tag] = None
+
+    def _unlink(self, state, tag, count):
+        bucket = state.buckets[count]
+        del bucket[tag]
+        if not bucket:
+            del state.buckets[count]
+
+    def _age(self, state):
+        buckets = state.buckets
+        state.counts = dict()
+        state.buckets = dict()
+        state.hits = 0
+
+        for count in sorted(buckets):
+            for tag in buckets[count]:
+                self._link(state, tag, max(count >> 1, 1))
+        state.min_count = min(state.buckets, default=0)
+
+
+class _ARCSet:
+
+    def __init__(self):
+        """
+        t1: Entries seen once recently, t2: entries seen at least twice recently
+        b1, b2: Ghost tags recently evicted from t1 and t2
+        p: Target size of t1
+        """
+        self.t1 = OrderedDict()
+        self.t2 = OrderedDict()
+        self.b1 = OrderedDict()
+        self.b2 = OrderedDict()
+        self.p = 0
+
+
+@register("arc")
+class ARC(ReplacementAlgorithm):
+    """
+    Adaptive Replacement Cache, run independently in every set with capacity slots.
+    Balances recency (t1) against frequency (t2) using ghost hits to move the target size p.
+    """
+
+    def _new_set_state(self):
+        return _ARCSet()
+
+    def get_tag_to_evict(self, set_num, new_tag):
+        state = self._state[set_num]
+        p = self._adapt(state, new_tag)
+
+        if state.t1 and (not state.t2 or len(state.t1) > p or (new_tag in state.b2 and len(state.t1) == p)):
+            return next(iter(state.t1))
+        return next(iter(state.t2))
+
+    def update_alg_struct(self, set_num, tag):
+        state = self._state[set_num]
+        if tag in state.t1:
+            del state.t1[tag]
+            state.t2[tag] = None
+        else:
+            state.t2.move_to_end(tag)
+
+    def update_alg_struct_on_insert(self, set_num, tag):
+        state = self._state[set_num]
+        state.p = self._adapt(state, tag)
+
+        if tag in state.b1:
+            del state.b1[tag]
+            state.t2[tag] = None
+        elif tag in state.b2:
+            del state.b2[tag]
+            state.t2[tag] = None
+        else:
+            state.t1[tag] = None
+        self._trim_ghosts(state)
+
+    def update_alg_struct_on_remove(self, set_num, tag):
+        state = self._state[set_num]
+        if tag in state.t1:
+            del state.t1[tag]
+        else:
+            del state.t2[tag]
+
+    def update_alg_struct_on_evict(self, set_num, old_tag, new_tag):
+        state = self._state[set_num]
+        if old_tag in state.t1:
+            del state.t1[old_tag]
+            state.b1[old_tag] = None
+        else:
+            del state.t2[old_tag]
+            state.b2[old_tag] = None
+        self.update_alg_struct_on_insert(set_num, new_tag)
+
+    def update_alg_struct_on_update(self, set_num, old_tag, new_tag):
+        self.update_alg_struct_on_remove(set_num, old_tag)
+        self._state[set_num].t2[new_tag] = None
+
+    def export_set_order(self, set_num):
+        # ghosts and p are not kept
+        state = self._state[set_num]
+        return list(state.t1) + list(state.t2)
+
+    def _adapt(self, state, tag):
+        """
+        :return: Target size of t1 after a miss on tag
+        """
+        if tag in state.b1:
+            return min(self._slots, state.p + max(len(state.b2) / len(state.b1), 1))
+        elif tag in state.b2:
+            return max(0, state.p - max(len(state.b1) / len(state.b2), 1))
+        return state.p
+
+    def _trim_ghosts(self, state):
+        # keep |t1| + |b1| <= c and the whole directory <= 2c
+        while state.b1 and len(state.t1) + len(state.b1) > self._slots:
+            state.b1.popitem(last=False)
+        while len(state.t1) + len(state.t2) + len(state.b1) + len(state.b2) > 2 * self._slots:
+            (state.b2 or state.b1).popitem(last=False)
+
+
+class _TwoQSet:
+
+    def __init__(self):
+        """
+        a1in: FIFO of entries seen once, a1out: ghost tags evicted from a1in, am: LRU of entries seen again
+        """
+        self.a1in = OrderedDict()
+        self.a1out = OrderedDict()
+        self.am = OrderedDict()
+
+
+@register("2q")
+class TwoQ(ReplacementAlgorithm):
+    """
+    Full 2Q: new entries wait in a1in, and only entries referenced again after leaving it are promoted
+    to the main LRU queue am, so one-off scans never displace the working set.
+    """
+
+    def __init__(self, kin=0.25, kout=0.5):
+        """
+        :param kin: Fraction of slots reserved for a1in
+        :param kout: Number of ghost tags kept in a1out, as a fraction of slots
+        """
+        super().__init__()
+        self._kin = kin
+        self._kout = kout
+
+    def bind(self, sets, slots):
+        self._max_in = max(1, int(slots * self._kin))
+        self._max_out = max(1, int(slots * self._kout))
+        return super().bind(sets, slots)
+
+    def _new_set_state(self):
+        return _TwoQSet()
+
+    def get_tag_to_evict(self, set_num, new_tag):
+        state = self._state[set_num]
+        if state.a1in and (len(state.a1in) > self._max_in or not state.am):
+            return next(iter(state.a1in))
+        return next(iter(state.am))
+
+    def update_alg_struct(self, set_num, tag):
+        am = self._state[set_num].am
+        if tag in am:
+            am.move_to_end(tag)
+
+    def update_alg_struct_on_insert(self, set_num, tag):
+        state = self._state[set_num]
+        if tag in state.a1out:
+            del state.a1out[tag]
+            state.am[tag] = None
+        else:
+            state.a1in[tag] = None
+
+    def update_alg_struct_on_remove(self, set_num, tag):
+        state = self._state[set_num]
+        if tag in state.a1in:
+            del state.a1in[tag]
+        else:
+            del state.am[tag]
+
+    def update_alg_struct_on_evict(self, set_num, old_tag, new_tag):
+        state = self._state[set_num]
+        if old_tag in state.a1in:
+            del state.a1in[old_tag]
+            state.a1out[old_tag] = None
+            if len(state.a1out) > self._max_out:
+                state.a1out.popitem(last=False)
+        else:
+            del state.am[old_tag]
+        self.update_alg_struct_on_insert(set_num, new_tag)
+
+    def export_set_order(self, set_num):
+        state = self._state[set_num]
+        return list(state.a1in) + list(state.am)
+
+
+class _TinyLFUSet:
+
+    def __init__(self):
+        """
+        window: Admission window LRU
+        probation, protected: Segmented LRU for the main region
+        """
+        self.window = OrderedDict()
+        self.probation = OrderedDict()
+        self.protected = OrderedDict()
+
+
+@register("tinylfu")
+class TinyLFU(ReplacementAlgorithm):
+    """
+    W-TinyLFU: new entries go into a small LRU window. When the window overflows, its LRU entry only
+    displaces the main region's victim if a shared frequency sketch has seen it more often.
+    """
+
+    def __init__(self, window=0.01, protected=0.8):
+        """
+        :param window: Fraction of slots given to the admission window (at least one slot)
+        :param protected: Fraction of the main region given to the protected segment
+        """
+        super().__init__()
+        self._window = window
+        self._protected = protected
+        self._sketch = None
+
+    def bind(self, sets, slots):
+        self._max_window = max(1, int(slots * self._window))
+        self._max_protected = int((slots - self._max_window) * self._protected)
+        self._sketch = FrequencySketch.FrequencySketch(sets * slots)
+        return super().bind(sets, slots)
+
+    def _new_set_state(self):
+        return _TinyLFUSet()
+
+    def get_tag_to_evict(self, set_num, new_tag):
+        state = self._state[set_num]
+        main = state.probation or state.protected
+
+        if not main:
+            return next(iter(state.window))
+        main_victim = next(iter(main))
+        if len(state.window) < self._max_window:
+            return main_victim
+
+        candidate = next(iter(state.window))
+        if self._sketch.estimate(candidate) > self._sketch.estimate(main_victim):
+            return main_victim
+        return candidate
+
+    def update_alg_struct(self, set_num, tag):
+        state = self._state[set_num]
+        self._sketch.increment(tag)
+
+        if tag in state.window:
+            state.window.move_to_end(tag)
+        elif tag in state.probation:
+            del state.probation[tag]
+            state.protected[tag] = None
+            if len(state.protected) > self._max_protected:
+                state.probation[state.protected.popitem(last=False)[0]] = None
+        else:
+            state.protected.move_to_end(tag)
+
+    def update_alg_struct_on_insert(self, set_num, tag):
+        state = self._state[set_num]
+        self._sketch.increment(tag)
+
+        state.window[tag] = None
+        if len(state.window) > self._max_window:
+            state.probation[state.window.popitem(last=False)[0]] = None
+
+    def update_alg_struct_on_remove(self, set_num, tag):
+        state = self._state[set_num]
+        for segment in (state.window, state.probation, state.protected):
+            if tag in segment:
+                del segment[tag]
+                return
+
+    def export_set_order(self, set_num):
+        state = self._state[set_num]
+        return list(state.window) + list(state.probation) + list(state.protected)
 
     def clear_alg_struct(self):
-        if self._alg in ["lru", "mru"]:
-            for d in self._timestamps:
-                d.clear()
-        elif self._alg == "fifo":
-            self._fifo_queue.clear()
+        super().clear_alg_struct()
+        self._sketch.clear()
+
+    def resized(self, sets, slots):
+        # the sketch counts tags, which do not depend on the geometry, so it is kept unless it is too
+        # small for the new capacity
+        alg = super().resized(sets, slots)
+        if sets * slots <= self._sets * self._slots:
+            alg._sketch = self._sketch
+        return alg
+
+
+class _GDSSet:
+
+    def __init__(self):
+        """
+        items: Tag -> the entry's current heap item (H, sequence, tag)
+        sizes: Tag -> size, 1 until the cache reports one
+        heap: Heap items, least H first; items no longer current for their tag are skipped
+        inflation: L, the H of the last victim
+        sequence: Counter making items unique, so entries with equal H leave in LRU order
+        """
+        self.items = dict()
+        self.sizes = dict()
+        self.heap = []
+        self.inflation = 0.0
+        self.sequence = 0
+
+
+@register("gds")
+class GreedyDualSize(ReplacementAlgorithm):
+    """
+    GreedyDual-Size: an entry's priority H is L + cost / size, set on insert and on every hit, and the
+    entry with the least H is evicted. L rises to the H of every victim, so entries that are not hit
+    age relative to new ones. Sizes come from the cache's sizer; without one every entry has size 1
+    and the policy behaves like LRU.
+    """
+
+    def __init__(self, cost=None):
+        """
+        :param cost: Function of an entry's size returning the cost of missing it. Default is 1 for
+            every entry, which maximizes the hit ratio by favouring small values; returning size
+            instead maximizes the byte hit ratio
+        """
+        super().__init__()
+        self._cost = cost
+
+    def _new_set_state(self):
+        return _GDSSet()
+
+    def get_tag_to_evict(self, set_num, new_tag):
+        state = self._state[set_num]
+        heap = state.heap
+        while state.items.get(heap[0][2]) != heap[0]:
+            heapq.heappop(heap)
+        state.inflation = heap[0][0]
+        return heap[0][2]
+
+    def update_alg_struct(self, set_num, tag):
+        state = self._state[set_num]
+        self._push(state, tag, self._priority(state, tag))
+
+    def update_alg_struct_on_insert(self, set_num, tag):
+        state = self._state[set_num]
+        state.sizes[tag] = 1
+        self._push(state, tag, self._priority(state, tag))
+
+    def update_alg_struct_on_remove(self, set_num, tag):
+        state = self._state[set_num]
+        del state.items[tag]
+        del state.sizes[tag]
+
+    def update_alg_struct_on_update(self, set_num, old_tag, new_tag):
+        # an updated entry keeps its priority until the cache reports its new size
+        state = self._state[set_num]
+        state.sizes[new_tag] = state.sizes.pop(old_tag)
+        self._push(state, new_tag, state.items.pop(old_tag)[0])
+
+    def update_alg_struct_on_resize(self, set_num, tag, size):
+        state = self._state[set_num]
+        state.sizes[tag] = max(size, 1)
+        self._push(state, tag, self._priority(state, tag))
+
+    def export_set_order(self, set_num):
+        # least H first; H is recomputed from the sizes the cache reports again
+        return [item[2] for item in sorted(self._state[set_num].items.values())]
+
+    def _priority(self, state, tag):
+        size = state.sizes[tag]
+        cost = 1 if self._cost is None else self._cost(size)
+        return state.inflation + cost / size
+
+    def _push(self, state, tag, priority):
+        state.sequence += 1
+        item = (priority, state.sequence, tag)
+        state.items[tag] = item
+        heap = state.heap
+        heapq.heappush(heap, item)
+        if len(heap) > 2 * len(state.items) + 8:
+            # drop outdated items once they outnumber the current ones
+            state.heap = [item for item in heap if state.items.get(item[2]) == item]
+            heapq.heapify(state.heap)
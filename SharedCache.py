@@ -0,0 +1,308 @@
+import multiprocessing
+import pickle
+import struct
+from multiprocessing import shared_memory
+
+import Cache
+
+
+# block header: magic, sets, slots, value_size, hash of a fixed string to check all processes hash alike
+_HEADER = struct.Struct("<8sQQQq")
+_MAGIC = b"SACACHE1"
+# per set: tick of the last access, hits, misses
+_SET = struct.Struct("<QQQ")
+# per slot: tag, key_hash, stamp, value length, valid
+_SLOT = struct.Struct("<qqQIB3x")
+_STAMP = struct.Struct("<Q")
+_STAMP_OFFSET = 16
+_VALID_OFFSET = 28
+
+
+class SharedCache:
+
+    _ALGS = ("lru", "mru", "fifo")
+    _custom_hash = staticmethod(Cache.custom_hash)
+
+    def __init__(self, slots, size, alg="lru", value_size=256, stripes=64, serializer=pickle, name=None,
+                 context=None):
+        """
+        Set-associative cache in one multiprocessing.shared_memory block, shared by every process it is
+        handed to. Create it before forking workers (e.g. gunicorn with preload_app), or pass it to
+        multiprocessing.Process as an argument; it pickles by reference to the block and its locks.
+        Each set is stored as a header followed by fixed-size slot headers and fixed-size value buffers
+        holding serialized values, and is guarded by one of stripes multiprocessing locks.
+        Offers the same API as Cache, with tags hashing the key and the serialized value. Replacement
+        state must live in the block too, so victims are chosen by per-slot stamps and only "lru", "mru"
+        and "fifo" are supported.
+        Keys are hashed with Python's hash, so every process must share the hash seed: forked workers
+        do, others need the same PYTHONHASHSEED.
+        :param slots: Number of slots; specifies the -way associativity of the cache
+        :param size: Total number of slots in the cache
+        :param alg: "lru", "mru" or "fifo". Default is LRU
+        :param value_size: Bytes reserved per slot for the serialized value
+        :param stripes: Number of locks; set s is guarded by lock s % stripes
+        :param serializer: Object with dumps and loads functions, default pickle
+        :param name: Name of the shared memory block, default a random one
+        :param context: multiprocessing context of the processes sharing the cache, default the current one
+        """
+        if alg not in self._ALGS:
+            raise ValueError("SharedCache supports only these replacement algorithms: " + ", ".join(self._ALGS))
+
+        sets = int(size/slots)
+        set_bytes = _SET.size + slots * (_SLOT.size + value_size)
+        shm = shared_memory.SharedMemory(name, create=True, size=_HEADER.size + sets * set_bytes)
+        _HEADER.pack_into(shm.buf, 0, _MAGIC, sets, slots, value_size, hash(_MAGIC))
+        locks = [(context or multiprocessing).Lock() for _ in range(max(1, min(stripes, sets)))]
+        self._attach(shm, alg, locks, serializer, True)
+
+    def put(self, key, value):
+        """
+        Stores value in a free or evicted slot of the key's set.
+        Use update to update an entry with an existing key.
+        :param key: Key to use for cache access
+        :param value: Value to store in cache; its serialized form must fit in value_size bytes
+        """
+        data = self._dumps(value)
+        key_hash = self._custom_hash(key)
+        tag = self._custom_hash((key_hash, hash(data)))
+        set_num = key_hash % self._sets
+
+        with self._locks[set_num % len(self._locks)]:
+            offset = self._set_offset(set_num)
+            entries = self._read_slots(offset)
+            for i, (slot_tag, _, _, _, valid) in enumerate(entries):
+                if valid and slot_tag == tag:
+                    # identical key/value pair is already cached, refresh it instead of storing a duplicate
+                    if self._alg != "fifo":
+                        self._set_stamp(offset, i, self._next_tick(offset))
+                    return
+            self._write_slot(offset, self._get_index_to_evict(entries), tag, key_hash, data)
+
+    def update(self, key, new_value):
+        """
+        Updates an existing entry in the cache.
+        :param key: Specifies which entry to be replaced
+        :param new_value: Value to store in entry, replacing old_value
+        :return: Set number the value was stored in, or -1 if key was not found
+        """
+        data = self._dumps(new_value)
+        key_hash = self._custom_hash(key)
+        new_tag = self._custom_hash((key_hash, hash(data)))
+        set_num = key_hash % self._sets
+
+        with self._locks[set_num % len(self._locks)]:
+            offset = self._set_offset(set_num)
+            entries = self._read_slots(offset)
+            i = self._find(entries, key_hash)
+            self._count(offset, i >= 0)
+            if i < 0:
+                return -1
+
+            for j, (slot_tag, _, _, _, valid) in enumerate(entries):
+                if valid and slot_tag == new_tag and j != i:
+                    # another entry already holds this key/value pair, drop the stale one
+                    self._invalidate(offset, i)
+                    return set_num
+            self._write_slot(offset, i, new_tag, key_hash, data)
+        return set_num
+
+    def get(self, key, default=None):
+        """
+        Gets value in cache given key
+        :param default: Returned if no entry matches key
+        :return: Value corresponding to key, or default if no matching key
+        """
+        key_hash = self._custom_hash(key)
+        set_num = key_hash % self._sets
+
+        with self._locks[set_num % len(self._locks)]:
+            offset = self._set_offset(set_num)
+            entries = self._read_slots(offset)
+            i = self._find(entries, key_hash)
+            self._count(offset, i >= 0)
+            if i < 0:
+                return default
+            data = self._read_value(offset, i, entries[i][3])
+            if self._alg != "fifo":
+                self._set_stamp(offset, i, self._next_tick(offset))
+        return self._serializer.loads(data)
+
+    def remove(self, key):
+        """
+        Removes entry from cache given key
+        :return: Value corresponding to key if successful, or None if no matching key
+        """
+        key_hash = self._custom_hash(key)
+        set_num = key_hash % self._sets
+
+        with self._locks[set_num % len(self._locks)]:
+            offset = self._set_offset(set_num)
+            entries = self._read_slots(offset)
+            i = self._find(entries, key_hash)
+            if i < 0:
+                return None
+            data = self._read_value(offset, i, entries[i][3])
+            self._invalidate(offset, i)
+        return self._serializer.loads(data)
+
+    def clear(self):
+        """
+        Clears entire cache, removing all entries and counters. Holds every lock while clearing.
+        """
+        for lock in self._locks:
+            lock.acquire()
+        try:
+            for set_num in range(self._sets):
+                offset = self._set_offset(set_num)
+                self._shm.buf[offset:offset + _SET.size + self._slots * _SLOT.size] = \
+                    bytes(_SET.size + self._slots * _SLOT.size)
+        finally:
+            for lock in reversed(self._locks):
+                lock.release()
+
+    def get_hits(self):
+        """
+        :return: Number of cache hits across all processes
+        """
+        return sum(_SET.unpack_from(self._shm.buf, self._set_offset(s))[1] for s in range(self._sets))
+
+    def get_misses(self):
+        """
+        :return: Number of cache misses across all processes
+        """
+        return sum(_SET.unpack_from(self._shm.buf, self._set_offset(s))[2] for s in range(self._sets))
+
+    def _get_set_num(self, key):
+        """
+        :return: Set index number given key
+        """
+        return self._custom_hash(key) % self._sets
+
+    def get_name(self):
+        """
+        :return: Name of the shared memory block
+        """
+        return self._shm.name
+
+    def close(self):
+        """
+        Detaches this process from the block. Other processes keep using it.
+        """
+        self._shm.close()
+
+    def unlink(self):
+        """
+        Frees the block once every process has closed it. Call once, from the process that created it.
+        """
+        self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        if self._owner:
+            self.unlink()
+
+    def __getstate__(self):
+        # modules do not pickle; send the default serializer by reference
+        serializer = None if self._serializer is pickle else self._serializer
+        return self._shm.name, self._alg, self._locks, serializer
+
+    def __setstate__(self, state):
+        name, alg, locks, serializer = state
+        try:
+            shm = shared_memory.SharedMemory(name, track=False)
+        except TypeError:
+            # before Python 3.13 attaching registers the block with the resource tracker, which is
+            # harmless here: processes started by multiprocessing share their parent's tracker
+            shm = shared_memory.SharedMemory(name)
+        self._attach(shm, alg, locks, serializer or pickle, False)
+
+    def _attach(self, shm, alg, locks, serializer, owner):
+        magic, sets, slots, value_size, hash_check = _HEADER.unpack_from(shm.buf, 0)
+        if magic != _MAGIC:
+            raise ValueError("Shared memory block %s does not hold a SharedCache" % shm.name)
+        if hash_check != hash(_MAGIC):
+            raise ValueError("This process hashes differently from the one that created the cache; "
+                             "set the same PYTHONHASHSEED in every process")
+        self._shm = shm
+        self._alg = alg
+        self._locks = locks
+        self._serializer = serializer
+        self._owner = owner
+        self._sets = sets
+        self._slots = slots
+        self._value_size = value_size
+        self._set_bytes = _SET.size + slots * (_SLOT.size + value_size)
+
+    def _dumps(self, value):
+        data = self._serializer.dumps(value)
+        if len(data) > self._value_size:
+            raise ValueError("Serialized value takes %d bytes, more than value_size %d" % (len(data), self._value_size))
+        return data
+
+    def _set_offset(self, set_num):
+        return _HEADER.size + set_num * self._set_bytes
+
+    def _slot_offset(self, offset, i):
+        return offset + _SET.size + i * _SLOT.size
+
+    def _value_offset(self, offset, i):
+        return offset + _SET.size + self._slots * _SLOT.size + i * self._value_size
+
+    def _read_slots(self, offset):
+        """
+        :return: List of (tag, key_hash, stamp, length, valid) for every slot of the set at offset
+        """
+        start = offset + _SET.size
+        return list(_SLOT.iter_unpack(self._shm.buf[start:start + self._slots * _SLOT.size]))
+
+    def _read_value(self, offset, i, length):
+        start = self._value_offset(offset, i)
+        return bytes(self._shm.buf[start:start + length])
+
+    def _find(self, entries, key_hash):
+        """
+        :return: Index of the first valid slot holding key_hash, or -1
+        """
+        for i, (_, slot_key_hash, _, _, valid) in enumerate(entries):
+            if valid and slot_key_hash == key_hash:
+                return i
+        return -1
+
+    def _write_slot(self, offset, i, tag, key_hash, data):
+        start = self._value_offset(offset, i)
+        self._shm.buf[start:start + len(data)] = data
+        _SLOT.pack_into(self._shm.buf, self._slot_offset(offset, i), tag, key_hash, self._next_tick(offset), len(data), 1)
+
+    def _set_stamp(self, offset, i, stamp):
+        _STAMP.pack_into(self._shm.buf, self._slot_offset(offset, i) + _STAMP_OFFSET, stamp)
+
+    def _invalidate(self, offset, i):
+        self._shm.buf[self._slot_offset(offset, i) + _VALID_OFFSET] = 0
+
+    def _next_tick(self, offset):
+        tick = _STAMP.unpack_from(self._shm.buf, offset)[0] + 1
+        _STAMP.pack_into(self._shm.buf, offset, tick)
+        return tick
+
+    def _count(self, offset, hit):
+        tick, hits, misses = _SET.unpack_from(self._shm.buf, offset)
+        if hit:
+            hits += 1
+        else:
+            misses += 1
+        _SET.pack_into(self._shm.buf, offset, tick, hits, misses)
+
+    def _get_index_to_evict(self, entries):
+        """
+        :return: Index of a free slot, or of the slot to evict if the set is full
+        """
+        for i, entry in enumerate(entries):
+            if not entry[4]:
+                return i
+        stamps = [entry[2] for entry in entries]
+        if self._alg == "mru":
+            return stamps.index(max(stamps))
+        return stamps.index(min(stamps))
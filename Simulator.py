@@ -0,0 +1,152 @@
+"""
+Replays access traces through Cache and compares configurations.
+
+    python Simulator.py trace.txt --slots 2 4 8 --sizes 1024 4096 --algs lru arc 2q
+
+Trace formats:
+    keys: one key per line. Each line is a get; a miss is followed by a put of the key (demand fill).
+    csv: op,key[,value] per line with op one of get, put, update, remove. Ops are replayed as given.
+The format is detected from the first line unless --format is given. Traces are streamed, never
+loaded into memory, and every configuration of the sweep runs in its own worker process.
+"""
+import argparse
+import concurrent.futures
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+
+import Cache
+
+
+OPS = ("get", "put", "update", "remove")
+
+
+def detect_format(path):
+    """
+    :return: "csv" if the first line of the trace looks like op,key[,value], else "keys"
+    """
+    with open(path, newline="") as trace:
+        first = trace.readline()
+    op = first.split(",", 1)[0].strip().lower()
+    return "csv" if "," in first and op in OPS else "keys"
+
+
+def read_trace(path, trace_format="auto"):
+    """
+    Streams a trace file.
+    :return: Generator of (op, key, value) tuples
+    """
+    if trace_format == "auto":
+        trace_format = detect_format(path)
+
+    with open(path, newline="") as trace:
+        if trace_format == "keys":
+            for line in trace:
+                key = line.strip()
+                if key:
+                    yield "access", key, key
+        elif trace_format == "csv":
+            reader = csv.reader(trace)
+            for row in reader:
+                if row:
+                    op = row[0].strip().lower()
+                    if op not in OPS:
+                        raise ValueError("Unknown trace op on line %d: %s" % (reader.line_num, row[0]))
+                    if len(row) < 2:
+                        raise ValueError("Trace op without a key on line %d: %s" % (reader.line_num, row[0]))
+                    yield op, row[1], row[2] if len(row) > 2 else row[1]
+        else:
+            raise ValueError("Unknown trace format: " + trace_format)
+
+
+def simulate(path, slots, size, alg, trace_format="auto"):
+    """
+    Replays one trace through one cache configuration.
+    :return: Dict with the configuration, hits, misses, hit_ratio, miss_ratio, ops and ops_per_sec
+    """
+    sa_cache = Cache.Cache(slots, size, alg)
+    ops = 0
+
+    start = time.perf_counter()
+    for op, key, value in read_trace(path, trace_format):
+        ops += 1
+        if op == "access":
+            if sa_cache.get(key) is None:
+                sa_cache.put(key, value)
+        elif op == "get":
+            sa_cache.get(key)
+        elif op == "put":
+            sa_cache.put(key, value)
+        elif op == "update":
+            sa_cache.update(key, value)
+        else:
+            sa_cache.remove(key)
+    elapsed = time.perf_counter() - start
+
+    hits = sa_cache.get_hits()
+    misses = sa_cache.get_misses()
+    lookups = hits + misses
+    return {
+        "slots": slots,
+        "size": size,
+        "alg": alg,
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": hits / lookups if lookups else 0.0,
+        "miss_ratio": misses / lookups if lookups else 0.0,
+        "ops": ops,
+        "ops_per_sec": ops / elapsed if elapsed else 0.0,
+    }
+
+
+def sweep(path, slots_list, sizes, algs, trace_format="auto", workers=None):
+    """
+    Simulates every combination of associativity, size and algorithm.
+    :param workers: Number of worker processes; None uses every core, 1 runs in this process
+    :return: List of simulate results, in grid order
+    """
+    if trace_format == "auto":
+        trace_format = detect_format(path)
+    grid = [(slots, size, alg) for slots, size, alg in itertools.product(slots_list, sizes, algs) if slots <= size]
+
+    if workers == 1:
+        return [simulate(path, slots, size, alg, trace_format) for slots, size, alg in grid]
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(simulate, path, slots, size, alg, trace_format) for slots, size, alg in grid]
+        return [future.result() for future in futures]
+
+
+def format_table(results):
+    lines = ["%6s %10s %10s %10s %10s %12s" % ("slots", "size", "alg", "hit ratio", "miss ratio", "ops/sec")]
+    for result in results:
+        lines.append("%6d %10d %10s %10.4f %10.4f %12.0f" % (
+            result["slots"], result["size"], result["alg"],
+            result["hit_ratio"], result["miss_ratio"], result["ops_per_sec"]))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay an access trace through a grid of Cache configurations")
+    parser.add_argument("trace", help="Trace file: one key per line, or op,key[,value] CSV")
+    parser.add_argument("--format", dest="trace_format", choices=["auto", "keys", "csv"], default="auto")
+    parser.add_argument("--slots", type=int, nargs="+", default=[2, 4, 8], help="Associativities to simulate")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1024], help="Total slot counts to simulate")
+    parser.add_argument("--algs", nargs="+", default=["lru"], help="Replacement algorithms to simulate")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    results = sweep(args.trace, args.slots, args.sizes, args.algs, args.trace_format, args.workers)
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    else:
+        print(format_table(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+
+
+class SpillStore:
+
+    slots = 0
+
+    def __init__(self, directory=None, segment_bytes=1 << 24, max_bytes=None, compact_ratio=0.5,
+                 serializer=pickle):
+        """
+        On-disk second tier for a Cache: entries the cache evicts on put are appended to segment files,
+        and a get that misses the cache's sets but finds its key here reads the entry back and puts it
+        into the cache again. Pass it to Cache as spill.
+        Every entry's location is kept in an in-memory index, so a true miss costs one dict lookup and
+        no disk I/O. Segments are append-only; entries read back, replaced or dropped leave dead bytes,
+        and a background thread rewrites the live entries of segments whose dead share reaches
+        compact_ratio into the current segment, then deletes them.
+        Files live in a private subdirectory of directory, removed by close or clear. Entries are not
+        kept across processes; use Cache.save for that.
+        :param directory: Directory for the segment files, default the system temporary directory
+        :param segment_bytes: Size after which a segment is sealed and a new one started
+        :param max_bytes: Limit on the total size of live entries; the oldest are dropped to meet it.
+            Default is None: unbounded
+        :param compact_ratio: Share of dead bytes that makes a sealed segment due for compaction
+        :param serializer: Object with dumps and loads functions used for values, default pickle
+        """
+        self._directory = tempfile.mkdtemp(prefix="sa-cache-spill-", dir=directory)
+        self._segment_bytes = segment_bytes
+        self._max_bytes = max_bytes
+        self._compact_ratio = compact_ratio
+        self._serializer = serializer
+        self._clock = None
+
+        # key hash -> (segment, offset, length, tag, deadline), oldest first
+        self._index = dict()
+        # segment -> [file descriptor, size, dead bytes]
+        self._segments = dict()
+        self._active = -1
+        self._next_segment = 0
+        self._live_bytes = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._compactor = None
+        # sealed segments being compacted
+        self._compacting = set()
+        self._closed = False
+
+    def bind(self, clock):
+        """
+        Attaches the store to a cache
+        :param clock: Clock of the cache, which entry deadlines refer to
+        :return: self
+        """
+        if self._clock is not None:
+            raise ValueError("SpillStore instance is already bound to a cache")
+        self._clock = clock
+        return self
+
+    def add(self, entry, deadlines):
+        """
+        Appends an entry the cache is evicting. An entry whose value cannot be serialized is dropped, as
+        if the cache had no spill store, along with any older copy of its key
+        :param entry: [tag, value, key_hash] entry of a set
+        :param deadlines: tag -> deadline dict of the entry's set, or None
+        """
+        tag, value, key_hash = entry
+        try:
+            data = self._serializer.dumps(value)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            self.discard(key_hash)
+            return
+        with self._lock:
+            self._drop(key_hash)
+            if self._active < 0 or self._segments[self._active][1] >= self._segment_bytes:
+                self._start_segment()
+            segment = self._segments[self._active]
+            os.write(segment[0], data)
+            self._index[key_hash] = (self._active, segment[1], len(data), tag,
+                                     deadlines.get(tag) if deadlines else None)
+            segment[1] += len(data)
+            self._live_bytes += len(data)
+            if self._max_bytes is not None:
+                while self._live_bytes > self._max_bytes:
+                    self._drop(next(iter(self._index)))
+
+    def pop(self, key_hash, default=None):
+        """
+        Removes an entry to promote it back into the cache
+        :return: (tag, value, deadline) of the entry, or default if there is none
+        """
+        if key_hash not in self._index:
+            # true misses take no lock and no disk read
+            return default
+        with self._lock:
+            location = self._index.get(key_hash)
+            if location is None:
+                # dropped by the compactor meanwhile
+                return default
+            segment, offset, length, tag, deadline = location
+            data = os.pread(self._segments[segment][0], length, offset)
+            self._drop(key_hash)
+        return tag, self._serializer.loads(data), deadline
+
+    def discard(self, key_hash):
+        """
+        Drops the entry under key_hash, if any, because the cache stored a newer one
+        """
+        if key_hash in self._index:
+            with self._lock:
+                self._drop(key_hash)
+
+    def clear(self):
+        """
+        Drops every entry and deletes every segment file
+        """
+        with self._lock:
+            for segment in list(self._segments):
+                self._delete_segment(segment)
+            self._index.clear()
+            self._active = -1
+            self._live_bytes = 0
+
+    def compact(self):
+        """
+        Compacts every sealed segment due for it now, instead of waiting for the background thread
+        """
+        while True:
+            with self._lock:
+                segment = self._segment_to_compact()
+            if segment is None:
+                return
+            self._compact(segment)
+
+    def close(self):
+        """
+        Stops the background thread and deletes the store's directory
+        """
+        with self._lock:
+            self._closed = True
+            self._wakeup.notify()
+        if self._compactor is not None:
+            self._compactor.join()
+        self.clear()
+        shutil.rmtree(self._directory, ignore_errors=True)
+
+    def get_bytes(self):
+        """
+        :return: Total size of the segment files, including dead bytes not compacted yet
+        """
+        return sum(segment[1] for segment in list(self._segments.values()))
+
+    def __contains__(self, key_hash):
+        return key_hash in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def _path(self, segment):
+        return os.path.join(self._directory, "%08d.seg" % segment)
+
+    def _start_segment(self):
+        """
+        Seals the current segment and starts a new one; call with the lock held
+        """
+        sealed = self._active
+        self._active = self._next_segment
+        self._next_segment += 1
+        descriptor = os.open(self._path(self._active), os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o600)
+        self._segments[self._active] = [descriptor, 0, 0]
+        if sealed in self._segments:
+            self._check_segment(sealed)
+
+    def _drop(self, key_hash):
+        """
+        Removes key_hash from the index, leaving its bytes dead; call with the lock held
+        """
+        location = self._index.pop(key_hash, None)
+        if location is None:
+            return
+        segment_num, _, length = location[:3]
+        self._segments[segment_num][2] += length
+        self._live_bytes -= length
+        self._check_segment(segment_num)
+
+    def _check_segment(self, segment_num):
+        """
+        Deletes a sealed segment without live entries, or has it compacted if enough of it is dead; call
+        with the lock held
+        """
+        segment = self._segments[segment_num]
+        if segment_num != self._active and segment[2] >= segment[1] * self._compact_ratio:
+            if segment[2] == segment[1]:
+                self._delete_segment(segment_num)
+            else:
+                self._start_compactor()
+
+    def _delete_segment(self, segment):
+        descriptor = self._segments.pop(segment)[0]
+        os.close(descriptor)
+        os.remove(self._path(segment))
+
+    def _segment_to_compact(self):
+        """
+        :return: A sealed segment due for compaction and not being compacted, marked as being compacted,
+            or None; call with the lock held
+        """
+        for segment_num, segment in self._segments.items():
+            if (segment_num != self._active and segment_num not in self._compacting
+                    and segment[2] >= segment[1] * self._compact_ratio):
+                self._compacting.add(segment_num)
+                return segment_num
+        return None
+
+    def _start_compactor(self):
+        if self._compactor is None:
+            self._compactor = threading.Thread(target=self._run_compactor, name="SpillStore compactor", daemon=True)
+            self._compactor.start()
+        self._wakeup.notify()
+
+    def _run_compactor(self):
+        while True:
+            with self._lock:
+                segment = self._segment_to_compact()
+                while segment is None and not self._closed:
+                    self._wakeup.wait()
+                    segment = self._segment_to_compact()
+                if self._closed:
+                    return
+            self._compact(segment)
+
+    def _compact(self, segment_num):
+        """
+        Copies the live entries of a sealed segment into the current one and deletes it
+        """
+        with self._lock:
+            if segment_num not in self._segments:
+                self._compacting.discard(segment_num)
+                return
+            size = self._segments[segment_num][1]
+            live = [(key_hash, location) for key_hash, location in self._index.items()
+                    if location[0] == segment_num]
+            expired = self._clock() if self._clock is not None else None
+            # a descriptor of its own keeps the file readable even if clear deletes it meanwhile
+            descriptor = os.open(self._path(segment_num), os.O_RDONLY)
+        try:
+            # sealed segments never change, so they are read without holding the lock
+            data = os.pread(descriptor, size, 0)
+        finally:
+            os.close(descriptor)
+
+        with self._lock:
+            self._compacting.discard(segment_num)
+            for key_hash, location in live:
+                if self._index.get(key_hash) != location:
+                    # read back or replaced in the meantime
+                    continue
+                _, offset, length, tag, deadline = location
+                if deadline is not None and expired is not None and deadline <= expired:
+                    self._drop(key_hash)
+                    continue
+                if self._active < 0 or self._segments[self._active][1] >= self._segment_bytes:
+                    self._start_segment()
+                active = self._segments[self._active]
+                os.write(active[0], data[offset:offset + length])
+                # keeps the entry's place in the index, so max_bytes still drops the oldest entries first
+                self._index[key_hash] = (self._active, active[1], length, tag, deadline)
+                active[1] += length
+            if segment_num in self._segments:
+                self._delete_segment(segment_num)
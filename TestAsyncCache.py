@@ -0,0 +1,139 @@
+import asyncio
+import unittest
+import AsyncCache
+
+
+class TestAsyncCache(unittest.IsolatedAsyncioTestCase):
+
+    async def test_get_or_load(self):
+        calls = []
+
+        async def loader(key):
+            calls.append(key)
+            return key * 2
+
+        sa_cache = AsyncCache.AsyncCache(loader, 2, 8)
+        self.assertEqual(6, await sa_cache.get_or_load(3))
+        self.assertEqual(6, await sa_cache.get_or_load(3))
+        self.assertEqual([3], calls)
+        self.assertEqual(6, sa_cache.get(3))
+        self.assertEqual(2, sa_cache.get_hits())
+        self.assertEqual(1, sa_cache.get_misses())
+
+        # plain functions work as loaders, and None is cached like any value
+        sa_cache = AsyncCache.AsyncCache(lambda key: calls.append(key), 2, 8)
+        self.assertIsNone(await sa_cache.get_or_load("a"))
+        self.assertIsNone(await sa_cache.get_or_load("a"))
+        self.assertEqual([3, "a"], calls)
+
+        sa_cache.put("b", 1)
+        self.assertEqual(1, await sa_cache.get_or_load("b"))
+        self.assertEqual(1, sa_cache.remove("b"))
+        self.assertIsNone(sa_cache.get("b"))
+
+    async def test_coalescing(self):
+        calls = []
+        release = asyncio.Event()
+
+        async def loader(key):
+            calls.append(key)
+            await release.wait()
+            return key
+
+        sa_cache = AsyncCache.AsyncCache(loader, 2, 8)
+        waiters = [asyncio.ensure_future(sa_cache.get_or_load(key)) for key in (1, 1, 1, 2)]
+        await asyncio.sleep(0)
+        release.set()
+        self.assertEqual([1, 1, 1, 2], await asyncio.gather(*waiters))
+        self.assertEqual([1, 2], calls)
+
+    async def test_colliding_keys(self):
+        calls = []
+        release = asyncio.Event()
+
+        async def loader(key):
+            calls.append(key)
+            await release.wait()
+            return "value-for-%d" % key
+
+        # hash(-1) == hash(-2), so both keys share one entry and one load slot
+        sa_cache = AsyncCache.AsyncCache(loader, 2, 8)
+        waiters = [asyncio.ensure_future(sa_cache.get_or_load(key)) for key in (-1, -2, -1)]
+        await asyncio.sleep(0)
+        release.set()
+        self.assertEqual(["value-for--1", "value-for--2", "value-for--1"], await asyncio.gather(*waiters))
+        self.assertEqual([-1, -2], calls)
+        self.assertEqual("value-for--2", await sa_cache.get_or_load(-2))
+        self.assertEqual("value-for--1", await sa_cache.get_or_load(-1))
+        self.assertEqual([-1, -2, -1], calls)
+        self.assertIsNone(sa_cache.get(-2))
+        self.assertIsNone(sa_cache.remove(-2))
+        self.assertEqual("value-for--1", sa_cache.remove(-1))
+        self.assertFalse(sa_cache._loads)
+
+    async def test_loader_error(self):
+        calls = []
+
+        async def loader(key):
+            calls.append(key)
+            raise KeyError(key)
+
+        sa_cache = AsyncCache.AsyncCache(loader, 2, 8)
+        results = await asyncio.gather(sa_cache.get_or_load(1), sa_cache.get_or_load(1), return_exceptions=True)
+        self.assertTrue(all(isinstance(result, KeyError) for result in results))
+        # failures are not cached
+        with self.assertRaises(KeyError):
+            await sa_cache.get_or_load(1)
+        self.assertEqual([1, 1], calls)
+
+    async def test_max_loads(self):
+        running = [0]
+        peak = [0]
+
+        async def loader(key):
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+            await asyncio.sleep(0)
+            running[0] -= 1
+            return key
+
+        sa_cache = AsyncCache.AsyncCache(loader, 4, 64, max_loads=2)
+        self.assertEqual(list(range(10)), await asyncio.gather(*[sa_cache.get_or_load(key) for key in range(10)]))
+        self.assertEqual(2, peak[0])
+
+    async def test_stale_while_revalidate(self):
+        now = [0.0]
+        version = [0]
+        release = asyncio.Event()
+
+        async def loader(key):
+            if version[0]:
+                await release.wait()
+            return version[0]
+
+        sa_cache = AsyncCache.AsyncCache(loader, 2, 8, refresh_after=5, clock=lambda: now[0])
+        self.assertEqual(0, await sa_cache.get_or_load("a"))
+
+        # a stale hit returns the old value at once and reloads in the background, once
+        now[0] = 5
+        version[0] = 1
+        self.assertEqual(0, await sa_cache.get_or_load("a"))
+        self.assertEqual(0, await sa_cache.get_or_load("a"))
+        self.assertEqual(1, len(sa_cache._loads))
+        release.set()
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        self.assertEqual(1, await sa_cache.get_or_load("a"))
+
+        # a failed refresh keeps the stale value
+        async def failing(key):
+            raise ValueError(key)
+
+        sa_cache._loader = failing
+        now[0] = 20
+        self.assertEqual(1, await sa_cache.get_or_load("a"))
+        await asyncio.sleep(0)
+        self.assertEqual(1, await sa_cache.get_or_load("a"))
+
+if __name__ == "__main__":
+    unittest.main()
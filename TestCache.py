@@ -1,8 +1,17 @@
+import os
+import shutil
+import sys
+import tempfile
 import unittest
+import AdmissionFilter
 import Cache
 import Student
 
 
+# built-in algorithms only: custom ones registered by other tests may not survive a snapshot
+ALGORITHMS = ("lru", "mru", "fifo", "clock", "lfu", "arc", "2q", "tinylfu", "gds")
+
+
 class TestCache(unittest.TestCase):
 
     def test_new_cache_is_empty(self):
@@ -27,6 +36,36 @@ class TestCache(unittest.TestCase):
         data = (55, -27)
         self.assertIsNone(sa_cache.get(data[0]))
 
+    def test_key_tags(self):
+        sa_cache = Cache.Cache(2, 2, key_tags=True)
+        data = (222, 793914)
+        sa_cache.put(data[0], data[1])
+        self.assertEqual(data[0], sa_cache._cache[0][0][0])
+
+        # put on an existing key is an upsert, not a second entry
+        sa_cache.put(data[0], [1, 2])
+        self.assertEqual(1, len(sa_cache._cache[0]))
+        self.assertEqual([1, 2], sa_cache.get(data[0]))
+
+        # update does not count as a get
+        self.assertEqual(0, sa_cache.update(data[0], {"a": 1}))
+        self.assertEqual(-1, sa_cache.update("missing", 1))
+        self.assertEqual(1, sa_cache.get_hits())
+        self.assertEqual(0, sa_cache.get_misses())
+        self.assertEqual({"a": 1}, sa_cache.get(data[0]))
+
+        sa_cache.put("b", 2)
+        sa_cache.get(data[0])
+        sa_cache.put("c", 3)
+        self.assertIsNone(sa_cache.get("b"))
+        self.assertEqual(3, sa_cache.remove("c"))
+        self.assertEqual({"a": 1}, sa_cache.remove(data[0]))
+        self.assertFalse(sa_cache._cache[0])
+        self.assertFalse(sa_cache._keys[0])
+
+        sa_cache.put_many([("x", 1), ("x", 2)])
+        self.assertEqual([2], sa_cache.get_many(["x"]))
+
     def test_get(self):
         sa_cache = Cache.Cache(2, 8)
         data = (1, 20)
@@ -57,6 +96,27 @@ class TestCache(unittest.TestCase):
         for entry in sa_cache._cache:
             self.assertFalse(entry)
 
+    def test_key_index(self):
+        sa_cache = Cache.Cache(4, 4)
+        sa_cache.put("a", 1)
+        sa_cache.put("b", 2)
+        sa_cache.put("a", 3)
+        sa_cache.put("a", 1)
+        self.assertEqual(3, len(sa_cache._cache[0]))
+
+        # first entry stored under a key wins, as with a front-to-back scan
+        self.assertEqual(1, sa_cache.get("a"))
+        self.assertEqual(1, sa_cache.remove("a"))
+        self.assertEqual(3, sa_cache.get("a"))
+        self.assertEqual(2, sa_cache.get("b"))
+
+        self.assertEqual(0, sa_cache.update("a", 4))
+        self.assertEqual(4, sa_cache.remove("a"))
+        self.assertIsNone(sa_cache.get("a"))
+        self.assertEqual(2, sa_cache.remove("b"))
+        self.assertFalse(sa_cache._keys[0])
+        self.assertFalse(sa_cache._tags[0])
+
     def test_clear(self):
         sa_cache = Cache.Cache(2, 8)
         sa_cache.clear()
@@ -130,6 +190,22 @@ class TestCache(unittest.TestCase):
         self.assertIsNone(sa_cache.get(collision[data[10][0]][0]))
         self.assertEqual(data[10][1], sa_cache.get(data[10][0]))
 
+    def test_recency_order(self):
+        # entries touched within the same clock tick must still evict in access order
+        lru_cache = Cache.Cache(4, 4, "lru")
+        mru_cache = Cache.Cache(4, 4, "mru")
+        for sa_cache in (lru_cache, mru_cache):
+            for key in "abcd":
+                sa_cache.put(key, key.upper())
+            sa_cache.get("a")
+            sa_cache.get("c")
+            sa_cache.put("e", "E")
+
+        self.assertIsNone(lru_cache.get("b"))
+        self.assertEqual("A", lru_cache.get("a"))
+        self.assertIsNone(mru_cache.get("c"))
+        self.assertEqual("B", mru_cache.get("b"))
+
     def test_custom_alg(self):
         sa_cache = Cache.Cache(2, 8, "fifo")
         data = [(x, x**2) for x in range(11)]
@@ -160,6 +236,27 @@ class TestCache(unittest.TestCase):
         self.assertIsNone(sa_cache.get(collision[data[10][0]][0]))
         self.assertEqual(data[10][1], sa_cache.get(data[10][0]))
 
+    def test_fifo_per_set(self):
+        sa_cache = Cache.Cache(2, 4, "fifo")
+        keys = [0, 2, 4, 1, 3, 6]
+        for key in keys:
+            sa_cache.put(key, key)
+
+        # each set evicts its own oldest entry
+        self.assertIsNone(sa_cache.get(0))
+        self.assertIsNone(sa_cache.get(2))
+        self.assertEqual(1, sa_cache.get(1))
+        self.assertEqual(3, sa_cache.get(3))
+
+        # removed and updated entries do not linger in the queue
+        sa_cache.remove(4)
+        sa_cache.update(6, 36)
+        sa_cache.put(8, 8)
+        sa_cache.put(10, 10)
+        self.assertIsNone(sa_cache.get(6))
+        for set_num in range(2):
+            self.assertEqual(2, len(sa_cache._repl_alg._state[set_num]))
+
     def test_different_n(self):
         # lru
         sa_cache_2way = Cache.Cache(2, 16)
@@ -187,6 +284,26 @@ class TestCache(unittest.TestCase):
         self.assertIn(3, [len(sa_cache_3way._cache[set_num]) for set_num in range(5)])
         self.assertIn(5, [len(sa_cache_5way._cache[set_num]) for set_num in range(3)])
 
+    def test_batch(self):
+        for alg in ["lru", "mru", "fifo", "arc"]:
+            sa_cache = Cache.Cache(2, 8, alg)
+            batch_cache = Cache.Cache(2, 8, alg)
+            data = [(x, x**2) for x in range(12)] + [([x], {x}) for x in range(4)]
+
+            for key, value in data:
+                sa_cache.put(key, value)
+            batch_cache.put_many(data)
+
+            keys = [key for key, _ in data] + [100, "missing"]
+            self.assertEqual([sa_cache.get(key) for key in keys], batch_cache.get_many(keys))
+            self.assertEqual([sa_cache.remove(key) for key in keys[::3]], batch_cache.remove_many(keys[::3]))
+            self.assertEqual([sa_cache.get(key) for key in keys], batch_cache.get_many(keys))
+            self.assertEqual(sa_cache.get_hits(), batch_cache.get_hits())
+            self.assertEqual(sa_cache.get_misses(), batch_cache.get_misses())
+
+        sa_cache.put_many(dict())
+        self.assertEqual([], sa_cache.get_many([]))
+
     def test_hits(self):
         # lru
         sa_cache = Cache.Cache(2, 8)
@@ -350,6 +467,415 @@ class TestCache(unittest.TestCase):
         self.assertEqual("hello world", sa_cache2.get(1000))
         self.assertIsNone(sa_cache2.get(data2_key))
 
+    def test_deeply_nested_types(self):
+        sa_cache = Cache.Cache(2, 8)
+        shared = {"johanan_lai1997": [3, 4]}
+        key = [shared, [shared, {1, 2}], ("admin", [13291836])]
+        sa_cache.put(key, "nested")
+        self.assertEqual("nested", sa_cache.get([{"johanan_lai1997": [3, 4]}, [shared, {2, 1}], ("admin", [13291836])]))
+        self.assertIsNone(sa_cache.get([shared, [shared, {1, 2}], ("admin", [0])]))
+
+        deep = []
+        for _ in range(5000):
+            deep = [deep]
+        sa_cache.put(deep, "deep")
+        self.assertEqual("deep", sa_cache.get(deep))
+
+        cyclic = []
+        cyclic.append(cyclic)
+        self.assertRaises(ValueError, sa_cache.put, cyclic, 1)
+
+    def test_key_func(self):
+        sa_cache = Cache.Cache(2, 8, key_func=Student.Student.get_id)
+        student1 = Student.Student("Johanan Lai", 48406488, ("UCI", "Computer Science"))
+        sa_cache.put(student1, 123)
+        self.assertEqual(123, sa_cache.get(Student.Student("J. Lai", 48406488, ("UCI", "Informatics"))))
+        self.assertEqual([123, None], sa_cache.get_many([student1, Student.Student("Other", 1, ("UCI", "Art"))]))
+        self.assertEqual(sa_cache._get_set_num(student1), sa_cache.update(student1, 456))
+        self.assertEqual(456, sa_cache.remove(student1))
+
+    def test_ttl(self):
+        now = [0.0]
+        sa_cache = Cache.Cache(2, 2, default_ttl=10, clock=lambda: now[0])
+        sa_cache.put("a", 1)
+        sa_cache.put("b", 2, ttl=5)
+        self.assertEqual(2, sa_cache.get("b"))
+
+        # b expires first; an expired entry is a miss and its slot is freed
+        now[0] = 5
+        self.assertIsNone(sa_cache.get("b"))
+        self.assertEqual(1, sa_cache.get_misses())
+        self.assertEqual(1, len(sa_cache._cache[0]))
+        self.assertEqual(-1, sa_cache.update("b", 3))
+        self.assertEqual(0, sa_cache.update("a", 3))
+        now[0] = 10
+        self.assertIsNone(sa_cache.remove("a"))
+        self.assertEqual({}, sa_cache._deadlines)
+
+        # put without a ttl and no default never expires
+        sa_cache = Cache.Cache(2, 2, clock=lambda: now[0])
+        sa_cache.put("a", 1)
+        now[0] = 1e9
+        self.assertEqual(1, sa_cache.get("a"))
+
+    def test_ttl_expired_evicted_first(self):
+        for alg in ALGORITHMS:
+            for key_tags in (False, True):
+                now = [0.0]
+                sa_cache = Cache.Cache(2, 2, alg, key_tags=key_tags, clock=lambda: now[0])
+                sa_cache.put("a", 1, ttl=1)
+                sa_cache.put("b", 2)
+                sa_cache.get("a")
+                now[0] = 1
+                # a is the most recently used, but expired, so it is replaced instead of b
+                sa_cache.put("c", 3)
+                self.assertEqual(2, sa_cache.get("b"), alg)
+                self.assertEqual(3, sa_cache.get("c"), alg)
+                self.assertIsNone(sa_cache.get("a"), alg)
+
+    def test_ttl_refresh(self):
+        now = [0.0]
+        sa_cache = Cache.Cache(2, 8, key_tags=True, clock=lambda: now[0])
+        sa_cache.put("a", 1, ttl=1)
+        # an upsert replaces the deadline, and update keeps it
+        sa_cache.put("a", 2, ttl=5)
+        sa_cache.update("a", 3)
+        now[0] = 4
+        self.assertEqual(3, sa_cache.get("a"))
+
+        sa_cache = Cache.Cache(2, 8, clock=lambda: now[0])
+        sa_cache.put("a", 1, ttl=5)
+        sa_cache.update("a", 2)
+        self.assertEqual(2, sa_cache.get("a"))
+        now[0] = 9
+        self.assertEqual([None], sa_cache.get_many(["a"]))
+
+    def test_expire_incremental(self):
+        now = [0.0]
+        sa_cache = Cache.Cache(2, 64, clock=lambda: now[0])
+        sa_cache.put_many([(key, key) for key in range(64)], ttl=1)
+        now[0] = 1
+        # each call only sweeps the next sets
+        self.assertEqual(8, sa_cache.expire(4))
+        self.assertEqual(8, sa_cache.expire(4))
+        self.assertEqual(48, sa_cache.expire())
+        self.assertEqual(0, sum(len(cache_set) for cache_set in sa_cache._cache))
+
+        sa_cache = Cache.Cache(2, 64, default_ttl=1, sweep_sets=4, clock=lambda: now[0])
+        for key in range(64):
+            sa_cache.put(key, key)
+        now[0] = 2
+        # 4 puts sweep 16 of the 32 sets
+        for key in range(64, 68):
+            sa_cache.put(key, key)
+        self.assertEqual(4 + 32, sum(len(cache_set) for cache_set in sa_cache._cache))
+
+    def test_snapshot(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "cache.snapshot")
+        student1 = Student.Student("Johanan Lai", 48406488, ("UCI", "Computer Science"))
+        for alg in ALGORITHMS:
+            for key_tags in (False, True):
+                sa_cache = Cache.Cache(4, 64, alg, key_tags=key_tags)
+                for i in range(300):
+                    sa_cache.put(i % 97, i)
+                    sa_cache.get((i * 7) % 97)
+                sa_cache.put(student1, [1, 2])
+                sa_cache.save(path)
+
+                # the restored cache holds the same entries and makes the same replacement decisions
+                restored = Cache.Cache.load(path)
+                self.assertEqual(sa_cache.get_hits(), restored.get_hits())
+                self.assertEqual([1, 2], restored.get(student1))
+                sa_cache.get(student1)
+                for i in range(300, 600):
+                    for c in (sa_cache, restored):
+                        c.put(i % 131, i)
+                        c.get((i * 3) % 131)
+                self.assertEqual(sa_cache._cache, restored._cache, (alg, key_tags))
+                self.assertEqual(sa_cache.get_misses(), restored.get_misses())
+
+        # sizes are measured again, but the saved gds priorities are kept
+        sa_cache = Cache.Cache(3, 3, "gds", key_tags=True, sizer=len)
+        for key, value in (("a", "xxxx"), ("b", "x"), ("c", "xx"), ("d", "xx")):
+            sa_cache.put(key, value)
+        sa_cache.get("b")
+        sa_cache.save(path)
+        restored = Cache.Cache.load(path, lazy=False, sizer=len)
+        self.assertEqual(sa_cache.get_bytes(), restored.get_bytes())
+        self.assertEqual(sa_cache._repl_alg._state[0].items, restored._repl_alg._state[0].items)
+
+        # a failed save leaves the previous snapshot in place and no temporary file behind
+        sa_cache = Cache.Cache(2, 8)
+        sa_cache.put("e", lambda: None)
+        with self.assertRaises(Exception):
+            sa_cache.save(path)
+        self.assertEqual(["cache.snapshot"], os.listdir(directory))
+
+        with open(path, "wb") as snapshot:
+            snapshot.write(b"not a snapshot" * 2)
+        with self.assertRaises(ValueError):
+            Cache.Cache.load(path)
+
+    def test_snapshot_lazy(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "cache.snapshot")
+        sa_cache = Cache.Cache(2, 64)
+        sa_cache.put_many((key, str(key)) for key in range(64))
+        sa_cache.save(path)
+
+        # only the sets touched are read
+        restored = Cache.Cache.load(path)
+        self.assertEqual("5", restored.get(5))
+        restored.put(6, "six")
+        self.assertEqual(4, sum(len(cache_set) for cache_set in restored._cache))
+        self.assertEqual(30, sum(restored._unloaded))
+        self.assertEqual(["5", "37", "six"], [restored.get(key) for key in (5, 37, 6)])
+        self.assertEqual(restored._get_set_num(6), restored.update(6, "6"))
+        self.assertIsNone(restored.get(100))
+
+        # saving a partly read snapshot reads the rest first
+        restored.save(path)
+        restored = Cache.Cache.load(path, lazy=False)
+        self.assertIsNone(restored._snapshot)
+        self.assertEqual([str(key) for key in range(64)], restored.get_many(range(64)))
+
+        restored = Cache.Cache.load(path)
+        restored.clear()
+        self.assertIsNone(restored.get(5))
+
+    def test_snapshot_ttl(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "cache.snapshot")
+        now = [0.0]
+        # fully associative, so no key is evicted whatever the hash seed
+        sa_cache = Cache.Cache(4, 4, key_tags=True, clock=lambda: now[0])
+        sa_cache.put("a", 1, ttl=100)
+        sa_cache.put("b", 2, ttl=1)
+        sa_cache.put("c", 3)
+        now[0] = 5
+        sa_cache.save(path)
+
+        now[0] = 1000
+        restored = Cache.Cache.load(path, clock=lambda: now[0])
+        self.assertEqual([1, None, 3], restored.get_many(["a", "b", "c"]))
+        now[0] = 1100
+        self.assertEqual([None, 3], restored.get_many(["a", "c"]))
+
+    def test_byte_budget(self):
+        sa_cache = Cache.Cache(4, 16, max_set_bytes=10, sizer=len)
+        sa_cache.put(0, "aaaa")
+        sa_cache.put(4, "bbbb")
+        sa_cache.get(0)
+        # room for the new value is made before it is inserted, least recently used first
+        sa_cache.put(8, "cccc")
+        self.assertEqual([None, "aaaa", "cccc"], [sa_cache.get(key) for key in (4, 0, 8)])
+        self.assertEqual(8, sa_cache.get_bytes())
+
+        # a value larger than the limit is not cached
+        sa_cache.put(12, "d" * 11)
+        self.assertIsNone(sa_cache.get(12))
+        self.assertEqual(8, sa_cache.get_bytes())
+
+        # values growing in place evict other entries
+        sa_cache = Cache.Cache(4, 16, key_tags=True, max_set_bytes=10, sizer=len)
+        sa_cache.put(0, "aaaa")
+        sa_cache.put(4, "bbbb")
+        sa_cache.put(4, "bbbbbbbb")
+        self.assertEqual([None, "bbbbbbbb"], [sa_cache.get(key) for key in (0, 4)])
+        sa_cache.update(4, "b")
+        self.assertEqual(1, sa_cache.get_bytes())
+        sa_cache.remove(4)
+        self.assertEqual(0, sa_cache.get_bytes())
+
+    def test_byte_budget_global(self):
+        sa_cache = Cache.Cache(2, 64, max_bytes=100, sizer=len)
+        for key in range(20):
+            sa_cache.put(key, "x" * 10)
+            self.assertLessEqual(sa_cache.get_bytes(), 100)
+        self.assertEqual(10, sum(len(cache_set) for cache_set in sa_cache._cache))
+        self.assertEqual(list(range(10, 20)), [key for key in range(20) if sa_cache.get(key)])
+
+        sa_cache.clear()
+        self.assertEqual(0, sa_cache.get_bytes())
+
+        # sys.getsizeof is the default sizer
+        sa_cache = Cache.Cache(2, 64, max_bytes=10000)
+        sa_cache.put("a", "a")
+        self.assertEqual(sys.getsizeof("a"), sa_cache.get_bytes())
+
+    def test_victim_cache(self):
+        # direct-mapped with two sets; keys 0 and 2 share set 0
+        sa_cache = Cache.Cache(1, 2, victim_slots=1)
+        sa_cache.put(0, "a")
+        sa_cache.put(2, "b")
+        self.assertEqual({0}, set(sa_cache._victims))
+
+        # a hit in the buffer swaps the entry back into its set
+        self.assertEqual("a", sa_cache.get(0))
+        self.assertEqual("b", sa_cache.get(2))
+        self.assertEqual(2, sa_cache.get_hits())
+        self.assertEqual(0, sa_cache.get_misses())
+        self.assertEqual(0, sa_cache.update(0, "c"))
+        self.assertEqual("c", sa_cache.get(0))
+
+        # the buffer keeps only the most recent victims, and a put replaces a buffered copy
+        sa_cache.put(4, "d")
+        self.assertIsNone(sa_cache.get(2))
+        sa_cache.put(0, "e")
+        self.assertEqual("e", sa_cache.get(0))
+        self.assertEqual("d", sa_cache.remove(4))
+        self.assertIsNone(sa_cache.get(4))
+
+        # buffered entries keep their deadline
+        now = [0.0]
+        sa_cache = Cache.Cache(1, 2, victim_slots=4, clock=lambda: now[0])
+        sa_cache.put(0, "a", ttl=1)
+        sa_cache.put(2, "b")
+        now[0] = 1
+        self.assertIsNone(sa_cache.get(0))
+
+        sa_cache.clear()
+        self.assertEqual(0, len(sa_cache._victims))
+        with self.assertRaises(ValueError):
+            Cache.Cache(1, 2, victim_slots=1, max_set_bytes=100)
+
+    def test_set_indexing(self):
+        # multiples of the number of sets all map to set 0 by modulo
+        keys = range(0, 64, 8)
+        self.assertEqual(1, len({Cache.Cache(1, 8)._get_set_num(key) for key in keys}))
+        sa_cache = Cache.Cache(1, 8, index="mixed", key_func=str)
+        self.assertLess(1, len({sa_cache._get_set_num(key) for key in keys}))
+        sa_cache.put_many((key, key) for key in keys)
+        self.assertEqual(sa_cache.get_many(keys), [sa_cache.get(key) for key in keys])
+
+        # with two choices a key goes to its emptier set and is found in either
+        for key_tags in (False, True):
+            sa_cache = Cache.Cache(1, 4, index="two_choice", key_tags=key_tags)
+            for key in (0, 4, 8):
+                sa_cache.put(key, key)
+            self.assertEqual([0, 4, 8], sa_cache.get_many([0, 4, 8]))
+            self.assertEqual(1, sa_cache.update(4, "b"))
+            self.assertEqual("b", sa_cache.get(4))
+            self.assertEqual("b", sa_cache.remove(4))
+            self.assertIsNone(sa_cache.get(4))
+
+        with self.assertRaises(ValueError):
+            Cache.Cache(1, 4, index="skewed")
+
+    def test_resize(self):
+        sa_cache = Cache.Cache(2, 8, key_tags=True, stats=True)
+        for key in range(8):
+            sa_cache.put(key, str(key))
+        sa_cache.resize(16)
+        self.assertEqual(8, sa_cache._sets)
+
+        # an operation moves the old set its key maps to and the next one of the sweep, and lookups
+        # find entries of both layouts
+        self.assertEqual("1", sa_cache.get(1))
+        self.assertEqual([[], [], [2, 6], [3, 7]],
+                         [sorted(entry[2] for entry in cache_set) for cache_set in sa_cache._resizing._cache])
+        self.assertEqual("6", sa_cache.get(6))
+        self.assertEqual(7, sa_cache.update(7, "7"))
+        sa_cache.put(8, "8")
+        self.assertIsNone(sa_cache._resizing)
+        for key in range(9):
+            self.assertEqual(key % 8, sa_cache._get_set_num(key))
+            self.assertEqual(str(key), sa_cache.get(key))
+        self.assertEqual(8, len(sa_cache.get_stats().hits))
+        self.assertEqual(sa_cache.get_hits(), sum(sa_cache.get_stats().hits))
+        with self.assertRaises(ValueError):
+            sa_cache.resize(8, step=0)
+
+        # shrinking keeps the most recently used entries of a set
+        sa_cache = Cache.Cache(4, 4, key_tags=True)
+        for key in "abcd":
+            sa_cache.put(key, key)
+        sa_cache.get("a")
+        sa_cache.resize(2, 2)
+        sa_cache.get("x")
+        self.assertIsNone(sa_cache._resizing)
+        self.assertEqual(["a", "d"], sorted(entry[1] for entry in sa_cache._cache[0]))
+
+        # entries keep their remaining ttl, and save moves every old set first
+        now = [0.0]
+        sa_cache = Cache.Cache(1, 4, clock=lambda: now[0])
+        sa_cache.put(0, "a", ttl=2)
+        sa_cache.put(1, "b", ttl=1)
+        now[0] = 1
+        sa_cache.resize(8, 2)
+        self.assertEqual("a", sa_cache.get(0))
+        self.assertIsNone(sa_cache.get(1))
+        now[0] = 2
+        self.assertIsNone(sa_cache.get(0))
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "cache.snap")
+            sa_cache.put("c", 3)
+            sa_cache.resize(16, 2)
+            sa_cache.save(path)
+            self.assertIsNone(sa_cache._resizing)
+            self.assertEqual(3, Cache.Cache.load(path).get("c"))
+
+    def test_admission(self):
+        # direct-mapped with two sets; keys 0, 2 and 4 share set 0
+        sa_cache = Cache.Cache(1, 2, admission=True)
+        sa_cache.put(0, "a")
+        sa_cache.put(1, "b")
+        # a full set turns away a key put only once, but not a repeated one
+        sa_cache.put(2, "c")
+        self.assertEqual("a", sa_cache.get(0))
+        self.assertIsNone(sa_cache.get(2))
+        sa_cache.put(2, "c")
+        self.assertEqual("c", sa_cache.get(2))
+        self.assertIsNone(sa_cache.get(0))
+        # updates of cached keys are always admitted
+        sa_cache.put(2, "d")
+        self.assertEqual("d", sa_cache.get(2))
+        self.assertEqual(1, sa_cache.get_admission().rejections)
+        self.assertLess(0, sa_cache.get_admission().get_memory_usage())
+
+        sa_cache.clear()
+        self.assertEqual(0, sa_cache.get_admission().rejections)
+        admission = AdmissionFilter.AdmissionFilter(min_count=3)
+        sa_cache = Cache.Cache(1, 2, admission=admission)
+        self.assertIs(admission, sa_cache.get_admission())
+        for _ in range(3):
+            sa_cache.put(0, "a")
+            sa_cache.put(2, "b")
+        self.assertEqual("b", sa_cache.get(2))
+        with self.assertRaises(ValueError):
+            Cache.Cache(1, 2, admission=admission)
+        self.assertIsNone(Cache.Cache(1, 2).get_admission())
+
+        # entries moved back from the victim buffer were admitted already
+        sa_cache = Cache.Cache(1, 2, victim_slots=4, admission=True)
+        sa_cache.put(0, "a")
+        sa_cache.put(2, "b")
+        sa_cache.put(2, "b")
+        self.assertEqual("a", sa_cache.get(0))
+        self.assertEqual("b", sa_cache.get(2))
+        self.assertEqual(2, sa_cache.get_hits())
+
+    def test_lazy_sets(self):
+        sa_cache = Cache.Cache(2, 8, "lru", max_bytes=100)
+        # no set has storage or replacement state until a put reaches it
+        self.assertEqual(1, len({id(cache_set) for cache_set in sa_cache._cache}))
+        self.assertEqual([None] * 4, sa_cache._repl_alg._state)
+        self.assertIsNone(sa_cache.get(1))
+        self.assertIsNone(sa_cache.remove(1))
+        self.assertEqual(0, sa_cache.get_bytes())
+
+        sa_cache.put(1, "a")
+        self.assertEqual([["a"]], [[entry[1] for entry in cache_set] for cache_set in sa_cache._cache if cache_set])
+        self.assertEqual(3, sa_cache._repl_alg._state.count(None))
+        self.assertEqual("a", sa_cache.get(1))
+        sa_cache.clear()
+        self.assertEqual([None] * 4, sa_cache._repl_alg._state)
+
     def test_class_types(self):
         sa_cache = Cache.Cache(2, 8)
 
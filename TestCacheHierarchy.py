@@ -0,0 +1,107 @@
+import unittest
+import Cache
+import CacheHierarchy
+
+
+class TestCacheHierarchy(unittest.TestCase):
+
+    def levels(self, **kwargs):
+        # direct-mapped L1 of two sets over a 2-way L2 of four sets
+        return [Cache.Cache(1, 2, key_tags=True, **kwargs), Cache.Cache(2, 8, key_tags=True, **kwargs)]
+
+    def test_inclusive(self):
+        l1, l2 = self.levels()
+        hierarchy = CacheHierarchy.CacheHierarchy([l1, l2])
+        hierarchy.put(0, "a")
+        hierarchy.put(2, "b")
+        # 0 was evicted from L1 but is still in L2, and a hit copies it back up
+        self.assertIsNone(l1._get(0))
+        self.assertEqual("a", hierarchy.get(0))
+        self.assertEqual("a", l1._get(0))
+        self.assertEqual("b", l2._get(2))
+
+        # evicting from L2 invalidates the L1 copy; 0, 4 and 8 share set 0 of L2
+        hierarchy.put(4, "c")
+        hierarchy.put(8, "d")
+        self.assertIsNone(hierarchy.get(0))
+        self.assertEqual(0, hierarchy.update(8, "e"))
+        self.assertEqual("e", l2._get(8))
+        self.assertEqual("e", hierarchy.remove(8))
+        self.assertIsNone(hierarchy.get(8))
+
+    def test_exclusive(self):
+        l1, l2 = self.levels()
+        hierarchy = CacheHierarchy.CacheHierarchy([l1, l2], "exclusive")
+        hierarchy.put(0, "a")
+        self.assertIsNone(l2._get(0))
+        hierarchy.put(2, "b")
+        # the L1 victim is demoted into L2, and moves back up on a hit
+        set_num, i = l2._locate(0)
+        self.assertEqual("a", l2._cache[set_num][i][1])
+        self.assertEqual("a", hierarchy.get(0))
+        self.assertIsNone(l2._locate(0)[1])
+        self.assertIsNotNone(l2._locate(2)[1])
+        self.assertEqual(0, hierarchy.update(0, "c"))
+        self.assertEqual(1, hierarchy.update(2, "d"))
+
+        # a put drops any copy further down
+        hierarchy.put(2, "e")
+        self.assertIsNone(l2._locate(2)[1])
+        self.assertEqual("e", hierarchy.get(2))
+
+    def test_nine(self):
+        l1, l2 = self.levels()
+        hierarchy = CacheHierarchy.CacheHierarchy([l1, l2], "nine")
+        hierarchy.put(0, "a")
+        hierarchy.put(2, "b")
+        # L2 evicts independently: 0 leaves L2 but its L1 copy stays
+        self.assertEqual("a", hierarchy.get(0))
+        l2.put(4, "c")
+        l2.put(8, "d")
+        self.assertIsNone(l2._locate(0)[1])
+        self.assertEqual("a", l1._get(0))
+
+        # an L1 victim L2 no longer holds is demoted
+        hierarchy.put(6, "e")
+        self.assertIsNotNone(l2._locate(0)[1])
+
+    def test_hit_ratios(self):
+        hierarchy = CacheHierarchy.CacheHierarchy(self.levels())
+        self.assertEqual([None, None], hierarchy.get_hit_ratios())
+        for key in range(4):
+            hierarchy.put(key, key + 1)
+        for key in (3, 2, 1, 0, 4):
+            hierarchy.get(key)
+
+        # L1 holds 2 and 3; L2 serves 0 and 1 and misses 4
+        self.assertEqual([0.4, 2 / 3], hierarchy.get_hit_ratios())
+        self.assertEqual(4, hierarchy.get_hits())
+        self.assertEqual(1, hierarchy.get_misses())
+        hierarchy.clear()
+        self.assertEqual(0, hierarchy.get_hits())
+        self.assertIsNone(hierarchy.get(0))
+
+    def test_ttl(self):
+        now = [0.0]
+        l1, l2 = self.levels(clock=lambda: now[0])
+        hierarchy = CacheHierarchy.CacheHierarchy([l1, l2], "exclusive")
+        hierarchy.put(0, "a", ttl=10)
+        hierarchy.put(2, "b")
+        now[0] = 5
+        # the demoted entry keeps its deadline, also after moving back up
+        self.assertEqual("a", hierarchy.get(0))
+        now[0] = 10
+        self.assertIsNone(hierarchy.get(0))
+
+    def test_invalid_levels(self):
+        with self.assertRaises(ValueError):
+            CacheHierarchy.CacheHierarchy([Cache.Cache(1, 2), Cache.Cache(2, 8)])
+        with self.assertRaises(ValueError):
+            CacheHierarchy.CacheHierarchy([Cache.Cache(1, 2, key_tags=True), Cache.Cache(2, 8, key_tags=True, index="mixed")])
+        with self.assertRaises(ValueError):
+            CacheHierarchy.CacheHierarchy(self.levels(), "write-back")
+        with self.assertRaises(ValueError):
+            CacheHierarchy.CacheHierarchy([Cache.Cache(1, 2, key_tags=True, victim_slots=2)])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+import Cache
+import CacheStats
+
+
+class TestCacheStats(unittest.TestCase):
+
+    def test_counters(self):
+        now = [0.0]
+        sa_cache = Cache.Cache(2, 8, key_tags=True, stats=True, clock=lambda: now[0])
+        sa_cache.put(0, "a")
+        sa_cache.put(0, "b")
+        sa_cache.put(1, "c", ttl=1)
+        sa_cache.get(0)
+        sa_cache.get(4)
+        sa_cache.update(0, "d")
+        sa_cache.remove(0)
+        now[0] = 1
+        sa_cache.expire()
+
+        stats = sa_cache.get_stats()
+        self.assertEqual([1, 0, 0, 0], stats.hits)
+        self.assertEqual([1, 0, 0, 0], stats.misses)
+        self.assertEqual([1, 1, 0, 0], stats.insertions)
+        self.assertEqual([2, 0, 0, 0], stats.updates)
+        self.assertEqual([1, 0, 0, 0], stats.removes)
+        self.assertEqual([0, 1, 0, 0], stats.expirations)
+
+        # statistics outlive clear
+        sa_cache.clear()
+        self.assertEqual(1, sa_cache.get_stats().to_dict()["hits"])
+        self.assertIsNone(Cache.Cache(2, 8).get_stats())
+        with self.assertRaises(ValueError):
+            Cache.Cache(2, 8, stats=stats)
+
+    def test_miss_kinds(self):
+        # direct-mapped with two sets; keys 0, 2 and 4 share set 0
+        sa_cache = Cache.Cache(1, 2, stats=CacheStats.CacheStats(sample_every=1))
+        for key in (0, 2, 0, 4, 2):
+            if sa_cache.get(key) is None:
+                sa_cache.put(key, key)
+
+        stats = sa_cache.get_stats()
+        # 0 and 2 would both fit a fully-associative cache of two slots, 2 no longer does after 4
+        self.assertEqual({"cold": 3, "conflict": 1, "capacity": 1}, stats.miss_kinds)
+        self.assertEqual([5, 0], stats.misses)
+        self.assertEqual([4, 0], stats.evictions)
+
+        snapshot = stats.to_dict()
+        self.assertEqual(5, snapshot["latency_ns"]["get"]["count"])
+        self.assertEqual(5, snapshot["latency_ns"]["put"]["count"])
+        self.assertEqual([5, 0], snapshot["per_set"]["misses"])
+
+        stats.reset()
+        sa_cache.get(0)
+        self.assertEqual({"cold": 1, "conflict": 0, "capacity": 0}, stats.miss_kinds)
+        self.assertEqual(1, stats.to_dict()["latency_ns"]["get"]["count"])
+
+    def test_prometheus(self):
+        sa_cache = Cache.Cache(2, 4, stats=CacheStats.CacheStats(sample_every=1))
+        sa_cache.put("a", 1)
+        sa_cache.get("a")
+        text = sa_cache.get_stats().to_prometheus(prefix="test")
+        self.assertIn("# TYPE test_hits_total counter\ntest_hits_total 1\n", text)
+        self.assertIn('test_miss_kinds_total{kind="cold"} 0\n', text)
+        self.assertIn('test_latency_seconds_count{op="get"} 1\n', text)
+        self.assertIn('test_latency_seconds_bucket{op="put",le="+Inf"} 1\n', text)
+
+        text = sa_cache.get_stats().to_prometheus(prefix="test", per_set=True)
+        self.assertIn('test_insertions_total{set="%d"} 1\n' % sa_cache._get_set_num("a"), text)
+
+if __name__ == "__main__":
+    unittest.main()
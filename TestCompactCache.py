@@ -0,0 +1,59 @@
+import unittest
+import Cache
+import CompactCache
+import Student
+
+
+class TestCompactCache(unittest.TestCase):
+
+    def test_put_get_remove(self):
+        sa_cache = CompactCache.CompactCache(2, 8)
+        self.assertIsNone(sa_cache.get("a_key"))
+
+        student1 = Student.Student("Johanan Lai", 48406488, ("UCI", "Computer Science"))
+        username_list = ["johanan_lai1997", "johananlai1997", "admin"]
+        sa_cache.put("Usernames", username_list)
+        sa_cache.put(student1, 123)
+        sa_cache.put({200, 100, 300}, False)
+        self.assertEqual(username_list, sa_cache.get("Usernames"))
+        self.assertEqual(123, sa_cache.get(student1))
+        self.assertFalse(sa_cache.get({200, 100, 300}))
+
+        self.assertEqual(123, sa_cache.remove(student1))
+        self.assertIsNone(sa_cache.get(student1))
+        self.assertIsNone(sa_cache.remove(student1))
+
+        self.assertEqual(sa_cache._get_set_num("Usernames"), sa_cache.update("Usernames", []))
+        self.assertEqual([], sa_cache.get("Usernames"))
+        self.assertEqual(-1, sa_cache.update(student1, 1))
+
+        sa_cache.clear()
+        self.assertIsNone(sa_cache.get("Usernames"))
+        self.assertEqual(0, sa_cache.get_hits())
+        self.assertEqual(1, sa_cache.get_misses())
+
+    def test_matches_cache(self):
+        # same evictions, hits and misses as the list-based layout
+        for alg in ["lru", "mru", "fifo"]:
+            sa_cache = Cache.Cache(4, 32, alg)
+            compact_cache = CompactCache.CompactCache(4, 32, alg)
+            for i in range(3000):
+                key = (i * 7919) % 61
+                for c in (sa_cache, compact_cache):
+                    if i % 11 == 0:
+                        c.remove(key)
+                    elif i % 3:
+                        c.put(key, key % 5)
+                    else:
+                        c.get(key)
+                self.assertEqual(sa_cache.get(key), compact_cache.get(key))
+
+            self.assertEqual(sa_cache.get_hits(), compact_cache.get_hits())
+            self.assertEqual(sa_cache.get_misses(), compact_cache.get_misses())
+
+    def test_unsupported_alg(self):
+        self.assertRaises(ValueError, CompactCache.CompactCache, 2, 8, "arc")
+
+
+if __name__ == "__main__":
+    unittest.main()
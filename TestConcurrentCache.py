@@ -0,0 +1,86 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import ConcurrentCache
+
+
+class TestConcurrentCache(unittest.TestCase):
+
+    def test_single_thread(self):
+        sa_cache = ConcurrentCache.ConcurrentCache(2, 8)
+        sa_cache.put("Usernames", ["johanan_lai1997", "admin"])
+        self.assertEqual(["johanan_lai1997", "admin"], sa_cache.get("Usernames"))
+        self.assertIsNone(sa_cache.get("Login attempts"))
+        self.assertEqual(sa_cache._get_set_num("Usernames"), sa_cache.update("Usernames", []))
+        self.assertEqual([], sa_cache.remove("Usernames"))
+        self.assertEqual(2, sa_cache.get_hits())
+        self.assertEqual(1, sa_cache.get_misses())
+
+        sa_cache.put_many([(x, x**2) for x in range(8)])
+        self.assertEqual([0, 1, 4, None], sa_cache.get_many([0, 1, 2, 100]))
+        self.assertEqual([9, None], sa_cache.remove_many([3, 3]))
+
+        sa_cache.clear()
+        self.assertEqual(0, sa_cache.get_hits())
+        self.assertEqual(0, sa_cache.get_misses())
+
+        with self.assertRaises(ValueError):
+            ConcurrentCache.ConcurrentCache(2, 8, max_bytes=100)
+        with self.assertRaises(ValueError):
+            ConcurrentCache.ConcurrentCache(2, 8, index="two_choice")
+        with self.assertRaises(ValueError):
+            ConcurrentCache.ConcurrentCache(2, 8, stats=True)
+        with self.assertRaises(ValueError):
+            ConcurrentCache.ConcurrentCache(2, 8, admission=True)
+        with self.assertRaises(ValueError):
+            ConcurrentCache.ConcurrentCache(2, 8).resize(16)
+
+    def test_threads(self):
+        sa_cache = ConcurrentCache.ConcurrentCache(4, 256, "lru", stripes=8)
+        n_threads = 8
+        n_ops = 2000
+        barrier = threading.Barrier(n_threads)
+
+        def worker(offset):
+            barrier.wait()
+            for i in range(n_ops):
+                key = offset * n_ops + i
+                sa_cache.put(key, key)
+                sa_cache.get(key)
+                sa_cache.get(-key - 1)
+
+        threads = [threading.Thread(target=worker, args=(t,)) for t in range(n_threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # other threads may evict a key between its put and get, but no count may be lost
+        self.assertEqual(2 * n_threads * n_ops, sa_cache.get_hits() + sa_cache.get_misses())
+        self.assertGreaterEqual(sa_cache.get_misses(), n_threads * n_ops)
+        for set_num in range(sa_cache._sets):
+            self.assertLessEqual(len(sa_cache._cache[set_num]), 4)
+            self.assertEqual(len(sa_cache._cache[set_num]), len(sa_cache._repl_alg._state[set_num]))
+
+    def test_snapshot(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "cache.snapshot")
+        sa_cache = ConcurrentCache.ConcurrentCache(2, 64, stripes=4)
+        sa_cache.put_many((key, key) for key in range(64))
+        sa_cache.save(path)
+
+        restored = ConcurrentCache.ConcurrentCache.load(path, stripes=4)
+        threads = [threading.Thread(target=restored.get_many, args=(range(64),)) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(list(range(64)), restored.get_many(range(64)))
+        self.assertEqual(5 * 64, restored.get_hits())
+
+
+if __name__ == "__main__":
+    unittest.main()
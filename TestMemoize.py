@@ -0,0 +1,63 @@
+import unittest
+import ConcurrentCache
+import Memoize
+
+
+class TestMemoize(unittest.TestCase):
+
+    def test_memoize(self):
+        calls = []
+
+        @Memoize.memoize(2, 8)
+        def square(x):
+            calls.append(x)
+            return x * x
+
+        self.assertEqual(9, square(3))
+        self.assertEqual(9, square(3))
+        self.assertEqual(4, square(-2))
+        self.assertEqual([3, -2], calls)
+        self.assertEqual(Memoize.CacheInfo(1, 2, 8, 2), square.cache_info())
+        self.assertEqual("square", square.__name__)
+
+        # hash(-1) == hash(-2), but the results are kept apart
+        self.assertEqual(1, square(-1))
+        self.assertEqual(4, square(-2))
+
+        square.cache_clear()
+        self.assertEqual(Memoize.CacheInfo(0, 0, 8, 0), square.cache_info())
+
+    def test_arguments(self):
+        calls = []
+
+        @Memoize.memoize
+        def lookup(items, key=None):
+            calls.append(key)
+            return None
+
+        # unhashable arguments work, keyword arguments are part of the key, and None is cached
+        self.assertIsNone(lookup([1, {"a": 2}], key="a"))
+        self.assertIsNone(lookup([1, {"a": 2}], key="a"))
+        self.assertIsNone(lookup([1, {"a": 2}], key="b"))
+        self.assertIsNone(lookup([1, {"a": 2}]))
+        self.assertEqual(["a", "b", None], calls)
+        self.assertEqual(1, lookup.cache_info().hits)
+
+    def test_typed(self):
+        @Memoize.memoize(typed=True, cache_class=ConcurrentCache.ConcurrentCache)
+        def kind(x):
+            return type(x).__name__
+
+        self.assertEqual("int", kind(3))
+        self.assertEqual("float", kind(3.0))
+        self.assertIsInstance(kind.cache, ConcurrentCache.ConcurrentCache)
+
+    def test_sentinel(self):
+        sentinel = object()
+        sa_cache = Memoize.memoize(2, 8)(lambda x: x).cache
+        sa_cache.put("a", None)
+        self.assertIsNone(sa_cache.get("a", sentinel))
+        self.assertIs(sentinel, sa_cache.get("b", sentinel))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import random
+import unittest
+import Cache
+import MissRatioCurve
+
+
+class TestMissRatioCurve(unittest.TestCase):
+
+    def _trace(self, n, seed=7):
+        rnd = random.Random(seed)
+        # mix of a hot loop and random keys so the curve has some shape
+        return [rnd.randrange(20) if rnd.random() < 0.7 else rnd.randrange(400) for _ in range(n)]
+
+    def _lru_miss_ratio(self, trace, ways, sets):
+        sa_cache = Cache.Cache(ways, ways * sets, "lru")
+        for key in trace:
+            if sa_cache.get(key) is None:
+                sa_cache.put(key, key)
+        return sa_cache.get_misses() / len(trace)
+
+    def test_stack_distances(self):
+        mrc = MissRatioCurve.MissRatioCurve()
+        mrc.feed("abcab")
+        # a, b, c cold; second a has distance 2, second b distance 2
+        self.assertEqual(5, mrc.get_references())
+        self.assertEqual(1.0, mrc.miss_ratio(2))
+        self.assertEqual(0.6, mrc.miss_ratio(3))
+
+    def test_matches_cache(self):
+        trace = self._trace(5000)
+        for sets in [1, 4]:
+            mrc = MissRatioCurve.MissRatioCurve(sets)
+            mrc.feed(trace)
+            for ways, size, ratio in mrc.curve(12):
+                self.assertEqual(ways * sets, size)
+                self.assertAlmostEqual(self._lru_miss_ratio(trace, ways, sets), ratio)
+                self.assertAlmostEqual(mrc.miss_ratio(ways), ratio)
+
+    def test_sampling(self):
+        rnd = random.Random(3)
+        trace = [int(5000 * rnd.random() ** 3) for _ in range(40000)]
+        exact = MissRatioCurve.MissRatioCurve()
+        sampled = MissRatioCurve.MissRatioCurve(sample_rate=0.25)
+        exact.feed(trace)
+        sampled.feed(trace)
+
+        self.assertLess(sampled.get_references(), exact.get_references())
+        # sampled curves are only meaningful well above 1 / sample_rate
+        for (ways, _, exact_ratio), (_, _, sampled_ratio) in zip(exact.curve(1024), sampled.curve(1024)):
+            if ways >= 64:
+                self.assertAlmostEqual(exact_ratio, sampled_ratio, delta=0.03)
+
+
+if __name__ == "__main__":
+    unittest.main()
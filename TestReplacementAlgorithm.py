@@ -0,0 +1,182 @@
+import unittest
+import Cache
+import ReplacementAlgorithm
+
+
+class TestReplacementAlgorithm(unittest.TestCase):
+
+    def _access(self, sa_cache, key):
+        if sa_cache.get(key) is None:
+            sa_cache.put(key, key)
+
+    def test_registry(self):
+        for name in ["lru", "mru", "fifo", "clock", "lfu", "arc", "2q", "tinylfu"]:
+            self.assertIn(name, ReplacementAlgorithm.get_algorithm_names())
+            sa_cache = Cache.Cache(2, 8, name)
+            sa_cache.put(1, 1)
+            self.assertEqual(1, sa_cache.get(1))
+
+        self.assertRaises(ValueError, Cache.Cache, 2, 8, "random")
+
+    def test_alg_object(self):
+        sa_cache = Cache.Cache(2, 8, ReplacementAlgorithm.LFU)
+        self.assertIsInstance(sa_cache._repl_alg, ReplacementAlgorithm.LFU)
+
+        alg = ReplacementAlgorithm.TwoQ(kin=0.5)
+        sa_cache = Cache.Cache(4, 8, alg)
+        self.assertIs(alg, sa_cache._repl_alg)
+
+        # an instance keeps per-set state, so it cannot back two caches
+        self.assertRaises(ValueError, Cache.Cache, 4, 8, alg)
+
+    def test_custom_alg_registration(self):
+        # other tests iterate over the registry, so the class must not outlive this test
+        self.addCleanup(ReplacementAlgorithm._algorithms.pop, "test-newest", None)
+
+        @ReplacementAlgorithm.register("test-newest")
+        class Newest(ReplacementAlgorithm.MRU):
+            def update_alg_struct(self, set_num, tag):
+                pass
+
+        sa_cache = Cache.Cache(2, 2, "test-newest")
+        sa_cache.put("a", 1)
+        sa_cache.put("b", 2)
+        sa_cache.get("a")
+        sa_cache.put("c", 3)
+        self.assertIsNone(sa_cache.get("b"))
+        self.assertEqual(1, sa_cache.get("a"))
+
+    def test_clock(self):
+        sa_cache = Cache.Cache(3, 3, "clock")
+        for key in "abc":
+            sa_cache.put(key, key)
+
+        # referenced entries get a second chance
+        sa_cache.get("a")
+        sa_cache.put("d", "d")
+        self.assertIsNone(sa_cache.get("b"))
+        self.assertEqual("a", sa_cache.get("a"))
+
+        sa_cache.remove("c")
+        sa_cache.put("e", "e")
+        self.assertEqual(3, len(sa_cache._cache[0]))
+
+    def test_lfu(self):
+        sa_cache = Cache.Cache(3, 3, "lfu")
+        for key in "abc":
+            sa_cache.put(key, key)
+        for _ in range(3):
+            sa_cache.get("a")
+        sa_cache.get("c")
+
+        sa_cache.put("d", "d")
+        self.assertIsNone(sa_cache.get("b"))
+        sa_cache.put("e", "e")
+        self.assertIsNone(sa_cache.get("d"))
+        self.assertEqual("a", sa_cache.get("a"))
+
+    def test_lfu_aging(self):
+        alg = ReplacementAlgorithm.LFU(aging_period=2)
+        sa_cache = Cache.Cache(2, 2, alg)
+        sa_cache.put("a", "a")
+        sa_cache.put("b", "b")
+        sa_cache.get("a")
+        sa_cache.get("a")
+        sa_cache.get("b")
+        sa_cache.get("b")
+
+        # counts were halved after four hits
+        self.assertEqual([1, 1], list(alg._state[0].counts.values()))
+
+    def test_gds(self):
+        sa_cache = Cache.Cache(3, 3, "gds", sizer=len)
+        sa_cache.put("big", "x" * 100)
+        sa_cache.put("small1", "x")
+        sa_cache.put("small2", "x")
+        sa_cache.get("big")
+
+        # with unit cost, the large value has the least priority despite being used most recently
+        sa_cache.put("small3", "x")
+        self.assertIsNone(sa_cache.get("big"))
+
+        # with cost proportional to size, all entries weigh the same and the least recently used goes
+        sa_cache = Cache.Cache(3, 3, ReplacementAlgorithm.GreedyDualSize(cost=lambda size: size), sizer=len)
+        sa_cache.put("big", "x" * 100)
+        sa_cache.put("small1", "x")
+        sa_cache.put("small2", "x")
+        sa_cache.get("big")
+        sa_cache.put("small3", "x")
+        self.assertEqual("x" * 100, sa_cache.get("big"))
+        self.assertIsNone(sa_cache.get("small1"))
+
+    def test_scan_resistance(self):
+        hot = [0, 1, 2, 3]
+        for name in ["lfu", "arc", "2q", "tinylfu"]:
+            sa_cache = Cache.Cache(8, 8, name)
+            scan = iter(range(1000, 2000))
+            for _ in range(20):
+                for key in hot:
+                    self._access(sa_cache, key)
+                self._access(sa_cache, next(scan))
+                self._access(sa_cache, next(scan))
+
+            # a long one-off scan must not flush the working set
+            for _ in range(50):
+                self._access(sa_cache, next(scan))
+            for key in hot:
+                self.assertEqual(key, sa_cache.get(key), name)
+
+    def test_arc_ghost_hit(self):
+        sa_cache = Cache.Cache(2, 2, "arc")
+        sa_cache.put("a", 1)
+        sa_cache.put("b", 2)
+        sa_cache.get("a")
+        sa_cache.put("c", 3)
+        arc_set = sa_cache._repl_alg._state[0]
+        self.assertEqual(1, len(arc_set.b1))
+
+        # re-inserting a ghost goes straight to the frequency list and grows p
+        sa_cache.put("b", 2)
+        self.assertEqual(2, sa_cache.get("b"))
+        self.assertIn(sa_cache._cache[0][sa_cache._keys[0][sa_cache._custom_hash("b")]][0], arc_set.t2)
+        self.assertGreater(arc_set.p, 0)
+
+    def test_policies_stay_in_sync(self):
+        for name in ReplacementAlgorithm.get_algorithm_names():
+            sa_cache = Cache.Cache(4, 16, name)
+            for i in range(2000):
+                key = (i * 7919) % 37
+                if i % 5 == 0:
+                    sa_cache.remove(key)
+                elif i % 7 == 0:
+                    sa_cache.update(key, i)
+                elif i % 2:
+                    sa_cache.get(key)
+                else:
+                    sa_cache.put(key, key)
+
+            for set_num in range(4):
+                self.assertLessEqual(len(sa_cache._cache[set_num]), 4)
+                for tag in sa_cache._tags[set_num]:
+                    sa_cache._repl_alg.update_alg_struct_on_remove(set_num, tag)
+
+    def test_export_set_order(self):
+        for name in ReplacementAlgorithm.get_algorithm_names():
+            sa_cache = Cache.Cache(4, 4, name, key_tags=True)
+            for key in "abcdef":
+                sa_cache.put(key, key)
+                sa_cache.get("b")
+            order = sa_cache._repl_alg.export_set_order(0)
+            if order is not None:
+                self.assertCountEqual(sa_cache._tags[0], order)
+
+        # least recently used first
+        sa_cache = Cache.Cache(4, 4, "lru", key_tags=True)
+        for key in "abcd":
+            sa_cache.put(key, key)
+        sa_cache.get("a")
+        self.assertEqual([hash(key) for key in "bcda"], sa_cache._repl_alg.export_set_order(0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import multiprocessing
+import unittest
+import Cache
+import SharedCache
+import Student
+
+
+def _worker(sa_cache, offset, n_ops):
+    for i in range(n_ops):
+        key = offset * n_ops + i
+        sa_cache.put(key, [key])
+        sa_cache.get(key)
+    sa_cache.close()
+
+
+class TestSharedCache(unittest.TestCase):
+
+    def test_put_get_remove(self):
+        with SharedCache.SharedCache(2, 8) as sa_cache:
+            self.assertIsNone(sa_cache.get("a_key"))
+
+            student1 = Student.Student("Johanan Lai", 48406488, ("UCI", "Computer Science"))
+            username_list = ["johanan_lai1997", "johananlai1997", "admin"]
+            sa_cache.put("Usernames", username_list)
+            sa_cache.put(student1, 123)
+            sa_cache.put({200, 100, 300}, False)
+            self.assertEqual(username_list, sa_cache.get("Usernames"))
+            self.assertEqual(123, sa_cache.get(student1))
+            self.assertFalse(sa_cache.get({200, 100, 300}))
+
+            self.assertEqual(123, sa_cache.remove(student1))
+            self.assertIsNone(sa_cache.get(student1))
+            self.assertIsNone(sa_cache.remove(student1))
+
+            self.assertEqual(sa_cache._get_set_num("Usernames"), sa_cache.update("Usernames", []))
+            self.assertEqual([], sa_cache.get("Usernames"))
+            self.assertEqual(-1, sa_cache.update(student1, 1))
+            self.assertEqual(5, sa_cache.get_hits())
+            self.assertEqual(3, sa_cache.get_misses())
+
+            with self.assertRaises(ValueError):
+                sa_cache.put("big", bytes(1000))
+
+            sa_cache.clear()
+            self.assertIsNone(sa_cache.get("Usernames"))
+            self.assertEqual(0, sa_cache.get_hits())
+            self.assertEqual(1, sa_cache.get_misses())
+
+        with self.assertRaises(ValueError):
+            SharedCache.SharedCache(2, 8, "arc")
+
+    def test_matches_cache(self):
+        # same evictions, hits and misses as the list-based layout
+        for alg in ["lru", "mru", "fifo"]:
+            sa_cache = Cache.Cache(4, 32, alg)
+            with SharedCache.SharedCache(4, 32, alg) as shared_cache:
+                for i in range(2000):
+                    key = (i * 7919) % 61
+                    for c in (sa_cache, shared_cache):
+                        if i % 11 == 0:
+                            c.remove(key)
+                        elif i % 3:
+                            c.put(key, key % 5)
+                        else:
+                            c.get(key)
+                    self.assertEqual(sa_cache.get(key), shared_cache.get(key))
+                self.assertEqual(sa_cache.get_hits(), shared_cache.get_hits())
+                self.assertEqual(sa_cache.get_misses(), shared_cache.get_misses())
+
+    @unittest.skipUnless("fork" in multiprocessing.get_all_start_methods(), "needs fork")
+    def test_processes(self):
+        context = multiprocessing.get_context("fork")
+        n_processes = 4
+        n_ops = 200
+        with SharedCache.SharedCache(4, 2048, stripes=16) as sa_cache:
+            processes = [context.Process(target=_worker, args=(sa_cache, p, n_ops)) for p in range(n_processes)]
+            for process in processes:
+                process.start()
+            for process in processes:
+                process.join()
+                self.assertEqual(0, process.exitcode)
+
+            # every process's entries and counts are visible here
+            self.assertEqual(n_processes * n_ops, sa_cache.get_hits())
+            self.assertEqual([n_processes * n_ops - 1], sa_cache.get(n_processes * n_ops - 1))
+
+if __name__ == "__main__":
+    unittest.main()
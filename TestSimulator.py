@@ -0,0 +1,62 @@
+import os
+import tempfile
+import unittest
+import Simulator
+
+
+class TestSimulator(unittest.TestCase):
+
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def _write_trace(self, lines):
+        path = os.path.join(self._dir.name, "trace.txt")
+        with open(path, "w") as trace:
+            trace.write("\n".join(lines) + "\n")
+        return path
+
+    def test_keys_trace(self):
+        path = self._write_trace(["a", "b", "a", "c", "a", "b"])
+        self.assertEqual("keys", Simulator.detect_format(path))
+
+        result = Simulator.simulate(path, 4, 4, "lru")
+        self.assertEqual(6, result["ops"])
+        self.assertEqual(3, result["hits"])
+        self.assertEqual(3, result["misses"])
+        self.assertEqual(0.5, result["hit_ratio"])
+
+    def test_csv_trace(self):
+        path = self._write_trace(["put,a,1", "get,a", "update,a,2", "get,a", "remove,a", "get,a", "get,b"])
+        self.assertEqual("csv", Simulator.detect_format(path))
+        self.assertEqual(("put", "a", "1"), next(Simulator.read_trace(path)))
+
+        # update counts the lookup it does through get
+        result = Simulator.simulate(path, 2, 8, "fifo")
+        self.assertEqual(3, result["hits"])
+        self.assertEqual(2, result["misses"])
+
+        bad_path = self._write_trace(["put,a,1", "delete,a"])
+        self.assertRaises(ValueError, Simulator.simulate, bad_path, 2, 8, "lru", "csv")
+        bad_path = self._write_trace(["put,a,1", "get"])
+        with self.assertRaisesRegex(ValueError, "line 2"):
+            Simulator.simulate(bad_path, 2, 8, "lru", "csv")
+
+    def test_sweep(self):
+        path = self._write_trace([str(i % 13) for i in range(200)])
+        results = Simulator.sweep(path, [1, 4], [4, 16], ["lru", "arc"], workers=2)
+        self.assertEqual(8, len(results))
+        self.assertEqual((1, 4, "lru"), (results[0]["slots"], results[0]["size"], results[0]["alg"]))
+
+        # a larger cache never hurts LRU on this loop
+        by_config = {(r["slots"], r["size"], r["alg"]): r for r in results}
+        self.assertGreaterEqual(by_config[(4, 16, "lru")]["hits"], by_config[(4, 4, "lru")]["hits"])
+
+        in_process = Simulator.sweep(path, [1, 4], [4, 16], ["lru", "arc"], workers=1)
+        self.assertEqual([r["hits"] for r in results], [r["hits"] for r in in_process])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+import os
+import time
+import unittest
+import Cache
+import SpillStore
+
+
+class TestSpillStore(unittest.TestCase):
+
+    def setUp(self):
+        self.store = SpillStore.SpillStore(segment_bytes=256)
+
+    def tearDown(self):
+        self.store.close()
+
+    def due_segments(self):
+        with self.store._lock:
+            return [number for number, (_, size, dead) in self.store._segments.items()
+                    if dead * 2 >= size and number != self.store._active]
+
+    def test_spill(self):
+        # direct-mapped with two sets; keys 0, 2 and 4 share set 0
+        sa_cache = Cache.Cache(1, 2, spill=self.store)
+        sa_cache.put(0, "a")
+        sa_cache.put(2, [1, 2])
+        self.assertIn(0, self.store)
+
+        # a hit on disk swaps the entry back into its set
+        self.assertEqual("a", sa_cache.get(0))
+        self.assertEqual([1, 2], sa_cache.get(2))
+        self.assertEqual(2, sa_cache.get_hits())
+        self.assertEqual(1, len(self.store))
+        self.assertIsNone(sa_cache.get(4))
+        self.assertEqual(1, sa_cache.get_misses())
+
+        # a put replaces the copy on disk
+        sa_cache.put(0, "b")
+        self.assertNotIn(0, self.store)
+        sa_cache.put(4, "c")
+        self.assertEqual("b", sa_cache.get(0))
+
+        sa_cache.clear()
+        self.assertEqual(0, len(self.store))
+        self.assertEqual([], os.listdir(self.store._directory))
+        with self.assertRaises(ValueError):
+            Cache.Cache(1, 2, spill=self.store)
+        store = SpillStore.SpillStore()
+        self.addCleanup(store.close)
+        with self.assertRaises(ValueError):
+            Cache.Cache(1, 2, spill=store, victim_slots=2)
+
+    def test_unpicklable(self):
+        # an entry that cannot be written to disk is dropped, and its set keeps working
+        sa_cache = Cache.Cache(1, 2, spill=self.store)
+        sa_cache.put(0, lambda: None)
+        sa_cache.put(2, "b")
+        self.assertNotIn(0, self.store)
+        self.assertIsNone(sa_cache.get(0))
+        sa_cache.put(4, "c")
+        sa_cache.put(6, "d")
+        self.assertEqual(["b", "c", "d"], [sa_cache.get(key) for key in (2, 4, 6)])
+
+    def test_admission(self):
+        # entries read back from disk were admitted already
+        sa_cache = Cache.Cache(1, 2, spill=self.store, admission=True)
+        sa_cache.put(0, "a")
+        sa_cache.put(2, "b")
+        sa_cache.put(2, "b")
+        self.assertIn(0, self.store)
+        self.assertEqual("a", sa_cache.get(0))
+        self.assertEqual("b", sa_cache.get(2))
+        self.assertEqual(2, sa_cache.get_hits())
+
+    def test_ttl(self):
+        now = [0.0]
+        sa_cache = Cache.Cache(1, 2, spill=self.store, clock=lambda: now[0])
+        sa_cache.put(0, "a", ttl=1)
+        sa_cache.put(2, "b")
+        now[0] = 1
+        self.assertIsNone(sa_cache.get(0))
+
+    def test_compaction(self):
+        for key in range(200):
+            self.store.add([key, "x" * 20, key], None)
+        segments = len(os.listdir(self.store._directory))
+        size = self.store.get_bytes()
+
+        # dropping two thirds of every segment leaves them due for compaction
+        for key in range(200):
+            if key % 3:
+                self.store.discard(key)
+        self.store.compact()
+        self.assertLess(len(os.listdir(self.store._directory)), segments / 2)
+        self.assertLess(self.store.get_bytes(), size / 2)
+        for key in range(0, 200, 3):
+            self.assertEqual((key, "x" * 20, None), self.store.pop(key))
+        self.assertEqual(0, len(self.store))
+
+    def test_background_compaction(self):
+        for key in range(100):
+            self.store.add([key, "x" * 20, key], None)
+        for key in range(0, 100, 4):
+            self.store.pop(key)
+            self.store.discard(key + 1)
+        # the compactor runs in the background; wait for it to catch up
+        deadline = time.monotonic() + 5
+        while self.due_segments() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual([], self.due_segments())
+        self.assertEqual(50, len(self.store))
+        self.assertEqual(50 * len(self.store._serializer.dumps("x" * 20)), self.store._live_bytes)
+        self.assertEqual(("x" * 20), self.store.pop(99)[1])
+
+    def test_max_bytes(self):
+        store = SpillStore.SpillStore(max_bytes=100)
+        try:
+            entry_bytes = len(store._serializer.dumps(0))
+            for key in range(50):
+                store.add([key, key, key], None)
+            self.assertEqual(100 // entry_bytes, len(store))
+            self.assertNotIn(0, store)
+            self.assertIn(49, store)
+        finally:
+            store.close()
+        self.assertFalse(os.path.exists(store._directory))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+"""
+Compares the batch methods against a Python loop over the single-key methods.
+
+    python -m benchmarks.batch [--batch 500] [--rounds 200] [--alg lru]
+
+Run from the repository root so Cache is importable.
+"""
+import argparse
+import time
+
+import Cache
+
+
+def timed(func, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--alg", default="lru")
+    args = parser.parse_args()
+
+    keys = ["key%d" % i for i in range(args.batch)]
+    items = [(key, i) for i, key in enumerate(keys)]
+    sa_cache = Cache.Cache(8, 8 * args.batch, args.alg)
+
+    cases = [
+        ("put", lambda: [sa_cache.put(key, value) for key, value in items], lambda: sa_cache.put_many(items)),
+        ("get", lambda: [sa_cache.get(key) for key in keys], lambda: sa_cache.get_many(keys)),
+    ]
+    for name, loop, batch in cases:
+        loop_time = timed(loop, args.rounds)
+        batch_time = timed(batch, args.rounds)
+        ops = args.batch * args.rounds
+        print("%-4s loop %9.0f ops/s  batch %9.0f ops/s  speedup %.2fx"
+              % (name, ops / loop_time, ops / batch_time, loop_time / batch_time))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Microbenchmark of Cache.custom_hash against the previous recursive hash on nested keys.
+
+    python -m benchmarks.hashing [--rounds 20000]
+
+Run from the repository root so Cache is importable.
+"""
+import argparse
+import timeit
+
+import Cache
+
+
+def recursive_hash(key):
+    """
+    The recursive hash Cache used before custom_hash; kept here as the baseline
+    """
+    if type(key) is list:
+        return recursive_hash(tuple(key))
+    elif type(key) is set:
+        return recursive_hash(frozenset(key))
+    elif type(key) is dict:
+        return recursive_hash(frozenset(key.items()))
+    else:
+        return hash(key)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=20000)
+    args = parser.parse_args()
+
+    login_attempts = {"johanan_lai1997": 3, "johananlai1997": 0, "admin": 13291836}
+    keys = [
+        ("list", ["johanan_lai1997", "johananlai1997", "admin"]),
+        ("dict", login_attempts),
+        ("set", {200, 100, 300}),
+        ("int", 48406488),
+        ("nested", [login_attempts, {"sessions": [1, 2, 3]}, ("admin", [4, 5])]),
+    ]
+
+    for name, key in keys:
+        new = timeit.timeit(lambda: Cache.custom_hash(key), number=args.rounds)
+        try:
+            old = timeit.timeit(lambda: recursive_hash(key), number=args.rounds)
+        except TypeError:
+            print("%-7s custom_hash %7.0f ns   recursive: unhashable" % (name, 1e9 * new / args.rounds))
+            continue
+        print("%-7s custom_hash %7.0f ns   recursive %7.0f ns   speedup %.2fx"
+              % (name, 1e9 * new / args.rounds, 1e9 * old / args.rounds, old / new))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Compares the memory used by Cache and CompactCache when every slot is filled.
+
+    python -m benchmarks.memory [--slots 8] [--size 1000000]
+
+Run from the repository root so Cache and CompactCache are importable.
+"""
+import argparse
+import gc
+import tracemalloc
+
+import Cache
+import CompactCache
+
+
+def measure(factory, slots, size):
+    """
+    :return: Bytes allocated while building a cache with factory and filling all of its slots
+    """
+    gc.collect()
+    tracemalloc.start()
+    sa_cache = factory(slots, size)
+    for key in range(size):
+        sa_cache.put(key, key)
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    del sa_cache
+    return used
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--slots", type=int, default=8)
+    parser.add_argument("--size", type=int, default=1000000)
+    args = parser.parse_args()
+
+    # both layouts also pay for the int object stored as each value
+    for name, factory in [("Cache", Cache.Cache), ("CompactCache", CompactCache.CompactCache)]:
+        used = measure(factory, args.slots, args.size)
+        print("%-13s %8.1f MiB  %6.1f bytes/slot" % (name, used / 2**20, used / args.size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Compares set indexing and the victim buffer on a workload that piles keys into a few sets.
+
+    python -m benchmarks.skew [--sets 64] [--slots 4] [--keys 160] [--stride 16] [--accesses 100000]
+
+Keys are multiples of stride, so with modulo indexing they only reach sets / stride sets. Every
+configuration runs the same read-through trace; per-set misses come from CacheStats.
+"""
+import argparse
+import random
+
+import Cache
+import CacheStats
+
+
+def run(trace, sets, slots, **options):
+    sa_cache = Cache.Cache(slots, sets * slots, stats=CacheStats.CacheStats(sample_every=0), **options)
+    for key in trace:
+        if sa_cache.get(key) is None:
+            sa_cache.put(key, key)
+    return sa_cache.get_stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sets", type=int, default=64)
+    parser.add_argument("--slots", type=int, default=4)
+    parser.add_argument("--keys", type=int, default=160)
+    parser.add_argument("--stride", type=int, default=16)
+    parser.add_argument("--accesses", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    keys = [i * args.stride for i in range(args.keys)]
+    # a hot quarter of the keys takes most accesses
+    hot = keys[:max(1, args.keys // 4)]
+    trace = [rng.choice(hot) if rng.random() < 0.8 else rng.choice(keys) for _ in range(args.accesses)]
+
+    cases = [
+        ("modulo", {}),
+        ("modulo+victim", {"victim_slots": 4 * args.slots}),
+        ("mixed", {"index": "mixed"}),
+        ("two_choice", {"index": "two_choice"}),
+        ("two_choice+victim", {"index": "two_choice", "victim_slots": 4 * args.slots}),
+    ]
+    print("%-18s %8s %9s %9s %9s %10s" % ("config", "hit%", "conflict", "capacity", "max/set", "sets used"))
+    for name, options in cases:
+        stats = run(trace, args.sets, args.slots, **options)
+        hits, misses = sum(stats.hits), sum(stats.misses)
+        used = sum(1 for count in stats.insertions if count)
+        print("%-18s %7.2f%% %9d %9d %9d %10d" % (name, 100.0 * hits / (hits + misses), stats.miss_kinds["conflict"],
+                                                stats.miss_kinds["capacity"], max(stats.misses), used))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Measures what a short-lived job pays before its first cache hit: importing Cache and creating a cache.
+
+    python -m benchmarks.startup [--sizes 10000,1000000,10000000] [--slots 1,8] [--algs lru,fifo,tinylfu] [--runs 5]
+
+Import time is the best of runs fresh interpreters. Every configuration is then created runs times,
+reporting the best creation time, the time of the first put and get, which set up the set they touch,
+and the memory allocated by creation as seen by tracemalloc.
+Run from the repository root so Cache is importable.
+"""
+import argparse
+import itertools
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import Cache
+
+
+_IMPORT_SCRIPT = "import time; start = time.perf_counter(); import Cache; print(time.perf_counter() - start)"
+
+
+def import_time(runs):
+    """
+    :return: Best time in seconds of importing Cache in a fresh interpreter
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    times = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-c", _IMPORT_SCRIPT], cwd=root, check=True,
+                                capture_output=True, text=True)
+        times.append(float(result.stdout))
+    return min(times)
+
+
+def run(slots, size, alg, runs):
+    """
+    :return: Best creation time, time of the first put and get in seconds, and bytes allocated by creation
+    """
+    create_times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        sa_cache = Cache.Cache(slots, size, alg)
+        create_times.append(time.perf_counter() - start)
+        del sa_cache
+
+    sa_cache = Cache.Cache(slots, size, alg)
+    start = time.perf_counter()
+    sa_cache.put("key", "value")
+    sa_cache.get("key")
+    first_op = time.perf_counter() - start
+    del sa_cache
+
+    tracemalloc.start()
+    sa_cache = Cache.Cache(slots, size, alg)
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del sa_cache
+    return min(create_times), first_op, allocated
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="10000,1000000,10000000", help="comma-separated total slots")
+    parser.add_argument("--slots", default="1,8", help="comma-separated associativities")
+    parser.add_argument("--algs", default="lru,fifo,tinylfu")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    print("import Cache %.1f ms" % (1000 * import_time(args.runs)))
+    print("%-8s %6s %10s %12s %14s %12s" % ("alg", "slots", "size", "create ms", "first op us", "MiB"))
+    for alg, slots, size in itertools.product(args.algs.split(","), map(int, args.slots.split(",")),
+                                              map(int, args.sizes.split(","))):
+        create, first_op, allocated = run(slots, size, alg, args.runs)
+        print("%-8s %6d %10d %12.2f %14.1f %12.1f" % (alg, slots, size, 1000 * create, 1e6 * first_op,
+                                                      allocated / 2 ** 20))
+
+
+if __name__ == "__main__":
+    main()
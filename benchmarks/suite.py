@@ -0,0 +1,235 @@
+"""
+Benchmarks Cache for every replacement algorithm, associativity, workload and key type.
+
+    python -m benchmarks.suite [--output results.json] [--baseline baseline.json] [--threshold 0.25]
+                               [--latency-threshold 0.5] [--repeats 5]
+
+Every configuration replays the same read-through trace (get, then put on a miss): repeats times
+untimed for throughput and hit ratio, keeping the best run, repeats times timing each call for p50/p99
+latency, keeping the lowest percentiles, and once under tracemalloc for peak memory. A single timed
+pass puts too much of its tail down to other processes to gate on. Results are written as JSON; with
+--baseline, configurations that got slower, bigger or missed more than the thresholds allow are listed
+and the exit status is 1, e.g. write a baseline with --output on the main branch, then pass it as
+--baseline on a change. Latency percentiles stay the noisiest measurement, so they get a looser
+threshold of their own.
+Objects hashed by identity, such as Student, get hashes that are multiples of a small power of two,
+so with modulo indexing they reach a fraction of the sets; compare with --index mixed.
+--admission shows how much an admission filter keeps scans from flushing the cache, e.g. on scan_loop.
+Run from the repository root so Cache is importable.
+"""
+import argparse
+import itertools
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+import Cache
+import ReplacementAlgorithm
+import Student
+
+
+def uniform(rng, keys, accesses, capacity):
+    """
+    :return: Trace of key indices drawn uniformly from keys
+    """
+    return [rng.randrange(keys) for _ in range(accesses)]
+
+
+def zipf(rng, keys, accesses, capacity, skew=1.0):
+    """
+    :return: Trace of key indices whose popularity follows a Zipf distribution, hottest keys scattered
+    """
+    ranks = list(range(keys))
+    rng.shuffle(ranks)
+    weights = list(itertools.accumulate(1 / (rank + 1) ** skew for rank in range(keys)))
+    return rng.choices(ranks, cum_weights=weights, k=accesses)
+
+
+def scan_loop(rng, keys, accesses, capacity):
+    """
+    :return: Trace looping over a hot set of half the capacity, interrupted by scans of capacity keys
+        that are never used again
+    """
+    hot = max(1, capacity // 2)
+    trace = []
+    scan_key = hot
+    while len(trace) < accesses:
+        trace.extend(range(hot))
+        trace.extend(range(hot))
+        if rng.random() < 0.5:
+            trace.extend(range(scan_key, scan_key + capacity))
+            scan_key += capacity
+    return trace[:accesses]
+
+
+WORKLOADS = {"uniform": uniform, "zipf": zipf, "scan_loop": scan_loop}
+
+# key type -> function building the key and the value stored for key index i
+KEY_TYPES = {
+    "int": lambda i: (i, i),
+    "str": lambda i: ("key%d" % i, "value%d" % i),
+    "list": lambda i: (["johanan_lai1997", i, {"sessions": [i % 3]}], [i]),
+    "student": lambda i: (Student.Student("Student %d" % i, i, ("UCI", "Computer Science")),
+                          Student.Student("Tutor %d" % i, -i, ("UCI", "Informatics"))),
+}
+
+
+def replay(sa_cache, trace, keys, values):
+    for i in trace:
+        if sa_cache.get(keys[i]) is None:
+            sa_cache.put(keys[i], values[i])
+
+
+def replay_timed(sa_cache, trace, keys, values):
+    """
+    :return: Lists of get and put latencies in ns
+    """
+    get_times = []
+    put_times = []
+    clock = time.perf_counter_ns
+    for i in trace:
+        start = clock()
+        value = sa_cache.get(keys[i])
+        get_times.append(clock() - start)
+        if value is None:
+            start = clock()
+            sa_cache.put(keys[i], values[i])
+            put_times.append(clock() - start)
+    return get_times, put_times
+
+
+def percentiles(times):
+    if not times:
+        return {"p50": 0, "p99": 0}
+    times = sorted(times)
+    return {"p50": times[len(times) // 2], "p99": times[min(len(times) - 1, len(times) * 99 // 100)]}
+
+
+def best_percentiles(runs):
+    """
+    :param runs: Lists of latencies of the same calls, one per timed run
+    :return: Lowest p50 and p99 over the runs
+    """
+    runs = [percentiles(times) for times in runs]
+    return {name: min(run[name] for run in runs) for name in ("p50", "p99")}
+
+
+def run(alg, slots, size, trace, keys, values, repeats, **options):
+    """
+    :param repeats: Number of untimed and of timed replays
+    :param options: Other Cache options
+    :return: Dict of measurements for one configuration
+    """
+    elapsed = []
+    timed = []
+    for _ in range(repeats):
+        sa_cache = Cache.Cache(slots, size, alg, **options)
+        start = time.perf_counter()
+        replay(sa_cache, trace, keys, values)
+        elapsed.append(time.perf_counter() - start)
+        timed.append(replay_timed(Cache.Cache(slots, size, alg, **options), trace, keys, values))
+    # every replay makes the same decisions, so the counts of the last one stand for all
+    hits, misses = sa_cache.get_hits(), sa_cache.get_misses()
+
+    tracemalloc.start()
+    sa_cache = Cache.Cache(slots, size, alg, **options)
+    replay(sa_cache, trace, keys, values)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        # a get, plus a put on every miss
+        "ops_per_sec": (len(trace) + misses) / min(elapsed),
+        "hit_ratio": hits / (hits + misses),
+        "latency_ns": {"get": best_percentiles(get_times for get_times, _ in timed),
+                       "put": best_percentiles(put_times for _, put_times in timed)},
+        "peak_bytes": peak,
+    }
+
+
+def compare(results, baseline, threshold, latency_threshold):
+    """
+    :return: List of (configuration, metric, baseline value, new value) that regressed by more than
+        threshold, relative for throughput and memory, absolute for hit ratio, or by more than
+        latency_threshold, relative, for latency
+    """
+    regressions = []
+    for name, new in sorted(results.items()):
+        old = baseline.get(name)
+        if old is None:
+            continue
+        checks = [
+            ("ops_per_sec", old["ops_per_sec"], new["ops_per_sec"], new["ops_per_sec"] < old["ops_per_sec"] * (1 - threshold)),
+            ("hit_ratio", old["hit_ratio"], new["hit_ratio"], new["hit_ratio"] < old["hit_ratio"] - threshold / 10),
+            ("peak_bytes", old["peak_bytes"], new["peak_bytes"], new["peak_bytes"] > old["peak_bytes"] * (1 + threshold)),
+        ]
+        for op in ("get", "put"):
+            old_p99, new_p99 = old["latency_ns"][op]["p99"], new["latency_ns"][op]["p99"]
+            checks.append(("%s_p99_ns" % op, old_p99, new_p99, new_p99 > old_p99 * (1 + latency_threshold)))
+        regressions.extend((name, metric, before, after) for metric, before, after, worse in checks if worse)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--algs", default=",".join(ReplacementAlgorithm.get_algorithm_names()))
+    parser.add_argument("--slots", default="1,4,16", help="comma-separated associativities")
+    parser.add_argument("--size", type=int, default=1024)
+    parser.add_argument("--keys", type=int, default=4096, help="distinct keys of uniform and zipf")
+    parser.add_argument("--accesses", type=int, default=20000)
+    parser.add_argument("--workloads", default=",".join(WORKLOADS))
+    parser.add_argument("--types", default="int,student", help="comma-separated of " + ", ".join(KEY_TYPES))
+    parser.add_argument("--index", default="modulo", help="set indexing passed to Cache")
+    parser.add_argument("--admission", action="store_true", help="filter evicting puts by key frequency")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="JSON file to write results to")
+    parser.add_argument("--baseline", help="JSON file written by an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed relative slowdown or growth; a tenth of it is the allowed hit ratio drop")
+    parser.add_argument("--latency-threshold", type=float, default=0.5, help="allowed relative p99 growth")
+    parser.add_argument("--repeats", type=int, default=5, help="untimed and timed replays per configuration")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for workload, key_type in itertools.product(args.workloads.split(","), args.types.split(",")):
+        trace = WORKLOADS[workload](random.Random(args.seed), args.keys, args.accesses, args.size)
+        pairs = [KEY_TYPES[key_type](i) for i in range(max(trace) + 1)]
+        keys = [key for key, _ in pairs]
+        values = [value for _, value in pairs]
+        for alg, slots in itertools.product(args.algs.split(","), map(int, args.slots.split(","))):
+            name = "%s/%d-way/%s/%s" % (alg, slots, workload, key_type)
+            result = results[name] = run(alg, slots, args.size, trace, keys, values, index=args.index,
+                                        admission=args.admission, repeats=args.repeats)
+            print("%-34s %9.0f ops/s  hit %6.2f%%  get p50/p99 %5d/%6d ns  put p50/p99 %5d/%6d ns  peak %8.1f KiB"
+                  % (name, result["ops_per_sec"], 100 * result["hit_ratio"],
+                     result["latency_ns"]["get"]["p50"], result["latency_ns"]["get"]["p99"],
+                     result["latency_ns"]["put"]["p50"], result["latency_ns"]["put"]["p99"],
+                     result["peak_bytes"] / 1024))
+
+    if args.output:
+        report = {
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "settings": {name: value for name, value in vars(args).items() if name not in ("output", "baseline")},
+            "results": results,
+        }
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=1, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            regressions = compare(results, json.load(baseline)["results"], args.threshold,
+                                  args.latency_threshold)
+        for name, metric, before, after in regressions:
+            print("REGRESSION %s %s: %.6g -> %.6g" % (name, metric, before, after))
+        if regressions:
+            return 1
+        print("no regressions against %s" % args.baseline)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())